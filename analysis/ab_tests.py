@@ -1,55 +1,276 @@
 import pandas as pd
 import numpy as np
-from statsmodels.stats.proportion import proportions_ztest
-from statsmodels.stats.weightstats import CompareMeans, DescrStatsW
+from scipy import stats
 
-def calculate_ab_stats(df: pd.DataFrame, metric_col: str, treatment_col='treatment', metric_type='continuous', alpha=0.05):
+from analysis.sql import quote_identifier, read_sql
+
+def _centered_ss(n, total, sumsq, ss=None):
     """
-    Calculates A/B test statistics.
-    Types: 'continuous' (means), 'binary' (proportions).
+    Sum of squared deviations from the mean: `ss` when known (e.g. from VAR_SAMP in
+    fetch_arm_moments), else from the raw moments. The latter cancels catastrophically
+    when the mean is large relative to the spread, down to tiny negative values.
     """
-    treatment = df[df[treatment_col] == 1][metric_col]
-    control = df[df[treatment_col] == 0][metric_col]
-    
-    mean_t = treatment.mean()
-    mean_c = control.mean()
-    
-    delta = mean_t - mean_c
-    rel_lift = (mean_t / mean_c) - 1 if mean_c != 0 else 0
-    
-    result = {
-        'metric_name': metric_col,
+    if ss is not None:
+        return np.asarray(ss, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.maximum(sumsq - total ** 2 / n, 0.0)
+
+def _compare_moments(n_t, sum_t, sumsq_t, n_c, sum_c, sumsq_c, metric_type='continuous', alpha=0.05,
+                     ss_t=None, ss_c=None):
+    """
+    Core A/B comparison from per-arm sufficient statistics (n, sum, sum of squares, and
+    optionally the centered sum of squares ss for precise variances).
+    Works elementwise on scalars or numpy arrays, so many metrics/segments can be
+    compared in a single vectorized call.
+    """
+    n_t, sum_t, sumsq_t = (np.asarray(a, dtype=float) for a in (n_t, sum_t, sumsq_t))
+    n_c, sum_c, sumsq_c = (np.asarray(a, dtype=float) for a in (n_c, sum_c, sumsq_c))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_t = sum_t / n_t
+        mean_c = sum_c / n_c
+
+        delta = mean_t - mean_c
+        rel_lift = np.where(mean_c != 0, mean_t / mean_c - 1, 0.0)
+
+        if metric_type == 'binary':
+            # Z-test with pooled proportion (same as statsmodels proportions_ztest)
+            p_pool = (sum_t + sum_c) / (n_t + n_c)
+            se_pool = np.sqrt(p_pool * (1 - p_pool) * (1 / n_t + 1 / n_c))
+            stat = delta / se_pool
+            pval = 2 * stats.norm.sf(np.abs(stat))
+
+            # Wald CI for difference in proportions (unpooled SE)
+            se = np.sqrt(mean_t * (1 - mean_t) / n_t + mean_c * (1 - mean_c) / n_c)
+            crit = stats.norm.ppf(1 - alpha / 2)
+
+        else:
+            # Welch's t-test: sample variances (ddof=1)
+            var_t = _centered_ss(n_t, sum_t, sumsq_t, ss_t) / (n_t - 1)
+            var_c = _centered_ss(n_c, sum_c, sumsq_c, ss_c) / (n_c - 1)
+
+            vn_t = var_t / n_t
+            vn_c = var_c / n_c
+            se = np.sqrt(vn_t + vn_c)
+            # Welch-Satterthwaite degrees of freedom
+            dof = (vn_t + vn_c) ** 2 / (vn_t ** 2 / (n_t - 1) + vn_c ** 2 / (n_c - 1))
+
+            stat = delta / se
+            pval = 2 * stats.t.sf(np.abs(stat), dof)
+            crit = stats.t.ppf(1 - alpha / 2, dof)
+
+    return {
         'mean_control': mean_c,
         'mean_treatment': mean_t,
         'effect_estimate': delta,
         'relative_lift': rel_lift,
+        'p_value': pval,
+        'ci_low': delta - crit * se,
+        'ci_high': delta + crit * se,
+        'method': 'z_test' if metric_type == 'binary' else 'welch_t_test',
+    }
+
+def calculate_ab_stats_from_moments(n_t, sum_t, sumsq_t, n_c, sum_c, sumsq_c, metric_col: str, metric_type='continuous', alpha=0.05,
+                                    ss_t=None, ss_c=None):
+    """
+    Calculates A/B test statistics from per-arm sufficient statistics.
+    Returns the same result dict as calculate_ab_stats, so aggregates computed
+    elsewhere (e.g. in Postgres via fetch_arm_moments) never need the raw rows.
+    """
+    res = _compare_moments(n_t, sum_t, sumsq_t, n_c, sum_c, sumsq_c, metric_type=metric_type, alpha=alpha,
+                           ss_t=ss_t, ss_c=ss_c)
+
+    result = {
+        'metric_name': metric_col,
+        'mean_control': float(res['mean_control']),
+        'mean_treatment': float(res['mean_treatment']),
+        'effect_estimate': float(res['effect_estimate']),
+        'relative_lift': float(res['relative_lift']),
     }
-    
-    if metric_type == 'binary':
-        # Z-test
-        count = np.array([treatment.sum(), control.sum()])
-        nobs = np.array([len(treatment), len(control)])
-        
-        stat, pval = proportions_ztest(count, nobs)
-        
-        # CI for difference in proportions (using statsmodels or manual SE)
-        # For simplicity in this demo, manual Wald CI for difference
-        se = np.sqrt(mean_t*(1-mean_t)/len(treatment) + mean_c*(1-mean_c)/len(control))
-        z_score = 1.96 # approx for 95%
-        ci_low = delta - z_score * se
-        ci_high = delta + z_score * se
-        
-    else:
-        # Welch's t-test
-        # use statsmodels CompareMeans
-        cm = CompareMeans(DescrStatsW(treatment), DescrStatsW(control))
-        stat, pval, df_dof = cm.ttest_ind(usevar='unequal') # unequal variance (Welch)
-        
-        ci_low, ci_high = cm.tconfint_diff(alpha=alpha, usevar='unequal')
-        
-    result['p_value'] = float(pval)
-    result['ci_low'] = float(ci_low)
-    result['ci_high'] = float(ci_high)
-    result['method'] = 'z_test' if metric_type == 'binary' else 'welch_t_test'
-    
+
+    result['p_value'] = float(res['p_value'])
+    result['ci_low'] = float(res['ci_low'])
+    result['ci_high'] = float(res['ci_high'])
+    result['method'] = res['method']
+    result['sample_size'] = int(n_t + n_c)
+
     return result
+
+def calculate_ab_stats(df: pd.DataFrame, metric_col: str, treatment_col='treatment', metric_type='continuous', alpha=0.05):
+    """
+    Calculates A/B test statistics.
+    Types: 'continuous' (means), 'binary' (proportions).
+    """
+    treatment = df[df[treatment_col] == 1][metric_col].dropna().astype(float)
+    control = df[df[treatment_col] == 0][metric_col].dropna().astype(float)
+
+    return calculate_ab_stats_from_moments(
+        len(treatment), treatment.sum(), (treatment ** 2).sum(),
+        len(control), control.sum(), (control ** 2).sum(),
+        metric_col, metric_type=metric_type, alpha=alpha,
+        ss_t=((treatment - treatment.mean()) ** 2).sum(), ss_c=((control - control.mean()) ** 2).sum()
+    )
+
+def fetch_arm_moments(engine, metric_cols: list, treatment_col='treatment', group_cols=('experiment_id',),
+                      table='experimentation.experiment_observations', experiment_ids=None,
+                      since_batch_date=None) -> pd.DataFrame:
+    """
+    Computes per-arm sufficient statistics inside Postgres with a single GROUP BY.
+    Returns one row per group/arm with columns:
+      group_cols..., treatment_col, n, <metric>_n, <metric>_sum, <metric>_sumsq, <metric>_ss
+    Only these few rows cross the wire instead of every unit.
+    <metric>_ss is the sum of squared deviations from the group/arm mean, from Postgres'
+    numerically stable VAR_SAMP, and is what the variances use. Unlike the raw sums it
+    does not add up across rows: rollups fall back to sumsq.
+    since_batch_date restricts the scan to batches strictly after that date.
+    """
+    keys = [quote_identifier(c) for c in list(group_cols) + [treatment_col]]
+
+    select = keys + ['COUNT(*) AS n']
+    for m in metric_cols:
+        col = quote_identifier(m)
+        select += [
+            f'COUNT({col}) AS "{m}_n"',
+            f'SUM({col}::float8) AS "{m}_sum"',
+            f'SUM({col}::float8 * {col}::float8) AS "{m}_sumsq"',
+            f'COALESCE(VAR_SAMP({col}::float8) * (COUNT({col}) - 1), 0) AS "{m}_ss"',
+        ]
+
+    conditions = []
+    params = {}
+    if experiment_ids is not None:
+        conditions.append("experiment_id = ANY(:experiment_ids)")
+        params['experiment_ids'] = [int(e) for e in experiment_ids]
+    if since_batch_date is not None:
+        conditions.append("batch_date > :since_batch_date")
+        params['since_batch_date'] = since_batch_date
+
+    query = f"SELECT {', '.join(select)} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}"
+
+    return read_sql(engine, query, params)
+
+def calculate_ab_stats_from_arm_moments(moments: pd.DataFrame, metric_col: str, treatment_col='treatment', metric_type='continuous', alpha=0.05):
+    """
+    Convenience wrapper: runs calculate_ab_stats_from_moments on the two arm rows
+    of a single group as returned by fetch_arm_moments.
+    """
+    arms = moments.set_index(treatment_col)
+    t = arms.loc[1]
+    c = arms.loc[0]
+
+    return calculate_ab_stats_from_moments(
+        t[f'{metric_col}_n'], t[f'{metric_col}_sum'], t[f'{metric_col}_sumsq'],
+        c[f'{metric_col}_n'], c[f'{metric_col}_sum'], c[f'{metric_col}_sumsq'],
+        metric_col, metric_type=metric_type, alpha=alpha,
+        ss_t=t.get(f'{metric_col}_ss'), ss_c=c.get(f'{metric_col}_ss')
+    )
+
+def summarize_arm_moments(df: pd.DataFrame, metric_cols: list, treatment_col='treatment', group_cols=()) -> pd.DataFrame:
+    """
+    Pandas equivalent of fetch_arm_moments: per-arm sufficient statistics for every
+    group in a single groupby pass. Output has the same layout as fetch_arm_moments.
+    """
+    keys = list(group_cols) + [treatment_col]
+
+    values = df[metric_cols].astype(float)
+    squares = (values ** 2).add_suffix('_sumsq')
+    frame = pd.concat([df[keys], values, squares], axis=1)
+
+    grouped = frame.groupby(keys, observed=True, sort=True)
+    sums = grouped[metric_cols + list(squares.columns)].sum()
+    counts = grouped[metric_cols].count().add_suffix('_n')
+
+    moments = pd.DataFrame({'n': grouped.size()})
+    for m in metric_cols:
+        moments[f'{m}_n'] = counts[f'{m}_n']
+        moments[f'{m}_sum'] = sums[m]
+        moments[f'{m}_sumsq'] = sums[f'{m}_sumsq']
+
+    return moments.reset_index()
+
+def segment_labels(frame: pd.DataFrame, segment_cols: list) -> pd.Series:
+    """
+    'col=value|col=value' label of each row's segment, or 'all' without segment columns.
+    """
+    if not segment_cols:
+        return pd.Series('all', index=frame.index)
+
+    labels = segment_cols[0] + '=' + frame[segment_cols[0]].astype(str)
+    for col in segment_cols[1:]:
+        labels = labels + '|' + col + '=' + frame[col].astype(str)
+    return labels
+
+def pair_arms(moments: pd.DataFrame, treatment_col, cell_keys: list) -> pd.DataFrame:
+    """
+    One row per cell (cell_keys) of a moments frame with both arms' moments side by
+    side: treatment (1) columns suffixed _t, control (0) columns suffixed _c.
+    """
+    arm_t = moments[moments[treatment_col] == 1].drop(columns=[treatment_col])
+    arm_c = moments[moments[treatment_col] == 0].drop(columns=[treatment_col])
+    if cell_keys:
+        return arm_t.merge(arm_c, on=cell_keys, suffixes=('_t', '_c'))
+    return arm_t.add_suffix('_t').reset_index(drop=True).join(arm_c.add_suffix('_c').reset_index(drop=True), how='inner')
+
+def ab_results_from_moments(moments: pd.DataFrame, metrics, treatment_col='treatment', group_cols=(), segment_cols=(), alpha=0.05) -> pd.DataFrame:
+    """
+    Vectorized A/B comparison for every group x segment x metric in a moments frame
+    (as produced by fetch_arm_moments or summarize_arm_moments).
+
+    metrics: list of (metric_col, metric_type) pairs or a {metric_col: metric_type} dict.
+    Returns a tidy frame matching the experiment_results schema
+    (group_cols..., metric_name, method, segment, effect_estimate, ci_low, ci_high,
+    p_value, sample_size) plus mean_control, mean_treatment and relative_lift.
+    """
+    metrics = list(dict(metrics).items())
+    cells = pair_arms(moments, treatment_col, list(group_cols) + list(segment_cols))
+    segment = segment_labels(cells, list(segment_cols))
+
+    frames = []
+    for metric_col, metric_type in metrics:
+        n_t, n_c = cells[f'{metric_col}_n_t'], cells[f'{metric_col}_n_c']
+        res = _compare_moments(
+            n_t, cells[f'{metric_col}_sum_t'], cells[f'{metric_col}_sumsq_t'],
+            n_c, cells[f'{metric_col}_sum_c'], cells[f'{metric_col}_sumsq_c'],
+            metric_type=metric_type, alpha=alpha,
+            ss_t=cells.get(f'{metric_col}_ss_t'), ss_c=cells.get(f'{metric_col}_ss_c')
+        )
+
+        out = cells[list(group_cols)].copy()
+        out['metric_name'] = metric_col
+        out['method'] = res.pop('method')
+        out['segment'] = segment.values
+        for key, values in res.items():
+            out[key] = values
+        out['sample_size'] = (n_t + n_c).astype(int).values
+        frames.append(out)
+
+    cols = list(group_cols) + ['metric_name', 'method', 'segment', 'effect_estimate', 'ci_low', 'ci_high',
+                               'p_value', 'sample_size', 'mean_control', 'mean_treatment', 'relative_lift']
+    if not frames:
+        return pd.DataFrame(columns=cols)
+    return pd.concat(frames, ignore_index=True)[cols]
+
+def calculate_ab_stats_batch(df: pd.DataFrame, metrics, segment_cols=None, treatment_col='treatment', group_cols=(), include_overall=True, alpha=0.05) -> pd.DataFrame:
+    """
+    Batched multi-metric, multi-segment A/B analysis.
+    One groupby pass over the data; segment totals ('all') are rolled up from the
+    per-segment moments rather than re-scanning the frame.
+    """
+    metrics = dict(metrics)
+    segment_cols = list(segment_cols or [])
+    group_cols = list(group_cols)
+
+    moments = summarize_arm_moments(df, list(metrics), treatment_col, group_cols + segment_cols)
+    frames = []
+
+    if segment_cols:
+        frames.append(ab_results_from_moments(moments, metrics, treatment_col, group_cols, segment_cols, alpha))
+
+    if include_overall or not segment_cols:
+        overall = moments.drop(columns=segment_cols).groupby(group_cols + [treatment_col], sort=True).sum().reset_index()
+        frames.insert(0, ab_results_from_moments(overall, metrics, treatment_col, group_cols, (), alpha))
+
+    return pd.concat(frames, ignore_index=True)
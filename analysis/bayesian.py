@@ -0,0 +1,205 @@
+import pandas as pd
+import numpy as np
+from scipy import stats
+from scipy.special import betaln
+
+from analysis.ab_tests import pair_arms, segment_labels
+
+# Uniform Beta(1, 1) prior on conversion rates
+BETA_PRIOR = {'alpha0': 1.0, 'beta0': 1.0}
+
+# Reference prior on (mean, variance): the posterior of an arm's mean is then Student-t
+# with n - 1 dof around the sample mean with scale s / sqrt(n), as in the t-test
+NIG_PRIOR = {'mu0': 0.0, 'kappa0': 0.0, 'alpha0': -0.5, 'beta0': 0.0}
+
+# Binary cells whose posteriors have at least this many successes and failures in both
+# arms use the normal approximation (within ~0.001 of the exact P(treatment > control));
+# smaller ones use the exact Beta sums, with at most this many terms per cell
+MIN_APPROXIMATION_COUNT = 100
+
+def beta_binomial_posterior(n, successes, alpha0=1.0, beta0=1.0):
+    """
+    Beta posterior (alpha, beta) of a conversion rate after `successes` out of `n`.
+    """
+    n, successes = np.asarray(n, dtype=float), np.asarray(successes, dtype=float)
+    return alpha0 + successes, beta0 + n - successes
+
+def normal_inverse_gamma_posterior(n, total, sumsq, mu0=0.0, kappa0=0.0, alpha0=-0.5, beta0=0.0, ss=None):
+    """
+    Normal-Inverse-Gamma posterior (mu, kappa, alpha, beta) of a mean and variance from
+    the sufficient statistics (n, sum, sum of squares), or the centered sum of squares
+    `ss` when known (precise where sumsq - n * mean^2 cancels). The marginal posterior of
+    the mean is Student-t with 2 * alpha dof, location mu and scale sqrt(beta / (alpha * kappa)).
+    """
+    n, total, sumsq = (np.asarray(a, dtype=float) for a in (n, total, sumsq))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / n
+        ss = np.maximum(sumsq - n * mean ** 2, 0.0) if ss is None else np.asarray(ss, dtype=float)
+        kappa = kappa0 + n
+        mu = (kappa0 * mu0 + total) / kappa
+        alpha = alpha0 + n / 2
+        beta = beta0 + ss / 2 + kappa0 * n * (mean - mu0) ** 2 / (2 * kappa)
+    return mu, kappa, alpha, beta
+
+def _prob_beta_greater(a1, b1, a2, b2, chunk_size=4096):
+    """
+    P(X1 > X2) for independent X1 ~ Beta(a1, b1), X2 ~ Beta(a2, b2), exact for integer a1:
+    the sum over i < a1 of B(a2 + i, b1 + b2) / ((b1 + i) B(1 + i, b1) B(a2, b2)), whose
+    consecutive terms differ by the factor (a2 + i)(b1 + i) / ((a2 + b1 + b2 + i)(1 + i)).
+    Vectorized over cells; cells are sorted by a1 so each chunk is only padded to its
+    own longest sum.
+    """
+    p = np.empty(len(a1))
+    order = np.argsort(a1, kind='stable')
+    for rows in np.array_split(order, max(1, -(-len(order) // chunk_size))):
+        i = np.arange(int(np.max(a1[rows], initial=0)))
+        x1, y1, x2, y2 = (x[rows, None] for x in (a1, b1, a2, b2))
+        log_ratio = np.log((x2 + i[:-1]) * (y1 + i[:-1]) / ((x2 + y1 + y2 + i[:-1]) * (1 + i[:-1])))
+        log_terms = betaln(x2, y1 + y2) - betaln(x2, y2) + np.concatenate(
+            [np.zeros((len(rows), 1)), np.cumsum(log_ratio, axis=1)], axis=1)
+        p[rows] = np.where(i < x1, np.exp(log_terms), 0.0).sum(axis=1)
+    return p
+
+def _beta_greater(a1, b1, a2, b2):
+    """
+    P(X1 > X2) for Beta posteriors with integer shape parameters, summing over the
+    smallest of the four: swapping X1 and X2 or reflecting both (1 - X ~ Beta(b, a))
+    turns each into the a1 of _prob_beta_greater.
+    """
+    shapes = np.stack([a1, a2, b2, b1])
+    smallest = shapes.argmin(axis=0)
+    p = np.empty(len(smallest))
+    for k, (args, complement) in enumerate([((a1, b1, a2, b2), False), ((a2, b2, a1, b1), True),
+                                            ((b2, a2, b1, a1), False), ((b1, a1, b2, a2), True)]):
+        rows = smallest == k
+        p[rows] = _prob_beta_greater(*(x[rows] for x in args))
+        if complement:
+            p[rows] = 1 - p[rows]
+    return p
+
+def _beta_comparison(a_t, b_t, a_c, b_c):
+    """
+    Exact P(treatment > control) and expected loss of shipping treatment for Beta
+    posteriors. E[max(C - T, 0)] = E[C; C > T] - E[T; C > T], and E[X; X > Y] is E[X]
+    times the probability with X's alpha raised by one.
+    """
+    prob = _beta_greater(a_t, b_t, a_c, b_c)
+    loss = (a_c / (a_c + b_c) * _beta_greater(a_c + 1, b_c, a_t, b_t)
+            - a_t / (a_t + b_t) * _beta_greater(a_c, b_c, a_t + 1, b_t))
+    return prob, loss
+
+def _arm_posterior(n, total, sumsq, metric_type, prior, ss=None):
+    """
+    Posterior of one arm's mean as (mean, squared scale, dof, Beta parameters). Binary
+    posteriors are Beta (scale = sd, dof = inf); continuous ones are Student-t.
+    """
+    if metric_type == 'binary':
+        a, b = beta_binomial_posterior(n, total, **prior)
+        var = a * b / ((a + b) ** 2 * (a + b + 1))
+        return a / (a + b), var, np.full_like(var, np.inf), (a, b)
+
+    mu, kappa, alpha, beta = normal_inverse_gamma_posterior(n, total, sumsq, **prior, ss=ss)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return mu, beta / (alpha * kappa), 2 * alpha, None
+
+def compare_posteriors_from_moments(n_t, sum_t, sumsq_t, n_c, sum_c, sumsq_c, metric_type='continuous', alpha=0.05,
+                                    prior=None, ss_t=None, ss_c=None):
+    """
+    Bayesian counterpart of the A/B comparison from per-arm sufficient statistics:
+    Beta-Binomial posteriors for 'binary' metrics, Normal-Inverse-Gamma for 'continuous'.
+    Works elementwise on arrays, so every experiment x segment cell is one call.
+
+    For the difference treatment - control returns the posterior mean, a (1 - alpha)
+    credible interval, P(treatment > control), and the expected loss of shipping each
+    arm (E[max(control - treatment, 0)] for treatment, and vice versa). All in closed
+    form: the difference is approximately Student-t with Welch-Satterthwaite dof (the
+    Behrens-Fisher approximation; normal for binary metrics), and small binary cells
+    use the exact Beta sums instead (with integer prior parameters, e.g. the default
+    uniform prior).
+    """
+    prior = dict(prior or (BETA_PRIOR if metric_type == 'binary' else NIG_PRIOR))
+    mean_t, s2_t, dof_t, beta_t = _arm_posterior(np.atleast_1d(n_t), np.atleast_1d(sum_t), np.atleast_1d(sumsq_t),
+                                                 metric_type, prior, None if ss_t is None else np.atleast_1d(ss_t))
+    mean_c, s2_c, dof_c, beta_c = _arm_posterior(np.atleast_1d(n_c), np.atleast_1d(sum_c), np.atleast_1d(sumsq_c),
+                                                 metric_type, prior, None if ss_c is None else np.atleast_1d(ss_c))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = mean_t - mean_c
+        scale = np.sqrt(s2_t + s2_c)
+        dof = (s2_t + s2_c) ** 2 / (s2_t ** 2 / dof_t + s2_c ** 2 / dof_c)
+        dist = stats.norm if metric_type == 'binary' else stats.t(dof)
+        z = delta / scale
+        crit = dist.ppf(1 - alpha / 2)
+        # E[max(D, 0)] for D = delta + scale * T: scale * (z F(z) + f(z) (dof + z^2) / (dof - 1))
+        tail = 1.0 if metric_type == 'binary' else (dof + z ** 2) / (dof - 1)
+        loss_control = scale * (z * dist.cdf(z) + dist.pdf(z) * tail)
+        result = {
+            'effect_estimate': delta,
+            'ci_low': delta - crit * scale,
+            'ci_high': delta + crit * scale,
+            'prob_treatment_better': dist.cdf(z),
+            'expected_loss_treatment': loss_control - delta,
+            'expected_loss_control': loss_control,
+        }
+
+    # Cells with an empty arm would only restate the prior
+    valid = np.isfinite(delta) & (scale > 0) & (np.atleast_1d(n_t) > 0) & (np.atleast_1d(n_c) > 0)
+    if metric_type == 'binary':
+        (a_t, b_t), (a_c, b_c) = beta_t, beta_c
+        small = np.minimum(np.minimum(a_t, b_t), np.minimum(a_c, b_c)) < MIN_APPROXIMATION_COUNT
+        integer = (a_t % 1 == 0) & (b_t % 1 == 0) & (a_c % 1 == 0) & (b_c % 1 == 0)
+        exact = np.flatnonzero(valid & small & integer)
+        prob, loss = _beta_comparison(a_t[exact], b_t[exact], a_c[exact], b_c[exact])
+        result['prob_treatment_better'][exact] = prob
+        result['expected_loss_treatment'][exact] = loss
+        result['expected_loss_control'][exact] = loss + delta[exact]
+
+    result = {key: np.where(valid, values, np.nan) for key, values in result.items()}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['mean_control'] = mean_c
+        result['mean_treatment'] = mean_t
+        result['relative_lift'] = np.where(mean_c != 0, mean_t / mean_c - 1, 0.0)
+    result['method'] = 'bayesian'
+    return result
+
+def bayesian_results_from_moments(moments: pd.DataFrame, metrics, treatment_col='treatment', group_cols=(), segment_cols=(),
+                                  alpha=0.05) -> pd.DataFrame:
+    """
+    Bayesian results for every group x segment x metric in a moments frame (as produced
+    by fetch_arm_moments or summarize_arm_moments), one vectorized call per metric.
+
+    Same layout as ab_tests.ab_results_from_moments with method 'bayesian': effect_estimate
+    and ci_low/ci_high are the posterior mean and credible interval of the difference, and
+    p_value is NaN. Adds prob_treatment_better, expected_loss_treatment and
+    expected_loss_control.
+    """
+    metrics = list(dict(metrics).items())
+    cells = pair_arms(moments, treatment_col, list(group_cols) + list(segment_cols))
+    segment = segment_labels(cells, list(segment_cols))
+
+    frames = []
+    for metric_col, metric_type in metrics:
+        n_t, n_c = cells[f'{metric_col}_n_t'], cells[f'{metric_col}_n_c']
+        res = compare_posteriors_from_moments(
+            n_t, cells[f'{metric_col}_sum_t'], cells[f'{metric_col}_sumsq_t'],
+            n_c, cells[f'{metric_col}_sum_c'], cells[f'{metric_col}_sumsq_c'],
+            metric_type=metric_type, alpha=alpha,
+            ss_t=cells.get(f'{metric_col}_ss_t'), ss_c=cells.get(f'{metric_col}_ss_c')
+        )
+
+        out = cells[list(group_cols)].copy()
+        out['metric_name'] = metric_col
+        out['method'] = res.pop('method')
+        out['segment'] = segment.values
+        for key, values in res.items():
+            out[key] = values
+        out['p_value'] = np.nan
+        out['sample_size'] = (n_t + n_c).astype(int).values
+        frames.append(out)
+
+    cols = list(group_cols) + ['metric_name', 'method', 'segment', 'effect_estimate', 'ci_low', 'ci_high',
+                               'p_value', 'sample_size', 'prob_treatment_better', 'expected_loss_treatment',
+                               'expected_loss_control', 'mean_control', 'mean_treatment', 'relative_lift']
+    if not frames:
+        return pd.DataFrame(columns=cols)
+    return pd.concat(frames, ignore_index=True)[cols]
@@ -1,7 +1,8 @@
 import pandas as pd
+import numpy as np
 
 import statsmodels.api as sm
-from analysis.ab_tests import calculate_ab_stats
+from analysis.ab_tests import calculate_ab_stats, calculate_ab_stats_from_moments
 
 def calculate_cuped_stats(df: pd.DataFrame, metric_col: str, covariate_cols: list, treatment_col='treatment'):
     """
@@ -46,3 +47,104 @@ def calculate_cuped_stats(df: pd.DataFrame, metric_col: str, covariate_cols: lis
     result['variance_reduction'] = 1 - (result['cuped_variance'] / result['original_variance'])
     
     return result
+
+def accumulate_cuped_moments(chunks, metric_col: str, covariate_cols: list, treatment_col='treatment') -> dict:
+    """
+    Accumulates per-arm cross-product matrices Z'Z, with Z = [1, y, X], over an
+    iterable of DataFrame chunks (e.g. pd.read_sql(..., chunksize=...)).
+    Only one chunk is in memory at a time; the state is a (k+2)x(k+2) matrix per arm.
+    Values are shifted by the first chunk's means to limit floating point cancellation.
+    """
+    cols = [metric_col] + covariate_cols
+    shift = None
+    moments = {}
+
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=cols)
+        if chunk.empty:
+            continue
+
+        values = chunk[cols].to_numpy(dtype=float)
+        if shift is None:
+            shift = values.mean(axis=0)
+        Z = np.column_stack([np.ones(len(values)), values - shift])
+
+        arms = chunk[treatment_col].to_numpy()
+        for arm in (0, 1):
+            Z_arm = Z[arms == arm]
+            moments[arm] = moments.get(arm, 0) + Z_arm.T @ Z_arm
+
+    return {'shift': shift, 'moments': moments}
+
+def cuped_stats_from_moments(accumulated: dict, metric_col: str, covariate_cols: list) -> dict:
+    """
+    Solves for theta from the accumulated normal equations and runs the A/B test on
+    the CUPED metric using only per-arm moments. Same output as calculate_cuped_stats.
+    """
+    moments = accumulated['moments']
+    if accumulated['shift'] is None or set(moments) != {0, 1}:
+        raise ValueError("No data for CUPED")
+
+    k = len(covariate_cols)
+    M = moments[0] + moments[1]
+    n = M[0, 0]
+
+    # Centered (co)variance sums: C = sum((z - z_mean)(z - z_mean)')
+    s = M[0, 1:]
+    C = M[1:, 1:] - np.outer(s, s) / n
+    C_yy, C_xy, C_xx = C[0, 0], C[1:, 0], C[1:, 1:]
+
+    # 1. Theta from the pooled normal equations (same as OLS with intercept)
+    theta = np.linalg.lstsq(C_xx, C_xy, rcond=None)[0]
+
+    # 2. CUPED metric as a linear form over Z = [1, y, X]:
+    # Y_cuped = Y - (X - X_mean) * theta
+    x_mean = s[1:] / n
+    a = np.concatenate([[x_mean @ theta, 1.0], -theta])
+
+    # 3. Per-arm moments of the CUPED metric, then the standard test
+    arm_stats = []
+    for arm in (1, 0):
+        M_arm = moments[arm]
+        arm_stats += [M_arm[0, 0], a @ M_arm[:, 0], a @ M_arm @ a]
+
+    result = calculate_ab_stats_from_moments(*arm_stats, f'{metric_col}_cuped', metric_type='continuous')
+
+    # Undo the shift on the reported means (differences and variances are unaffected)
+    shift_y = accumulated['shift'][0]
+    result['mean_control'] += shift_y
+    result['mean_treatment'] += shift_y
+    result['relative_lift'] = (result['mean_treatment'] / result['mean_control']) - 1 if result['mean_control'] != 0 else 0
+
+    a_centered = np.concatenate([[1.0], -theta])
+    result['method'] = 'cuped'
+    result['theta'] = dict(zip(covariate_cols, theta.tolist())) if k else {}
+    result['covariate_means'] = dict(zip(covariate_cols, (x_mean + accumulated['shift'][1:]).tolist())) if k else {}
+    result['original_variance'] = float(C_yy / (n - 1))
+    result['cuped_variance'] = float(a_centered @ C @ a_centered / (n - 1))
+    result['variance_reduction'] = 1 - (result['cuped_variance'] / result['original_variance'])
+
+    return result
+
+def calculate_cuped_stats_streaming(chunks, metric_col: str, covariate_cols: list, treatment_col='treatment') -> dict:
+    """
+    Out-of-core CUPED: accumulates X'X, X'y and per-arm moments over chunks
+    (DataFrames or a generator of them) without materializing the whole dataset.
+    """
+    accumulated = accumulate_cuped_moments(chunks, metric_col, covariate_cols, treatment_col)
+    return cuped_stats_from_moments(accumulated, metric_col, covariate_cols)
+
+def apply_cuped(chunks, metric_col: str, covariate_cols: list, theta: dict, covariate_means: dict):
+    """
+    Adds the CUPED-adjusted metric f'{metric_col}_cuped' to each chunk, using the theta
+    and covariate means of an earlier cuped_stats_from_moments result, so unit-level
+    methods (e.g. the bootstrap) can run on the adjusted metric without refitting.
+    """
+    theta = np.array([theta[c] for c in covariate_cols])
+    x_mean = np.array([covariate_means[c] for c in covariate_cols])
+
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=[metric_col] + covariate_cols).copy()
+        X = chunk[covariate_cols].to_numpy(dtype=float)
+        chunk[f'{metric_col}_cuped'] = chunk[metric_col].to_numpy(dtype=float) - (X - x_mean) @ theta
+        yield chunk
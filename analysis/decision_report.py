@@ -1,50 +1,127 @@
 import pandas as pd
+from jinja2 import Environment
 
+from analysis.sql import read_sql
 
-def generate_decision_report(experiment_id: int, engine):
+# Compiled once per process; rendering a report is a single template call
+REPORT_TEMPLATE = Environment(trim_blocks=True, lstrip_blocks=True, keep_trailing_newline=True).from_string("""\
+# Experiment Decision Report: {{ meta.name }}
+
+## Executive Summary
+**Decision**: {{ decision }}
+**Experiment ID**: {{ experiment_id }}
+**Status**: {{ meta.status }}
+**Start Date**: {{ meta.start_date }}
+
+## Rationale
+{% for line in rationale %}
+- {{ line }}
+{% endfor %}
+
+## Health Checks
+| Check | Status | Details |
+|-------|--------|---------|
+{% if health is not none %}
+| {{ health.check_name }} | {{ health.status }} | {{ health.details }} |
+{% else %}
+| SRM | PENDING | No check run |
+{% endif %}
+
+## Key Metrics Results
+| Metric | Method | Effect | P-Value | CI |
+|---|---|---|---|---|
+{% for row in results %}
+| {{ row.metric_name }} | {{ row.method }} | {{ '%.4f' % row.effect_estimate }} | {% if row.method == 'bayesian' %}P(T>C) {{ '%.3f' % row.prob_treatment_better }}{% else %}{{ '%.4f' % row.p_value }}{% endif %} | [{{ '%.4f' % row.ci_low }}, {{ '%.4f' % row.ci_high }}] |
+{% endfor %}
+{% if segment_rows %}
+
+_{{ segment_rows }} segment-level results not shown (see experimentation.latest_experiment_results)._
+{% endif %}
+{% if uplift %}
+
+## Uplift Modeling (Opportunity)
+{% for row in uplift %}
+- **{{ row.model_name }}**: Qini AUC = {{ '%.3f' % row.qini_auc }}{% if row.has_ci %} [{{ '%.3f' % row.qini_auc_ci_low }}, {{ '%.3f' % row.qini_auc_ci_high }}]{% endif %}. Targeting top 30% yields {{ '%.2f' % row.expected_value_lift }}x the incremental conversions of random targeting.
+{% endfor %}
+{% if curve %}
+
+### Targeting Curve ({{ curve_model }})
+| Top | Units | Uplift | 95% CI | Incremental Conversions |
+|---|---|---|---|---|
+{% for row in curve %}
+| {{ '%.0f%%' % (100 * row.cutoff) }} | {{ row.n_targeted | int }} | {{ '%.4f' % row.uplift }} | [{{ '%.4f' % row.uplift_ci_low }}, {{ '%.4f' % row.uplift_ci_high }}] | {{ '%.1f' % row.qini }} |
+{% endfor %}
+{% endif %}
+{% endif %}
+""")
+
+# Cut-offs of the stored uplift curve shown in the report
+CURVE_CUTOFFS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+def _id_filter(experiment_ids):
+    if experiment_ids is None:
+        return "", {}
+    return "WHERE experiment_id = ANY(:ids)", {'ids': [int(e) for e in experiment_ids]}
+
+def fetch_report_inputs(engine, experiment_ids=None) -> dict:
     """
-    Generates a Markdown decision report for an experiment.
+    Everything the decision reports need, for all (or the given) experiments, in four
+    set-based queries: registry rows, the latest health check per experiment, the
+    latest result per experiment x metric x method x segment, and the rows of each
+    experiment's latest uplift training run. The latest rows come from the
+    latest_* materialized views (db/init.sql), i.e. index lookups.
+    """
+    where, params = _id_filter(experiment_ids)
+    queries = {
+        'registry': f"SELECT * FROM experimentation.experiment_registry {where} ORDER BY experiment_id",
+        'health': f"""
+            SELECT DISTINCT ON (experiment_id) * FROM experimentation.latest_health_checks {where}
+            ORDER BY experiment_id, computed_at DESC
+        """,
+        'results': f"""
+            SELECT * FROM experimentation.latest_experiment_results {where}
+            ORDER BY experiment_id, computed_at DESC, metric_name, method, segment
+        """,
+        'uplift': f"""
+            SELECT * FROM experimentation.latest_uplift_results {where}
+            ORDER BY experiment_id, qini_auc DESC
+        """,
+    }
+    return {name: read_sql(engine, query, params) for name, query in queries.items()}
+
+def _decide(meta, health, results: list):
+    """
+    Decision and rationale lines from the latest health check and overall results.
     """
-    
-    # 1. Fetch Metadata
-    meta = pd.read_sql(f"SELECT * FROM experimentation.experiment_registry WHERE experiment_id = {experiment_id}", engine).iloc[0]
-    
-    # 2. Fetch Health
-    health = pd.read_sql(f"SELECT * FROM experimentation.experiment_health_checks WHERE experiment_id = {experiment_id} ORDER BY computed_at DESC LIMIT 1", engine)
-    
-    # 3. Fetch Results
-    results = pd.read_sql(f"SELECT * FROM experimentation.experiment_results WHERE experiment_id = {experiment_id} ORDER BY computed_at DESC", engine)
-    
-    # 4. Fetch Uplift
-    uplift = pd.read_sql(f"SELECT * FROM experimentation.uplift_policy_results WHERE experiment_id = {experiment_id} ORDER BY computed_at DESC", engine)
-    
-    # --- Decision Logic ---
     decision = "HOLD"
     rationale = []
-    
+
     # Check Health
     health_status = 'UNKNOWN'
-    if not health.empty:
-        health_status = health.iloc[0]['status']
+    if health is not None:
+        health_status = health['status']
         if health_status == 'FAIL':
             decision = "HOLD (Health Failure)"
             rationale.append("Experiment failed health checks (SRM or Data Quality). Results are invalid.")
-    
+
     # Check Primary Metric (Conversion)
-    primary_metric = meta['primary_metric'] or 'conversion'
-    
-    # Find result for primary metric (prefer CUPED if available)
-    primary_res = results[results['metric_name'].str.contains(primary_metric)].sort_values('method')
-    
-    if not primary_res.empty:
+    primary_metric = meta['primary_metric'] if isinstance(meta['primary_metric'], str) and meta['primary_metric'] else 'conversion'
+
+    # Find overall result for primary metric (prefer CUPED if available)
+    primary_res = sorted(
+        (row for row in results if _is_overall(row) and primary_metric in row['metric_name']),
+        key=lambda row: row['method'],
+    )
+
+    if primary_res:
         # Pick best method row
-        row = primary_res.iloc[-1] # simplistic
+        row = primary_res[-1] # simplistic
         # Use effect_estimate (absolute difference)
-        lift = row['effect_estimate'] 
+        lift = row['effect_estimate']
         pval = row['p_value']
-        
+
         rationale.append(f"Primary Metric ({row['metric_name']}): {lift:.4f} absolute effect (p={pval:.4f}).")
-        
+
         if health_status != 'FAIL':
             if pval < 0.05:
                 if lift > 0:
@@ -56,36 +133,74 @@ def generate_decision_report(experiment_id: int, engine):
             else:
                 decision = "ITERATE"
                 rationale.append("Results not significant. Consider running longer or checking power.")
-                
-    # --- Markdown Generation ---
-    md = f"""# Experiment Decision Report: {meta['name']}
-    
-## Executive Summary
-**Decision**: {decision}
-**Experiment ID**: {experiment_id}
-**Status**: {meta['status']}
-**Start Date**: {meta['start_date']}
 
-## Rationale
-{chr(10).join(['- ' + r for r in rationale])}
+    return decision, rationale
 
-## Health Checks
-| Check | Status | Details |
-|-------|--------|---------|
-"""
-    if not health.empty:
-        row = health.iloc[0]
-        md += f"| {row['check_name']} | {row['status']} | {row['details']} |\n"
-    else:
-        md += "| SRM | PENDING | No check run |\n"
-
-    md += "\n## Key Metrics Results\n| Metric | Method | Effect | P-Value | CI |\n|---|---|---|---|---|\n"
-    for _, row in results.iterrows():
-        md += f"| {row['metric_name']} | {row['method']} | {row['effect_estimate']:.4f} | {row['p_value']:.4f} | [{row['ci_low']:.4f}, {row['ci_high']:.4f}] |\n"
-        
-    if not uplift.empty:
-        md += "\n## Uplift Modeling (Opportunity)\n"
-        for _, row in uplift.iterrows():
-            md += f"- **{row['model_name']}**: Qini AUC = {row['qini_auc']:.3f}. Targeting top 30% yields {row['expected_value_lift']:.3f} expected lift.\n"
-            
-    return decision, md
+def _is_overall(row) -> bool:
+    # Rows without a segment predate segmented results and are overall rows
+    return not isinstance(row.get('segment'), str) or row['segment'] == 'all'
+
+def _curve_rows(curve: dict, cutoffs=CURVE_CUTOFFS) -> list:
+    # Stored uplift curve (uplift_evaluation.compact_curve layout) at the report's cut-offs
+    wanted = {round(c, 6) for c in cutoffs}
+    # Nulls (undefined uplift on tiny slices) render as nan
+    rows = [{col: float('nan') if v is None else v for col, v in zip(curve, values)} for values in zip(*curve.values())]
+    return [row for row in rows if round(row['cutoff'], 6) in wanted]
+
+def _by_experiment(df: pd.DataFrame) -> dict:
+    # One to_dict for the whole frame, then plain-Python grouping (order preserved)
+    groups = {}
+    for row in df.to_dict(orient='records'):
+        groups.setdefault(row['experiment_id'], []).append(row)
+    return groups
+
+def render_decision_reports(inputs: dict) -> pd.DataFrame:
+    """
+    Renders one report per registry row of `inputs` (fetch_report_inputs layout).
+    Each frame is converted to records and grouped by experiment once, then each
+    report is one template render. Returns experiment_id, decision, rationale_markdown.
+    """
+    health = {row['experiment_id']: row for row in inputs['health'].to_dict(orient='records')}
+    results = _by_experiment(inputs['results'])
+    uplift = _by_experiment(inputs['uplift'])
+
+    records = []
+    for meta in inputs['registry'].to_dict(orient='records'):
+        experiment_id = meta['experiment_id']
+        exp_results = results.get(experiment_id, [])
+        exp_health = health.get(experiment_id)
+        decision, rationale = _decide(meta, exp_health, exp_results)
+        # The table shows overall rows only; segment cubes can hold hundreds of cells
+        overall = [row for row in exp_results if _is_overall(row)]
+
+        # Targeting curve of the best model (highest Qini) of the latest uplift run
+        uplift_rows = [dict(row, has_ci=pd.notna(row.get('qini_auc_ci_low'))) for row in uplift.get(experiment_id, [])]
+        with_curve = [row for row in uplift_rows if isinstance(row.get('curve'), dict)]
+        curve, curve_model = None, None
+        if with_curve:
+            curve, curve_model = _curve_rows(with_curve[0]['curve']), with_curve[0]['model_name']
+
+        md = REPORT_TEMPLATE.render(
+            meta=meta, experiment_id=experiment_id, decision=decision, rationale=rationale, health=exp_health,
+            results=overall, segment_rows=len(exp_results) - len(overall), uplift=uplift_rows, curve=curve, curve_model=curve_model,
+        )
+        records.append({'experiment_id': experiment_id, 'decision': decision, 'rationale_markdown': md})
+
+    return pd.DataFrame(records, columns=['experiment_id', 'decision', 'rationale_markdown'])
+
+def generate_decision_reports(engine, experiment_ids=None) -> pd.DataFrame:
+    """
+    Decision reports for all (or the given) experiments: four queries in total,
+    regardless of the number of experiments.
+    """
+    return render_decision_reports(fetch_report_inputs(engine, experiment_ids))
+
+def generate_decision_report(experiment_id: int, engine):
+    """
+    Generates a Markdown decision report for an experiment.
+    """
+    reports = generate_decision_reports(engine, [experiment_id])
+    if reports.empty:
+        raise ValueError(f"Experiment {experiment_id} is not in the registry")
+    report = reports.iloc[0]
+    return report['decision'], report['rationale_markdown']
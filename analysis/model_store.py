@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+def _update_with_array(h, values):
+    values = np.ascontiguousarray(values)
+    h.update(str((values.dtype.str, values.shape)).encode())
+    if values.dtype == object:
+        h.update(pd.util.hash_array(values.ravel()).tobytes())
+    else:
+        h.update(values.view(np.uint8).ravel())
+
+def model_key(arrays, **spec) -> str:
+    """
+    Content address of a model: hash of the training arrays plus the JSON-serialized spec
+    (features, method, hyperparameters, ...). The scikit-learn version is included so a
+    library upgrade never serves a model pickled by another version.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    for values in arrays:
+        _update_with_array(h, np.asarray(values))
+    spec = dict(spec, sklearn_version=sklearn.__version__)
+    h.update(json.dumps(spec, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+class ModelStore:
+    """
+    Local content-addressed store of fitted models and their metrics.
+
+    Each entry is {key}.joblib (the model) plus {key}.json (metadata and metrics); the
+    JSON is written last, so an entry exists only once both files are complete.
+    Least recently used entries are evicted beyond max_entries or max_bytes.
+    """
+    def __init__(self, root='.cache/models', max_entries=50, max_bytes=1024 ** 3):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def _paths(self, key):
+        return os.path.join(self.root, f"{key}.joblib"), os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        """
+        (model, metadata) for a key, or None on a miss. A hit counts as a use for eviction.
+        """
+        model_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            model = joblib.load(model_path)
+        except (FileNotFoundError, EOFError):
+            return None
+        os.utime(meta_path)  # LRU touch
+        return model, meta
+
+    def get_metadata(self, key):
+        """
+        Metadata (incl. metrics) of an entry without loading the model, or None on a miss.
+        """
+        model_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if not os.path.exists(model_path):
+            return None
+        os.utime(meta_path)  # LRU touch
+        return meta
+
+    def put(self, key, model, metadata: dict) -> dict:
+        """
+        Persists a fitted model with its metadata (must be JSON-serializable), then evicts.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        model_path, meta_path = self._paths(key)
+        metadata = dict(metadata, key=key, created_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+        # Write to temporary names and rename, so concurrent readers never see partial files
+        suffix = f".{os.getpid()}.tmp"
+        joblib.dump(model, model_path + suffix)
+        os.replace(model_path + suffix, model_path)
+        with open(meta_path + suffix, 'w') as f:
+            json.dump(metadata, f, default=str)
+        os.replace(meta_path + suffix, meta_path)
+
+        self.evict()
+        return metadata
+
+    def entries(self) -> pd.DataFrame:
+        """
+        Registry view of the store: one row per entry with its metadata, size and last use.
+        """
+        rows = []
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if not name.endswith('.json'):
+                    continue
+                key = name[:-len('.json')]
+                model_path, meta_path = self._paths(key)
+                try:
+                    with open(meta_path) as f:
+                        meta = json.load(f)
+                    size = os.path.getsize(model_path) + os.path.getsize(meta_path)
+                    last_used = os.path.getmtime(meta_path)
+                except FileNotFoundError:
+                    continue  # evicted concurrently
+                rows.append(dict(meta, key=key, bytes=size, last_used=last_used))
+        return pd.DataFrame(rows)
+
+    def evict(self):
+        """
+        Drops least recently used entries until both retention limits hold.
+        """
+        entries = self.entries()
+        if entries.empty:
+            return []
+
+        entries = entries.sort_values('last_used', ascending=False)
+        keep_count = (np.arange(len(entries)) < self.max_entries)
+        keep_bytes = entries['bytes'].cumsum().to_numpy() <= self.max_bytes
+        # Always keep the most recent entry, even if it alone exceeds max_bytes
+        keep = keep_count & keep_bytes
+        keep[0] = True
+
+        evicted = entries.loc[~keep, 'key'].tolist()
+        for key in evicted:
+            for path in reversed(self._paths(key)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return evicted
@@ -0,0 +1,122 @@
+from itertools import combinations
+
+import pandas as pd
+import numpy as np
+
+from analysis.ab_tests import summarize_arm_moments, ab_results_from_moments
+from analysis.bayesian import bayesian_results_from_moments
+from analysis.cuped import calculate_cuped_stats_streaming, apply_cuped
+
+def segment_combinations(segment_cols: list, max_depth=None) -> list:
+    """
+    Every non-empty combination of segment columns, up to max_depth columns each,
+    in a stable order (single columns first).
+    """
+    max_depth = len(segment_cols) if max_depth is None else min(max_depth, len(segment_cols))
+    return [list(combo) for depth in range(1, max_depth + 1) for combo in combinations(segment_cols, depth)]
+
+def benjamini_hochberg(p_values) -> np.ndarray:
+    """
+    Benjamini-Hochberg adjusted p-values (FDR). NaN p-values are left out of the
+    family and stay NaN.
+    """
+    p = np.asarray(p_values, dtype=float)
+    adjusted = np.full(p.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p))
+    m = len(valid)
+    if m == 0:
+        return adjusted
+
+    order = valid[np.argsort(p[valid])]
+    ranked = p[order] * m / np.arange(1, m + 1)
+    # Step-up: running minimum from the largest p-value down
+    adjusted[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1.0)
+    return adjusted
+
+def _segment_keys(df: pd.DataFrame, segment_cols: list) -> pd.DataFrame:
+    # String keys for labels ('newbie=1', not 'newbie=1.0'); missing values get their own level
+    keys = {}
+    for col in segment_cols:
+        values = df[col]
+        if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+            values = values.astype('Int64')
+        keys[col] = values.astype(str).where(values.notna(), 'missing')
+    return pd.DataFrame(keys, index=df.index)
+
+def _add_cuped_metrics(df: pd.DataFrame, cuped_metrics: list, covariate_cols: list, treatment_col, group_cols: list):
+    """
+    Adds f'{metric}_cuped' columns, with theta fitted once per group on all of its units.
+    A shared theta keeps the adjusted metric linear, so its segment moments roll up
+    like any other metric and each cell needs no refit.
+    """
+    groups = df.groupby(group_cols, sort=False) if group_cols else [((), df)]
+    frames = []
+    for _, group in groups:
+        for metric in cuped_metrics:
+            try:
+                cuped = calculate_cuped_stats_streaming([group], metric, covariate_cols, treatment_col)
+            except ValueError:
+                # e.g. a single arm: no CUPED metric for this group
+                group = group.assign(**{f'{metric}_cuped': np.nan})
+                continue
+            adjusted = next(apply_cuped([group[[metric] + covariate_cols]], metric, covariate_cols,
+                                        cuped['theta'], cuped['covariate_means']))
+            group = group.assign(**{f'{metric}_cuped': adjusted[f'{metric}_cuped'].reindex(group.index)})
+        frames.append(group)
+    return pd.concat(frames) if frames else df
+
+def segment_cube(df: pd.DataFrame, metrics, segment_cols: list, treatment_col='treatment', group_cols=(),
+                 cuped_metrics=None, covariate_cols=None, max_depth=None, include_overall=True,
+                 alpha=0.05, bayesian=False) -> pd.DataFrame:
+    """
+    A/B (and CUPED) results for every combination of segment columns.
+
+    One groupby pass builds per-arm moments of the finest cells (all segment columns);
+    every coarser combination is rolled up by summing those moments, so the data is never
+    re-filtered per slice. Benjamini-Hochberg adjusted p-values (p_value_adjusted) are
+    added per group and adjustment: one family of all raw tests (every cell and metric)
+    and one of the CUPED tests, since a CUPED test restates the raw test of the same
+    metric and cell and would double-count it in a shared family.
+    Output has the ab_results_from_moments layout; CUPED rows have method 'cuped' and
+    metric_name f'{metric}_cuped'. With bayesian=True every cell also gets 'bayesian'
+    rows for the (unadjusted) metrics, whose NaN p-values stay out of the FDR family.
+    """
+    metrics = dict(metrics)
+    group_cols = list(group_cols)
+    segment_cols = list(segment_cols)
+    cuped_metrics = list(cuped_metrics or [])
+
+    # 1. CUPED-adjusted metrics as extra columns (theta per group)
+    if cuped_metrics:
+        df = _add_cuped_metrics(df, cuped_metrics, list(covariate_cols or []), treatment_col, group_cols)
+    all_metrics = dict(metrics)
+    all_metrics.update({f'{m}_cuped': 'continuous' for m in cuped_metrics})
+
+    # 2. Finest cells in one grouped aggregation
+    frame = pd.concat([df[group_cols + [treatment_col] + list(all_metrics)], _segment_keys(df, segment_cols)], axis=1)
+    finest = summarize_arm_moments(frame, list(all_metrics), treatment_col, group_cols + segment_cols)
+
+    # 3. Roll every combination up from the finest cells
+    def cell_results(moments, combo):
+        results = [ab_results_from_moments(moments, all_metrics, treatment_col, group_cols, combo, alpha)]
+        if bayesian:
+            results.append(bayesian_results_from_moments(moments, metrics, treatment_col, group_cols, combo, alpha))
+        return results
+
+    frames = []
+    if include_overall:
+        overall = finest.drop(columns=segment_cols).groupby(group_cols + [treatment_col], sort=True).sum().reset_index()
+        frames.extend(cell_results(overall, []))
+    for combo in segment_combinations(segment_cols, max_depth):
+        dropped = [c for c in segment_cols if c not in combo]
+        rolled = finest.drop(columns=dropped).groupby(group_cols + combo + [treatment_col], sort=True).sum().reset_index()
+        frames.extend(cell_results(rolled, combo))
+
+    cube = pd.concat(frames, ignore_index=True)
+    cube.loc[cube['metric_name'].isin([f'{m}_cuped' for m in cuped_metrics]), 'method'] = 'cuped'
+
+    # 4. FDR control across the cube, raw and CUPED tests separately
+    family = np.where(cube['method'] == 'cuped', 'cuped', 'raw')
+    cube['p_value_adjusted'] = cube.groupby(group_cols + [family], sort=False)['p_value'].transform(benjamini_hochberg)
+
+    return cube
@@ -0,0 +1,109 @@
+import pandas as pd
+import numpy as np
+
+# Per-arm running state, one row per experiment x metric
+STATE_COLUMNS = ['n_t', 'sum_t', 'sumsq_t', 'n_c', 'sum_c', 'sumsq_c']
+
+def wide_moments(moments: pd.DataFrame, metric_cols: list, treatment_col='treatment', group_cols=('experiment_id',)) -> pd.DataFrame:
+    """
+    Reshapes per-arm moments (fetch_arm_moments / summarize_arm_moments layout) into one
+    row per group x metric with both arms side by side (STATE_COLUMNS).
+    """
+    group_cols = list(group_cols)
+    frames = []
+    for m in metric_cols:
+        arms = moments[group_cols + [treatment_col, f'{m}_n', f'{m}_sum', f'{m}_sumsq']]
+        arms = arms.rename(columns={f'{m}_n': 'n', f'{m}_sum': 'sum', f'{m}_sumsq': 'sumsq'})
+        t = arms[arms[treatment_col] == 1].drop(columns=[treatment_col])
+        c = arms[arms[treatment_col] == 0].drop(columns=[treatment_col])
+        wide = t.merge(c, on=group_cols, how='outer', suffixes=('_t', '_c')).fillna(0)
+        wide.insert(len(group_cols), 'metric_name', m)
+        frames.append(wide)
+
+    cols = group_cols + ['metric_name'] + STATE_COLUMNS
+    if not frames:
+        return pd.DataFrame(columns=cols)
+    return pd.concat(frames, ignore_index=True)[cols]
+
+def msprt_from_moments(n_t, sum_t, sumsq_t, n_c, sum_c, sumsq_c, alpha=0.05, mixing_scale=0.1):
+    """
+    Mixture SPRT (normal mixture over the effect) for the difference in means,
+    computed from cumulative per-arm moments. Vectorized over arrays.
+
+    The mixing variance is tau^2 = (mixing_scale * pooled sd)^2, i.e. the prior puts
+    typical effects at ~mixing_scale standard deviations.
+    Returns the effect, log likelihood ratio, the instantaneous always-valid p-value
+    min(1, 1/LR) and the (1 - alpha) confidence sequence at this sample size.
+    """
+    n_t, sum_t, sumsq_t = (np.asarray(a, dtype=float) for a in (n_t, sum_t, sumsq_t))
+    n_c, sum_c, sumsq_c = (np.asarray(a, dtype=float) for a in (n_c, sum_c, sumsq_c))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_t = sum_t / n_t
+        mean_c = sum_c / n_c
+        delta = mean_t - mean_c
+
+        var_t = np.maximum((sumsq_t - n_t * mean_t ** 2) / (n_t - 1), 0.0)
+        var_c = np.maximum((sumsq_c - n_c * mean_c ** 2) / (n_c - 1), 0.0)
+        n = n_t + n_c
+        var_pooled = np.maximum((sumsq_t + sumsq_c - (sum_t + sum_c) ** 2 / n) / (n - 1), 0.0)
+
+        # Variance of the difference in means and the mixing variance
+        V = var_t / n_t + var_c / n_c
+        tau2 = (mixing_scale ** 2) * var_pooled
+
+        log_lr = 0.5 * np.log(V / (V + tau2)) + tau2 * delta ** 2 / (2 * V * (V + tau2))
+        p_value = np.minimum(1.0, np.exp(-log_lr))
+
+        radius = np.sqrt(V * (V + tau2) / tau2 * (np.log((V + tau2) / V) - 2 * np.log(alpha)))
+
+    return {
+        'effect_estimate': delta,
+        'log_lr': log_lr,
+        'p_value': p_value,
+        'ci_low': delta - radius,
+        'ci_high': delta + radius,
+    }
+
+def update_sequential_state(state: pd.DataFrame, batch: pd.DataFrame, alpha=0.05, mixing_scale=0.1,
+                            keys=('experiment_id', 'metric_name')) -> pd.DataFrame:
+    """
+    O(new rows) update: adds a batch of per-arm moments (wide_moments layout) to the
+    running state and recomputes the mSPRT statistics.
+
+    The always-valid p-value is the running minimum of min(1, 1/LR) and the confidence
+    sequence is the running intersection, so both stay valid under continuous monitoring.
+    state may be empty (first batch); it carries p_value/ci_low/ci_high between updates.
+    """
+    keys = list(keys)
+    batch = batch[keys + STATE_COLUMNS]
+
+    if state is None or state.empty:
+        merged = batch.copy()
+        merged['prev_p_value'] = 1.0
+        merged['prev_ci_low'] = -np.inf
+        merged['prev_ci_high'] = np.inf
+    else:
+        prev = state[keys + STATE_COLUMNS + ['p_value', 'ci_low', 'ci_high']].rename(
+            columns={'p_value': 'prev_p_value', 'ci_low': 'prev_ci_low', 'ci_high': 'prev_ci_high'})
+        merged = prev.merge(batch, on=keys, how='outer', suffixes=('', '_new'))
+        for col in STATE_COLUMNS:
+            merged[col] = merged[col].fillna(0) + merged[f'{col}_new'].fillna(0)
+        merged = merged.drop(columns=[f'{col}_new' for col in STATE_COLUMNS])
+        merged['prev_p_value'] = merged['prev_p_value'].fillna(1.0)
+        merged['prev_ci_low'] = merged['prev_ci_low'].fillna(-np.inf)
+        merged['prev_ci_high'] = merged['prev_ci_high'].fillna(np.inf)
+
+    stats = msprt_from_moments(*(merged[c] for c in STATE_COLUMNS), alpha=alpha, mixing_scale=mixing_scale)
+
+    # Undefined statistics (e.g. an arm with < 2 units) leave the running values unchanged
+    p_now = np.where(np.isnan(stats['p_value']), 1.0, stats['p_value'])
+    low_now = np.where(np.isnan(stats['ci_low']), -np.inf, stats['ci_low'])
+    high_now = np.where(np.isnan(stats['ci_high']), np.inf, stats['ci_high'])
+
+    merged['effect_estimate'] = stats['effect_estimate']
+    merged['p_value'] = np.minimum(merged['prev_p_value'], p_now)
+    merged['ci_low'] = np.maximum(merged['prev_ci_low'], low_now)
+    merged['ci_high'] = np.minimum(merged['prev_ci_high'], high_now)
+
+    return merged.drop(columns=['prev_p_value', 'prev_ci_low', 'prev_ci_high']).reset_index(drop=True)
@@ -0,0 +1,26 @@
+import re
+
+import pandas as pd
+from sqlalchemy import text
+
+def read_sql(engine, query: str, params=None) -> pd.DataFrame:
+    """
+    Runs a read query on a SQLAlchemy engine or connection, or on any store that
+    provides its own read_frame(query, params) (e.g. a local Parquet warehouse).
+    Binds use the :name style in both cases.
+    """
+    if hasattr(engine, 'read_frame'):
+        return engine.read_frame(query, params)
+    return pd.read_sql(text(query), engine, params=params or {})
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def quote_identifier(name: str) -> str:
+    """
+    A column name as a quoted SQL identifier, for names that can't be bound as
+    parameters (e.g. metric columns chosen by the caller). Rejects anything but
+    plain identifiers.
+    """
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid column name: {name!r}")
+    return f'"{name}"'
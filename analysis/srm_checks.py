@@ -1,43 +1,123 @@
 import pandas as pd
-from scipy.stats import chisquare
+import numpy as np
+from scipy.stats import chi2 as chi2_dist
+from analysis.sql import quote_identifier, read_sql
 import logging
 
 logger = logging.getLogger(__name__)
 
-def check_srm(df: pd.DataFrame, treatment_col='treatment') -> dict:
+def _srm_status(p_value):
+    return np.select([p_value < 0.001, p_value < 0.01], ['FAIL', 'WARN'], default='PASS')
+
+def _allocation_weights(arms, allocation) -> np.ndarray:
+    """
+    Allocation weights aligned with `arms`, normalized to sum to 1.
+    allocation maps arm -> weight (keys may be strings, as stored in JSONB).
+    """
+    allocation = {int(arm): float(w) for arm, w in allocation.items()}
+    weights = np.array([allocation.get(int(arm), 0.0) for arm in arms])
+    return weights / weights.sum()
+
+def srm_from_counts(counts: dict, allocation=None) -> dict:
+    """
+    SRM result for a single experiment from its per-arm counts ({arm: n}).
+    """
+    frame = pd.DataFrame({'experiment_id': 0, 'treatment': list(counts), 'n': list(counts.values())})
+    return check_srm_batch(frame, {0: allocation}, experiment_ids=[0]).iloc[0]['result']
+
+def check_srm(df: pd.DataFrame, treatment_col='treatment', allocation=None) -> dict:
     """
     Performs a Chi-Square test for Sample Ratio Mismatch.
-    Assumes 50/50 allocation if not specified.
+    allocation maps arm -> weight for any number of arms; equal split if not specified.
     """
     if df.empty:
         return {'status': 'FAIL', 'p_value': 0.0, 'details': 'No data'}
 
-    observed_counts = df[treatment_col].value_counts().sort_index()
-    
-    # Ensure zero counts are handled if a group is missing entirely
-    possible_treatments = [0, 1] 
-    observed = [int(observed_counts.get(t, 0)) for t in possible_treatments]
-    total_n = sum(observed)
-    
-    # Expected counts (assuming 50/50)
-    expected = [float(total_n / 2), float(total_n / 2)]
-    
-    chi2, p_value = chisquare(f_obs=observed, f_exp=expected)
-    
-    status = 'PASS'
-    if p_value < 0.001:
-        status = 'FAIL'
-    elif p_value < 0.01:
-        status = 'WARN'
-        
-    return {
+    observed_counts = df[treatment_col].value_counts()
+    return srm_from_counts({int(t): int(n) for t, n in observed_counts.items()}, allocation)
+
+def fetch_arm_counts(engine, treatment_col='treatment', table='experimentation.experiment_observations',
+                     experiment_ids=None) -> pd.DataFrame:
+    """
+    Units per experiment and arm, from a single GROUP BY over the mart.
+    Returns columns experiment_id, treatment_col, n.
+    """
+    treatment = quote_identifier(treatment_col)
+    query = f"SELECT experiment_id, {treatment}, COUNT(*) AS n FROM {table}"
+    params = {}
+    if experiment_ids is not None:
+        query += " WHERE experiment_id = ANY(:experiment_ids)"
+        params['experiment_ids'] = [int(e) for e in experiment_ids]
+    query += f" GROUP BY experiment_id, {treatment} ORDER BY experiment_id, {treatment}"
+    return read_sql(engine, query, params)
+
+def check_srm_batch(counts: pd.DataFrame, allocations=None, treatment_col='treatment', experiment_ids=None) -> pd.DataFrame:
+    """
+    Vectorized SRM for many experiments at once.
+
+    counts has one row per experiment x arm (fetch_arm_counts layout); allocations maps
+    experiment_id -> {arm: weight}; missing or None means an equal split over arms 0/1
+    and any other observed arm.
+    experiment_ids adds experiments without any rows (reported as 'No data').
+    Returns one row per experiment: experiment_id, status, p_value, chi2_stat, result
+    (the same dict check_srm returns).
+    """
+    allocations = allocations or {}
+    table = counts.pivot_table(index='experiment_id', columns=treatment_col, values='n', aggfunc='sum', fill_value=0)
+    if experiment_ids is not None:
+        table = table.reindex(sorted({int(e) for e in experiment_ids} | set(table.index)), fill_value=0)
+
+    # 1. Arm universe: observed arms, 0/1 and every allocated arm
+    allocated = {int(a) for alloc in allocations.values() if alloc for a in alloc}
+    arms = sorted({int(a) for a in table.columns} | {0, 1} | allocated)
+    table.columns = [int(a) for a in table.columns]
+    observed = table.reindex(columns=arms, fill_value=0).to_numpy(dtype=float)
+
+    # 2. Weights matrix (experiments x arms)
+    default_arms = np.isin(arms, [0, 1]) | (observed > 0)
+    weights = np.array([
+        _allocation_weights(arms, allocations[e]) if allocations.get(e) else default_arms[i] / default_arms[i].sum()
+        for i, e in enumerate(table.index)
+    ]).reshape(len(table), len(arms))
+
+    # 3. Chi-square over planned arms; units in unplanned arms fail outright
+    total_n = observed.sum(axis=1)
+    expected = total_n[:, None] * weights
+    planned = weights > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(planned, (observed - expected) ** 2 / expected, 0.0)
+    chi2 = np.nan_to_num(terms).sum(axis=1)
+    dof = np.maximum(planned.sum(axis=1) - 1, 1)
+    p_value = chi2_dist.sf(chi2, dof)
+
+    unplanned = (np.where(planned, 0, observed) > 0).any(axis=1)
+    no_data = total_n == 0
+    chi2 = np.where(unplanned, np.inf, chi2)
+    p_value = np.where(unplanned | no_data, 0.0, p_value)
+    status = _srm_status(p_value)
+
+    results = []
+    for i, experiment_id in enumerate(table.index):
+        if no_data[i]:
+            results.append({'status': 'FAIL', 'p_value': 0.0, 'details': 'No data'})
+            continue
+        keep = planned[i] | (observed[i] > 0)
+        results.append({
+            'status': str(status[i]),
+            'p_value': float(p_value[i]),
+            'check_name': 'SRM',
+            'details': {
+                'observed': {a: int(o) for a, o, k in zip(arms, observed[i], keep) if k},
+                'expected': {a: float(x) for a, x, k in zip(arms, expected[i], keep) if k},
+                'total_n': int(total_n[i]),
+                'chi2_stat': float(chi2[i]) if np.isfinite(chi2[i]) else None
+            }
+        })
+
+    return pd.DataFrame({
+        'experiment_id': table.index.astype(int),
         'status': status,
-        'p_value': float(p_value),
-        'check_name': 'SRM',
-        'details': {
-            'observed': dict(zip(possible_treatments, observed)),
-            'expected': dict(zip(possible_treatments, expected)),
-            'total_n': int(total_n),
-            'chi2_stat': float(chi2)
-        }
-    }
+        'p_value': p_value,
+        'chi2_stat': chi2,
+        'result': results,
+    })
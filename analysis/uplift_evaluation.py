@@ -0,0 +1,174 @@
+import warnings
+
+import pandas as pd
+import numpy as np
+
+from analysis.bootstrap import BLOCK_ELEMENTS, poisson_weights
+
+# np.trapz was renamed np.trapezoid in numpy 2.0
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+# Targeting fractions evaluated by default: 1%, 2%, ..., 100%
+DEFAULT_CUTOFFS = np.round(np.linspace(0.01, 1.0, 100), 2)
+
+CURVE_COLUMNS = ['cutoff', 'n_targeted', 'uplift', 'uplift_ci_low', 'uplift_ci_high', 'qini', 'qini_ci_low', 'qini_ci_high']
+
+def _rank(y_true, uplift, treatment):
+    # Descending by score, ties in input order (the same ranking as sklift's metrics)
+    uplift = np.asarray(uplift, dtype=float)
+    order = np.argsort(uplift, kind='mergesort')[::-1]
+    y = np.asarray(y_true, dtype=float)[order]
+    t = np.asarray(treatment, dtype=float)[order]
+    if not (np.isin(y, (0, 1)).all() and np.isin(t, (0, 1)).all()):
+        raise ValueError("Uplift evaluation needs a binary outcome and a 0/1 treatment")
+
+    # Curve thresholds: the last position of every run of tied scores
+    scores = uplift[order]
+    thresholds = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1] + 1
+    return y, t, thresholds
+
+def _prefix_sums(y, t, weights=None) -> np.ndarray:
+    """
+    (weighted) units, treated units, treated conversions and control conversions among
+    the first i ranked units, for every i in 0..n: array (4, replicates, n + 1).
+    One cumulative-sum pass serves every cut-off, so their number does not change the cost.
+    """
+    columns = np.stack([np.ones_like(y), t, y * t, y * (1 - t)])
+    weights = np.ones((1, len(y))) if weights is None else weights
+    sums = np.zeros((4, len(weights), len(y) + 1))
+    np.multiply(weights[None, :, :], columns[:, None, :], out=sums[:, :, 1:])
+    np.cumsum(sums, axis=2, out=sums)
+    return sums
+
+def _at(sums, ends):
+    # Prefix sums at end positions; a view when every position is an end (no tied scores)
+    if len(ends) == sums.shape[2] - 1:
+        return sums[:, :, 1:]
+    return sums[:, :, ends]
+
+def _qini_values(n, n_t, y_t, y_c):
+    # Incremental conversions among the targeted units (control scaled to the treated count)
+    n_c = n - n_t
+    return y_t - y_c * np.divide(n_t, n_c, out=np.zeros_like(n_t), where=n_c > 0)
+
+def _uplift_values(n, n_t, y_t, y_c):
+    # Conversion-rate difference among the targeted units (NaN while an arm is empty)
+    n_c = n - n_t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((n_t > 0) & (n_c > 0), y_t / n_t - y_c / n_c, np.nan)
+
+def _qini_auc(sums, thresholds):
+    """
+    Normalized area under the Qini curve (sklift.metrics.qini_auc_score, negative effects
+    included), from the prefix sums at the tie thresholds; vectorized over replicates.
+    """
+    at = _at(sums, thresholds)
+    zeros = np.zeros((at.shape[1], 1))
+    x = np.concatenate([zeros, at[0]], axis=1)
+    qini = np.concatenate([zeros, _qini_values(*at)], axis=1)
+
+    # The perfect ranking has three tied groups: treated converters, non-converters,
+    # control converters, so its curve has closed-form corners
+    n, n_t, y_t, y_c = sums[:, :, -1]
+    final = _qini_values(n, n_t, y_t, y_c)
+    perfect_x = np.stack([np.zeros_like(n), y_t, n - y_c, n], axis=1)
+    perfect_y = np.stack([np.zeros_like(n), y_t, y_t, final], axis=1)
+
+    baseline = n * final / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (_trapezoid(qini, x, axis=1) - baseline) / (_trapezoid(perfect_y, perfect_x, axis=1) - baseline)
+
+def _percentiles(values, bounds, axis=0):
+    # NaN-aware only when needed (nanpercentile loops over columns); all-NaN columns stay NaN
+    if not np.isnan(values).any():
+        return np.percentile(values, bounds, axis=axis)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanpercentile(values, bounds, axis=axis)
+
+def evaluate_uplift(y_true, uplift, treatment, cutoffs=DEFAULT_CUTOFFS, n_bootstrap=200, alpha=0.05, seed=0) -> dict:
+    """
+    Qini AUC plus the full Qini and uplift curves at every targeting fraction in `cutoffs`,
+    from a single sort of the scores and cumulative sums over the ranked units.
+
+    Confidence bands come from a Poisson bootstrap of the evaluation units: each replicate
+    reweights the fixed ranking, so all replicates share the sort and are computed as
+    batched (replicates x units) cumulative sums. Cut-offs are positions in the observed
+    ranking (top int(n * k) units, as sklift.metrics.uplift_at_k).
+    Returns {'qini_auc', 'qini_auc_ci_low', 'qini_auc_ci_high', 'curve' (CURVE_COLUMNS DataFrame)}.
+    """
+    y, t, thresholds = _rank(y_true, uplift, treatment)
+    cutoffs = np.asarray(cutoffs, dtype=float)
+    if ((cutoffs <= 0) | (cutoffs > 1)).any():
+        raise ValueError("cutoffs must be fractions in (0, 1]")
+    n_targeted = (len(y) * cutoffs).astype(int)
+
+    # 1. Point estimates
+    sums = _prefix_sums(y, t)
+    at_cutoffs = sums[:, :, n_targeted]
+    curve = pd.DataFrame({'cutoff': cutoffs, 'n_targeted': n_targeted,
+                          'uplift': _uplift_values(*at_cutoffs)[0], 'qini': _qini_values(*at_cutoffs)[0]})
+    result = {'qini_auc': float(_qini_auc(sums, thresholds)[0])}
+
+    # 2. Bootstrap bands, in replicate blocks that bound memory
+    if n_bootstrap:
+        rng = np.random.default_rng(seed)
+        boot_auc, boot_qini, boot_uplift = [], [], []
+        block = max(1, BLOCK_ELEMENTS // (8 * max(len(y), 1)))
+        for start in range(0, n_bootstrap, block):
+            weights = poisson_weights(rng, (min(block, n_bootstrap - start), len(y)))
+            sums = _prefix_sums(y, t, weights)
+            at_cutoffs = sums[:, :, n_targeted]
+            boot_auc.append(_qini_auc(sums, thresholds))
+            boot_qini.append(_qini_values(*at_cutoffs))
+            boot_uplift.append(_uplift_values(*at_cutoffs))
+
+        bounds = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+        auc_low, auc_high = _percentiles(np.concatenate(boot_auc), bounds)
+        curve['qini_ci_low'], curve['qini_ci_high'] = _percentiles(np.concatenate(boot_qini), bounds)
+        curve['uplift_ci_low'], curve['uplift_ci_high'] = _percentiles(np.concatenate(boot_uplift), bounds)
+        result.update(qini_auc_ci_low=float(auc_low), qini_auc_ci_high=float(auc_high))
+    else:
+        for col in ['qini_ci_low', 'qini_ci_high', 'uplift_ci_low', 'uplift_ci_high']:
+            curve[col] = np.nan
+        result.update(qini_auc_ci_low=np.nan, qini_auc_ci_high=np.nan)
+
+    result['curve'] = curve[CURVE_COLUMNS]
+    return result
+
+def qini_auc(y_true, uplift, treatment) -> float:
+    """
+    Normalized Qini AUC without curves or bootstrap (same value as sklift's qini_auc_score).
+    """
+    y, t, thresholds = _rank(y_true, uplift, treatment)
+    return float(_qini_auc(_prefix_sums(y, t), thresholds)[0])
+
+def curve_at(curve: pd.DataFrame, cutoff: float) -> pd.Series:
+    """
+    The curve row of a targeting fraction.
+    """
+    match = np.isclose(curve['cutoff'], cutoff)
+    if not match.any():
+        raise ValueError(f"Cut-off {cutoff} was not evaluated")
+    return curve.loc[match].iloc[0]
+
+def expected_value_lift(curve: pd.DataFrame, cutoff=0.3) -> float:
+    """
+    Incremental conversions from targeting the top `cutoff` by score, relative to
+    targeting the same number of units at random (1.0 = no better than random).
+    NaN when the experiment has no positive overall effect to allocate.
+    """
+    total = curve_at(curve, 1.0)['qini']
+    if not total > 0:
+        return float('nan')
+    row = curve_at(curve, cutoff)
+    return float(row['qini'] / (total * row['n_targeted'] / curve_at(curve, 1.0)['n_targeted']))
+
+def compact_curve(curve: pd.DataFrame, decimals=6) -> dict:
+    """
+    Column-oriented, rounded curve ({column: [values]}, NaN as null) for JSON storage.
+    """
+    return {
+        col: [None if pd.isna(v) else (int(v) if col == 'n_targeted' else round(float(v), decimals)) for v in curve[col]]
+        for col in CURVE_COLUMNS
+    }
@@ -1,46 +1,364 @@
+import math
+from itertools import product
+
 import pandas as pd
+import numpy as np
+from joblib import Parallel, delayed
 
-from sklearn.model_selection import train_test_split
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklift.models import SoloModel, ClassTransformation
-from sklift.metrics import qini_auc_score, uplift_at_k
 
 # Note: CatBoost is heavy, usually fine, but if we want lighter we can use RandomForest
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import (RandomForestClassifier, RandomForestRegressor,
+                              HistGradientBoostingClassifier, HistGradientBoostingRegressor)
+
+from analysis.model_store import model_key
+from analysis.uplift_evaluation import evaluate_uplift, qini_auc, curve_at, expected_value_lift, compact_curve
+
+DEFAULT_PARAMS = {'n_estimators': 50, 'max_depth': 5, 'random_state': 42}
+
+HIST_GRADIENT_BOOSTING_PARAMS = {'max_iter': 100, 'learning_rate': 0.1, 'max_leaf_nodes': 31, 'random_state': 42}
+
+# Base estimator backends: classifier/regressor classes and default hyperparameters.
+# Only histogram gradient boosting splits on raw categorical columns natively.
+ESTIMATOR_BACKENDS = {
+    'random_forest': {
+        'classifier': RandomForestClassifier, 'regressor': RandomForestRegressor,
+        'params': DEFAULT_PARAMS, 'native_categorical': False,
+    },
+    'hist_gradient_boosting': {
+        'classifier': HistGradientBoostingClassifier, 'regressor': HistGradientBoostingRegressor,
+        'params': HIST_GRADIENT_BOOSTING_PARAMS, 'native_categorical': True,
+    },
+}
+
+UPLIFT_METHODS = ('class_transform', 'solo_model', 't_learner', 'x_learner')
+
+DECILE_QUANTILES = np.linspace(0.1, 0.9, 9)
+
+# Grid for tune_uplift_model: uplift methods x RandomForest hyperparameters
+DEFAULT_SEARCH_SPACE = {
+    'method': ['class_transform', 'solo_model'],
+    'n_estimators': [50, 150],
+    'max_depth': [3, 5, 8],
+    'min_samples_leaf': [1, 50],
+}
+
+SEARCH_SPACES = {
+    'random_forest': DEFAULT_SEARCH_SPACE,
+    'hist_gradient_boosting': {
+        'method': ['class_transform', 'solo_model'],
+        'learning_rate': [0.05, 0.1],
+        'max_leaf_nodes': [15, 31],
+        'min_samples_leaf': [20, 100],
+    },
+}
+
+def _positive_proba(model, X) -> np.ndarray:
+    # P(y = 1); an arm without any conversion (or only conversions) gives a constant
+    proba = model.predict_proba(X)
+    if proba.shape[1] == 1:
+        return np.full(len(proba), float(model.classes_[0] == 1))
+    return proba[:, 1]
+
+class TLearner:
+    """
+    T-learner: one outcome model per arm; CATE = P(y | x, treated) - P(y | x, control).
+    """
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    def fit(self, X, y, treatment):
+        y, treated = np.asarray(y), np.asarray(treatment) == 1
+        self.model_t_ = clone(self.estimator).fit(X[treated], y[treated])
+        self.model_c_ = clone(self.estimator).fit(X[~treated], y[~treated])
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        return _positive_proba(self.model_t_, X) - _positive_proba(self.model_c_, X)
+
+class XLearner(TLearner):
+    """
+    X-learner (Kunzel et al., 2019): the T-learner's outcome models impute individual effects
+    (treated: y - mu_c(x), control: mu_t(x) - y), which per-arm regressors then smooth.
+    The two effect models are blended by the propensity; in a randomized experiment that
+    is the constant treated share, so no propensity model is fitted.
+    """
+    def __init__(self, estimator, regressor):
+        self.estimator = estimator
+        self.regressor = regressor
+
+    def fit(self, X, y, treatment):
+        super().fit(X, y, treatment)
+        y, treated = np.asarray(y, dtype=float), np.asarray(treatment) == 1
+        X_t, X_c = X[treated], X[~treated]
+        self.effect_t_ = clone(self.regressor).fit(X_t, y[treated] - _positive_proba(self.model_c_, X_t))
+        self.effect_c_ = clone(self.regressor).fit(X_c, _positive_proba(self.model_t_, X_c) - y[~treated])
+        self.propensity_ = float(treated.mean())
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        # Weight the effect model of the arm with fewer units less (tau = g * tau_c + (1 - g) * tau_t)
+        g = self.propensity_
+        return g * self.effect_c_.predict(X) + (1 - g) * self.effect_t_.predict(X)
+
+class CategoricalUpliftModel:
+    """
+    Wraps an uplift model so raw categorical columns are cast to pandas categoricals with
+    the levels seen in training (unseen levels become missing) before every fit/predict.
+    Stored as one object, so scoring applies the training encoding.
+    """
+    def __init__(self, model, categories: dict):
+        self.model = model
+        self.categories = categories
+
+    def encode(self, X: pd.DataFrame) -> pd.DataFrame:
+        return X.assign(**{col: pd.Categorical(X[col].where(X[col].isin(levels)), categories=levels)
+                           for col, levels in self.categories.items()})
+
+    def fit(self, X, y, treatment):
+        self.model.fit(self.encode(X), y, treatment)
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        return self.model.predict(self.encode(X))
+
+def _categorical_levels(df: pd.DataFrame, feature_cols: list, estimator: str) -> dict:
+    # Non-numeric feature columns and their sorted levels; only backends with native support accept them
+    if estimator not in ESTIMATOR_BACKENDS:
+        raise ValueError(f"Unknown estimator '{estimator}'; expected one of {sorted(ESTIMATOR_BACKENDS)}")
+    categorical = [col for col in feature_cols if not pd.api.types.is_numeric_dtype(df[col])]
+    if categorical and not ESTIMATOR_BACKENDS[estimator]['native_categorical']:
+        raise ValueError(f"Estimator '{estimator}' needs numeric features (one-hot encode {categorical}, "
+                         "or use estimator='hist_gradient_boosting')")
+    return {col: sorted(str(v) for v in df[col].dropna().unique()) for col in categorical}
+
+def _make_estimator(estimator, kind, params, n_jobs=None):
+    backend = ESTIMATOR_BACKENDS[estimator]
+    if backend['native_categorical']:
+        # Histogram GBMs parallelize with OpenMP threads; categorical columns come from the dtype
+        return backend[kind](**params, categorical_features='from_dtype')
+    return backend[kind](**params, n_jobs=n_jobs)
+
+def _make_uplift_model(method, params, n_jobs=None, estimator='random_forest'):
+    # n_jobs only affects speed, not the fitted forest, so it is not part of params/model keys
+    classifier = _make_estimator(estimator, 'classifier', params, n_jobs)
+    
+    if method == 'class_transform':
+        return ClassTransformation(estimator=classifier)
+    if method == 'solo_model':
+        return SoloModel(estimator=classifier)
+    if method == 't_learner':
+        return TLearner(classifier)
+    if method == 'x_learner':
+        return XLearner(classifier, _make_estimator(estimator, 'regressor', params, n_jobs))
+    raise ValueError(f"Unknown uplift method '{method}'; expected one of {list(UPLIFT_METHODS)}")
 
-def train_uplift_model(df: pd.DataFrame, feature_cols: list, treatment_col='treatment', outcome_col='outcome_conversion', method='class_transform'):
+def train_uplift_model(df: pd.DataFrame, feature_cols: list, treatment_col='treatment', outcome_col='outcome_conversion', method='class_transform',
+                       params=None, model_store=None, n_jobs=None, metadata=None, estimator='random_forest'):
     """
     Trains an uplift model.
+    method is a sklift approach (class_transform, solo_model) or a meta-learner (t_learner,
+    x_learner); estimator picks the base estimator backend (ESTIMATOR_BACKENDS). With
+    'hist_gradient_boosting', non-numeric feature columns (e.g. raw zip_code/channel) are
+    used as native categoricals instead of one-hot columns.
+    With a model_store (analysis.model_store.ModelStore), the model is content-addressed by
+    the training data, features, method and hyperparameters: a hit returns the stored
+    metrics without fitting. The result's 'model_key' loads the fitted model for scoring.
+    n_jobs is passed to the forest; metadata is stored alongside the model.
     """
+    categories = _categorical_levels(df, feature_cols, estimator)
+    params = dict(ESTIMATOR_BACKENDS[estimator]['params'], **(params or {}))
     X = df[feature_cols]
     y = df[outcome_col]
     treat = df[treatment_col]
     
+    key = model_key([X.to_numpy(), y.to_numpy(), treat.to_numpy()], features=list(feature_cols), method=method,
+                    estimator=estimator, params=params, test_size=0.3, split_seed=42)
+    if model_store is not None:
+        cached = model_store.get_metadata(key)
+        if cached is not None:
+            return dict(cached['metrics'], model_key=key, cache_hit=True)
+    
     # Split for valid evaluation
     X_train, X_val, y_train, y_val, treat_train, treat_val = train_test_split(
         X, y, treat, test_size=0.3, random_state=42, stratify=treat
     )
     
     # Base estimator
-    estimator = RandomForestClassifier(n_estimators=50, max_depth=5, random_state=42)
-    
-    if method == 'class_transform':
-        uplift_model = ClassTransformation(estimator=estimator)
-    else:
-        uplift_model = SoloModel(estimator=estimator)
-        
+    uplift_model = _make_uplift_model(method, params, n_jobs, estimator)
+    if categories:
+        uplift_model = CategoricalUpliftModel(uplift_model, categories)
     uplift_model.fit(X_train, y_train, treat_train)
     
     # Predictions
     uplift_scores = uplift_model.predict(X_val)
     
-    # Evaluate
-    qini_auc = qini_auc_score(y_val, uplift_scores, treat_val)
-    lift_at_30 = uplift_at_k(y_val, uplift_scores, treat_val, strategy='overall', k=0.3)
+    # Evaluate: full Qini/uplift curves with bootstrap bands, from one sort of the scores
+    evaluation = evaluate_uplift(y_val, uplift_scores, treat_val)
+    curve = evaluation['curve']
+    at_30 = curve_at(curve, 0.3)
     
-    return {
-        'model_name': method,
-        'qini_auc': float(qini_auc),
-        'uplift_at_30': float(lift_at_30),
-        'targeting_fraction': 0.3, # For the metric above
-        'expected_value_lift': float(lift_at_30) # Proxy for now
+    metrics = {
+        'model_name': method if estimator == 'random_forest' else f'{method}_{estimator}',
+        'qini_auc': evaluation['qini_auc'],
+        'qini_auc_ci_low': evaluation['qini_auc_ci_low'],
+        'qini_auc_ci_high': evaluation['qini_auc_ci_high'],
+        'uplift_at_30': float(at_30['uplift']),
+        'uplift_at_30_ci_low': float(at_30['uplift_ci_low']),
+        'uplift_at_30_ci_high': float(at_30['uplift_ci_high']),
+        'targeting_fraction': 0.3, # For the metrics above
+        'expected_value_lift': expected_value_lift(curve, 0.3), # Incremental conversions vs random targeting
+        'curve': compact_curve(curve),
     }
+    
+    if model_store is not None:
+        # Validation-score deciles, so streamed scoring can bin units without a global sort
+        cut_points = np.quantile(uplift_scores, DECILE_QUANTILES).tolist()
+        model_store.put(key, uplift_model, dict(metadata or {}, method=method, estimator=estimator, params=params, features=list(feature_cols),
+                                                n_rows=len(df), metrics=metrics, decile_cut_points=cut_points))
+    
+    return dict(metrics, model_key=key, cache_hit=False)
+
+def load_uplift_model(model_store, key):
+    """
+    Fitted uplift model for a model_key from train_uplift_model, or None if evicted.
+    """
+    entry = model_store.get(key)
+    return entry[0] if entry is not None else None
+
+def uplift_deciles(scores, cut_points) -> np.ndarray:
+    """
+    Decile of each score against ascending cut points: 1 = highest predicted uplift
+    (target first), 10 = lowest.
+    """
+    return (len(cut_points) + 1 - np.searchsorted(np.asarray(cut_points), scores, side='right')).astype(np.int16)
+
+def score_uplift(model, chunks, feature_cols: list, cut_points=None, id_col='unit_id'):
+    """
+    Streams per-unit CATE predictions: for each input chunk yields a DataFrame
+    (id_col, uplift_score, decile) with one vectorized predict call per chunk, so memory
+    stays bounded by the chunk size. Without cut_points (e.g. a model stored before they
+    were recorded) the deciles of the first chunk are used for all chunks.
+    """
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        scores = np.asarray(model.predict(chunk[feature_cols]), dtype=np.float64)
+        if cut_points is None:
+            cut_points = np.quantile(scores, DECILE_QUANTILES)
+        yield pd.DataFrame({
+            id_col: chunk[id_col].to_numpy(),
+            'uplift_score': scores,
+            'decile': uplift_deciles(scores, cut_points),
+        })
+
+def _search_candidates(search_space: dict, estimator='random_forest') -> list:
+    space = dict(search_space)
+    methods = space.pop('method', list(UPLIFT_METHODS))
+    names = list(space)
+    defaults = ESTIMATOR_BACKENDS[estimator]['params']
+    return [
+        {'method': method, 'params': dict(defaults, **dict(zip(names, values)))}
+        for method in methods for values in product(*space.values())
+    ]
+
+def _take(X, idx):
+    return X.iloc[idx] if isinstance(X, pd.DataFrame) else X[idx]
+
+def _fold_qini(X, y, treat, train_idx, val_idx, method, params, estimator='random_forest'):
+    # One candidate on one fold; X/y/treat are shared (memory-mapped by joblib for large arrays)
+    model = _make_uplift_model(method, params, n_jobs=1, estimator=estimator)
+    model.fit(_take(X, train_idx), y[train_idx], treat[train_idx])
+    return qini_auc(y[val_idx], model.predict(_take(X, val_idx)), treat[val_idx])
+
+def tune_uplift_model(df: pd.DataFrame, feature_cols: list, treatment_col='treatment', outcome_col='outcome_conversion',
+                      search_space=None, n_folds=3, eta=3, min_rows=2000, n_jobs=-1, random_state=42, model_store=None,
+                      estimator='random_forest'):
+    """
+    Hyperparameter and uplift-method search scored by Qini AUC on validation folds,
+    with successive halving: every candidate starts on a small subsample of each fold's
+    training rows; after each rung only the best 1/eta (by mean fold Qini) continue,
+    on eta times more rows, until the last rung uses all of them.
+
+    The search runs on the training part of train_uplift_model's split (the 30% holdout is
+    never seen), with one pre-converted float32 matrix shared by all (candidate, fold)
+    fits across n_jobs processes (with categorical columns, a DataFrame with the training
+    levels instead). The winner is refit with train_uplift_model.
+    search_space defaults to SEARCH_SPACES[estimator].
+    With a model_store, a search over unchanged data and settings is not repeated.
+    Returns (result dict as train_uplift_model, with 'params'; search trace DataFrame).
+    """
+    categories = _categorical_levels(df, feature_cols, estimator)
+    search_space = search_space or SEARCH_SPACES[estimator]
+    candidates = _search_candidates(search_space, estimator)
+    
+    search_key = model_key([df[feature_cols].to_numpy(), df[outcome_col].to_numpy(), df[treatment_col].to_numpy()],
+                           kind='search', features=list(feature_cols), estimator=estimator, search_space=search_space, n_folds=n_folds,
+                           eta=eta, min_rows=min_rows, random_state=random_state)
+    if model_store is not None:
+        cached = model_store.get_metadata(search_key)
+        if cached is not None and model_store.get_metadata(cached['result']['model_key']) is not None:
+            return dict(cached['result'], cache_hit=True), pd.DataFrame(cached['trace'])
+    
+    # 1. Same split as train_uplift_model; search on the training part only
+    if categories:
+        X = CategoricalUpliftModel(None, categories).encode(df[feature_cols]).reset_index(drop=True)
+    else:
+        X = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float32))
+    y = df[outcome_col].to_numpy()
+    treat = df[treatment_col].to_numpy()
+    train_idx, _ = train_test_split(np.arange(len(df)), test_size=0.3, random_state=42, stratify=treat)
+    X, y, treat = _take(X, train_idx), y[train_idx], treat[train_idx]
+    
+    # 2. Folds stratified by arm x outcome; rung subsamples are nested prefixes of a shuffle
+    rng = np.random.default_rng(random_state)
+    folds = []
+    for fold_train, fold_val in StratifiedKFold(n_folds, shuffle=True, random_state=random_state).split(X, treat * 2 + y):
+        folds.append((rng.permutation(fold_train), fold_val))
+    
+    n_rungs = max(1, math.ceil(math.log(len(candidates), eta))) if len(candidates) > 1 else 1
+    full_rows = min(len(f[0]) for f in folds)
+    
+    trace = []
+    alive = list(range(len(candidates)))
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for rung in range(n_rungs):
+            rows = full_rows if rung == n_rungs - 1 else max(min_rows, int(full_rows / eta ** (n_rungs - 1 - rung)))
+            rows = min(rows, full_rows)
+            
+            scores = parallel(
+                delayed(_fold_qini)(X, y, treat, fold_train[:rows], fold_val,
+                                    candidates[c]['method'], candidates[c]['params'], estimator)
+                for c in alive for fold_train, fold_val in folds
+            )
+            scores = np.array(scores).reshape(len(alive), n_folds)
+            mean = scores.mean(axis=1)
+            
+            # Early stopping: only the top 1/eta go on to the next rung
+            n_keep = max(1, len(alive) // eta) if rung < n_rungs - 1 else 1
+            ranked = [alive[i] for i in np.argsort(-mean, kind='stable')]
+            survivors = set(ranked[:n_keep])
+            for i, c in enumerate(alive):
+                trace.append({
+                    'rung': rung, 'candidate': c, 'method': candidates[c]['method'],
+                    **{k: v for k, v in candidates[c]['params'].items() if k != 'random_state'},
+                    'train_rows': rows, 'qini_mean': float(mean[i]), 'qini_std': float(scores[i].std()),
+                    'promoted': c in survivors,
+                })
+            alive = ranked[:n_keep]
+            if len(alive) == 1:
+                break
+    
+    # 3. Refit the winner on the full training split, evaluated on the untouched holdout
+    best = candidates[alive[0]]
+    trace = pd.DataFrame(trace)
+    result = train_uplift_model(df, feature_cols, treatment_col, outcome_col, method=best['method'],
+                                params=best['params'], model_store=model_store, n_jobs=n_jobs,
+                                metadata={'search_key': search_key}, estimator=estimator)
+    result['params'] = best['params']
+    
+    if model_store is not None:
+        model_store.put(search_key, None, {'result': result, 'trace': trace.to_dict(orient='records')})
+    return result, trace
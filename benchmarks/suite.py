@@ -0,0 +1,248 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from analysis.ab_tests import calculate_ab_stats
+from analysis.cuped import calculate_cuped_stats
+from analysis.srm_checks import check_srm
+from analysis.uplift_models import train_uplift_model
+from orchestration.dagster_app.assets_marts import transform_hillstrom_batch
+from orchestration.dagster_app.feature_store import build_feature_frame, FEATURE_COLUMNS, NUMERIC_FEATURES
+from scripts.generate_experiments import experiment_specs, _chunk
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# Row counts per scale; each case is run at every size up to its own limit (CASES)
+SCALES = {
+    'small': (10_000,),
+    'medium': (10_000, 100_000),
+    'large': (10_000, 100_000, 1_000_000),
+    'full': (10_000, 100_000, 1_000_000, 10_000_000),
+}
+
+# Relative slowdown / memory growth over the baseline that counts as a regression, and
+# absolute differences below which a change is treated as noise
+TIME_THRESHOLD = 0.25
+MEMORY_THRESHOLD = 0.20
+MIN_SECONDS_DELTA = 0.01
+MIN_MEMORY_DELTA_MB = 1.0
+
+def observations(n, n_covariates=0, seed=42) -> pd.DataFrame:
+    """
+    n synthetic mart rows (scripts/generate_experiments layout) with the typed feature
+    columns, plus n_covariates extra pre-experiment covariates x0..x{k-1} that are
+    partly predictive of the visit outcome (the many-covariate setting).
+    """
+    spec = experiment_specs(1, lift=0.03, seed=seed)[0]
+    raw = _chunk(spec, n, 0, np.random.default_rng(seed), '2023-01-01', 14).to_pandas()
+    raw['zip_code'] = raw['zip_code'].astype(str)
+    raw['channel'] = raw['channel'].astype(str)
+    df = pd.concat([raw[['experiment_id', 'unit_id', 'treatment', 'outcome_visit', 'outcome_conversion']],
+                    build_feature_frame(raw)], axis=1)
+
+    rng = np.random.default_rng([seed, n_covariates])
+    signal = df['outcome_visit'].to_numpy(dtype=float)
+    for i in range(n_covariates):
+        df[f'x{i}'] = rng.normal(0, 1, n) + signal * rng.uniform(0, 0.5)
+    return df
+
+def raw_hillstrom(n, seed=42) -> pd.DataFrame:
+    # raw.hillstrom-shaped rows (segment/visit/conversion strings and flags) for the mart transform
+    spec = experiment_specs(1, lift=0.03, seed=seed)[0]
+    raw = _chunk(spec, n, 0, np.random.default_rng(seed), '2023-01-01', 14).to_pandas()
+    return pd.DataFrame({
+        'recency': raw['recency'].astype('int64'),
+        'history': raw['history'].astype('float64'),
+        'mens': raw['mens'].astype('int64'),
+        'womens': raw['womens'].astype('int64'),
+        'zip_code': raw['zip_code'].astype(str).replace({'Suburban': 'Surburban'}),
+        'newbie': raw['newbie'].astype('int64'),
+        'channel': raw['channel'].astype(str),
+        'segment': np.where(raw['treatment'] == 1, 'Mens E-Mail', 'No E-Mail'),
+        'visit': raw['outcome_visit'].astype('int64'),
+        'conversion': raw['outcome_conversion'].astype('int64'),
+    })
+
+def _covariates(k):
+    return NUMERIC_FEATURES + [f'x{i}' for i in range(k)]
+
+# name -> data(n, k), run(data, k), and {covariate count: largest row count} to sweep.
+# Wide settings stop earlier (CUPED with 50 covariates peaks at ~3 GB for 1e6 rows), and
+# uplift training at 1e5 rows: a 1e6-row forest is a nightly-sized job, not a benchmark.
+CASES = {
+    'ab_stats': {
+        'data': lambda n, k: observations(n),
+        'run': lambda df, k: calculate_ab_stats(df, 'outcome_conversion', metric_type='binary'),
+        'covariates': {0: 10_000_000},
+    },
+    'cuped': {
+        'data': observations,
+        'run': lambda df, k: calculate_cuped_stats(df, 'outcome_visit', _covariates(k)),
+        'covariates': {0: 10_000_000, 50: 1_000_000},
+    },
+    'srm': {
+        'data': lambda n, k: observations(n),
+        'run': lambda df, k: check_srm(df),
+        'covariates': {0: 10_000_000},
+    },
+    'uplift_train': {
+        'data': observations,
+        'run': lambda df, k: train_uplift_model(df, FEATURE_COLUMNS + [f'x{i}' for i in range(k)], n_jobs=1),
+        'covariates': {0: 100_000, 50: 100_000},
+    },
+    'mart_transform': {
+        'data': lambda n, k: raw_hillstrom(n),
+        'run': lambda df, k: transform_hillstrom_batch(df, 1, '2023-01-01'),
+        'covariates': {0: 10_000_000},
+    },
+}
+
+def measure(run, repeats=3) -> dict:
+    """
+    One run under tracemalloc for the peak Python/NumPy heap allocated by the call (it
+    also warms caches and lazy imports), then the best-of-`repeats` untraced wall time.
+    Allocations made directly by compiled extensions (e.g. scikit-learn tree builders)
+    are not seen by tracemalloc.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+    return {'seconds': min(seconds), 'peak_mb': peak / 2 ** 20}
+
+def run_suite(sizes, only=None, repeats=3) -> pd.DataFrame:
+    """
+    Runs every case (or those named in `only`) at each size and covariate count.
+    Returns one row per benchmark key with seconds and peak_mb.
+    """
+    rows = []
+    for name, case in CASES.items():
+        if only and name not in only:
+            continue
+        for n in sizes:
+            for k, max_rows in case['covariates'].items():
+                if n > max_rows:
+                    continue
+                key = f'{name}[n={n},k={k}]'
+                data = case['data'](n, k)
+                result = measure(partial(case['run'], data, k), repeats=repeats)
+                del data
+                rows.append({'benchmark': key, 'name': name, 'rows': n, 'covariates': k, **result})
+                logger.info(f"{key}: {result['seconds']:.4f}s, peak {result['peak_mb']:.1f} MB")
+    return pd.DataFrame(rows, columns=['benchmark', 'name', 'rows', 'covariates', 'seconds', 'peak_mb'])
+
+def machine_info() -> dict:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+def load_baselines(path=BASELINE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {'machine': None, 'benchmarks': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baselines(results: pd.DataFrame, path=BASELINE_PATH) -> dict:
+    """
+    Merges `results` into the baseline file (other benchmarks keep their baseline) and
+    records the machine the baselines were taken on.
+    """
+    baselines = load_baselines(path)
+    for row in results.to_dict(orient='records'):
+        baselines['benchmarks'][row['benchmark']] = {
+            'seconds': round(row['seconds'], 6), 'peak_mb': round(row['peak_mb'], 3),
+        }
+    baselines['machine'] = machine_info()
+    baselines['benchmarks'] = dict(sorted(baselines['benchmarks'].items()))
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2)
+        f.write('\n')
+    return baselines
+
+def compare_to_baseline(results: pd.DataFrame, baselines: dict, time_threshold=TIME_THRESHOLD,
+                        memory_threshold=MEMORY_THRESHOLD) -> pd.DataFrame:
+    """
+    Adds baseline values, ratios and a status per benchmark: 'regression' when time or
+    peak memory exceeds the baseline by more than its threshold (and by more than the
+    noise floor), 'improved' when both are clearly better, 'new' without a baseline.
+    """
+    known = baselines.get('benchmarks', {})
+    compared = results.copy()
+    compared['baseline_seconds'] = [known.get(key, {}).get('seconds', np.nan) for key in results['benchmark']]
+    compared['baseline_peak_mb'] = [known.get(key, {}).get('peak_mb', np.nan) for key in results['benchmark']]
+    compared['time_ratio'] = compared['seconds'] / compared['baseline_seconds']
+    compared['memory_ratio'] = compared['peak_mb'] / compared['baseline_peak_mb']
+
+    slower = ((compared['time_ratio'] > 1 + time_threshold)
+              & (compared['seconds'] - compared['baseline_seconds'] > MIN_SECONDS_DELTA))
+    larger = ((compared['memory_ratio'] > 1 + memory_threshold)
+              & (compared['peak_mb'] - compared['baseline_peak_mb'] > MIN_MEMORY_DELTA_MB))
+    faster = compared['time_ratio'] < 1 / (1 + time_threshold)
+    smaller = compared['memory_ratio'] <= 1 + memory_threshold
+
+    compared['status'] = np.select(
+        [compared['baseline_seconds'].isna(), slower | larger, faster & smaller],
+        ['new', 'regression', 'improved'], default='ok',
+    )
+    return compared
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and peak-memory benchmarks for the analysis package.")
+    parser.add_argument("--scale", default="small", choices=list(SCALES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=None, help="Row counts; overrides --scale")
+    parser.add_argument("--only", nargs="+", default=None, choices=list(CASES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Record these results as the new baseline")
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD)
+    parser.add_argument("--output", default=None, help="Optional CSV path for the results")
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes or SCALES[args.scale], args.only, args.repeats)
+
+    if args.save_baseline:
+        save_baselines(results, args.baseline)
+        logger.info(f"Saved {len(results)} baselines to {args.baseline}")
+        print(results.to_string(index=False))
+        sys.exit(0)
+
+    baselines = load_baselines(args.baseline)
+    if baselines['machine'] and baselines['machine'] != machine_info():
+        logger.warning(f"Baselines were taken on a different machine: {baselines['machine']}")
+    compared = compare_to_baseline(results, baselines, args.time_threshold, args.memory_threshold)
+    print(compared.drop(columns=['name', 'rows', 'covariates']).to_string(index=False, float_format='%.4f'))
+    if args.output:
+        compared.to_csv(args.output, index=False)
+
+    regressions = compared[compared['status'] == 'regression']
+    if not regressions.empty:
+        logger.error(f"{len(regressions)} regression(s): {', '.join(regressions['benchmark'])}")
+        sys.exit(1)
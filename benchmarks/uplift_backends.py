@@ -0,0 +1,87 @@
+import argparse
+import logging
+import time
+
+import pandas as pd
+
+from sklearn.model_selection import train_test_split
+
+from analysis.uplift_evaluation import qini_auc
+from analysis.uplift_models import _make_uplift_model, CategoricalUpliftModel, ESTIMATOR_BACKENDS
+from orchestration.dagster_app.feature_store import (
+    build_feature_frame, NUMERIC_FEATURES, CATEGORICAL_FEATURES, FEATURE_COLUMNS, CATEGORICAL_LEVELS,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (label, estimator backend, feature columns): the current RF setup on the one-hot mart
+# columns against histogram gradient boosting on one-hot and on raw categorical columns
+SETUPS = [
+    ('rf_one_hot', 'random_forest', FEATURE_COLUMNS),
+    ('hgb_one_hot', 'hist_gradient_boosting', FEATURE_COLUMNS),
+    ('hgb_native', 'hist_gradient_boosting', NUMERIC_FEATURES + CATEGORICAL_FEATURES),
+]
+
+def load_hillstrom(path, outcome='conversion', treatment_segment=None):
+    """
+    Hillstrom rows as (features..., treatment, outcome), like the mart: any e-mail vs
+    'No E-Mail', or a single e-mail segment vs 'No E-Mail'.
+    """
+    raw = pd.read_csv(path)
+    if treatment_segment:
+        raw = raw[raw['segment'].isin([treatment_segment, 'No E-Mail'])].reset_index(drop=True)
+    df = build_feature_frame(raw)
+    df['treatment'] = (raw['segment'] != 'No E-Mail').astype(int)
+    df['outcome'] = raw[outcome].astype(int)
+    return df
+
+def run_benchmark(df, methods, n_jobs=None, repeats=1):
+    """
+    Fit time, predict time and validation Qini AUC per (setup, method), on the same
+    70/30 split train_uplift_model uses. Times are the best of `repeats` runs.
+    """
+    train, val = train_test_split(df, test_size=0.3, random_state=42, stratify=df['treatment'])
+    rows = []
+    for label, estimator, feature_cols in SETUPS:
+        params = ESTIMATOR_BACKENDS[estimator]['params']
+        for method in methods:
+            fit_seconds, predict_seconds = [], []
+            for _ in range(repeats):
+                model = _make_uplift_model(method, params, n_jobs, estimator)
+                if set(CATEGORICAL_FEATURES) & set(feature_cols):
+                    model = CategoricalUpliftModel(model, {col: CATEGORICAL_LEVELS[col] for col in CATEGORICAL_FEATURES})
+
+                start = time.perf_counter()
+                model.fit(train[feature_cols], train['outcome'], train['treatment'])
+                fit_seconds.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                scores = model.predict(val[feature_cols])
+                predict_seconds.append(time.perf_counter() - start)
+
+            rows.append({
+                'setup': label, 'method': method, 'n_features': len(feature_cols),
+                'fit_seconds': min(fit_seconds), 'predict_seconds': min(predict_seconds),
+                'qini_auc': qini_auc(val['outcome'], scores, val['treatment']),
+            })
+            logger.info(f"{label} / {method}: fit {min(fit_seconds):.2f}s, predict {min(predict_seconds):.2f}s, "
+                        f"qini {rows[-1]['qini_auc']:.4f}")
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare uplift estimator backends (fit/predict time, Qini).")
+    parser.add_argument("--input-file", default="data/hillstrom.csv")
+    parser.add_argument("--outcome", default="conversion", choices=["conversion", "visit"])
+    parser.add_argument("--treatment-segment", default=None, help="e.g. 'Mens E-Mail'; default: any e-mail")
+    parser.add_argument("--methods", nargs="+", default=["class_transform", "solo_model", "t_learner", "x_learner"])
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Optional CSV path for the results")
+    args = parser.parse_args()
+
+    data = load_hillstrom(args.input_file, args.outcome, args.treatment_segment)
+    results = run_benchmark(data, args.methods, args.n_jobs, args.repeats)
+    print(results.to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
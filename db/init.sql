@@ -11,19 +11,49 @@ CREATE TABLE IF NOT EXISTS experimentation.experiment_registry (
     end_date DATE,
     status VARCHAR(50) DEFAULT 'planning', -- planning, active, analyzed, archived
     primary_metric VARCHAR(100),
-    hypothesis TEXT
+    hypothesis TEXT,
+    allocation JSONB -- Planned traffic split per arm, e.g. {"0": 0.5, "1": 0.5}; NULL = equal split
 );
 
 -- 2. Experiment Observations (The "Mart")
 -- Optimized for analysis. One row per user per experiment.
+-- List-partitioned by experiment: per-experiment reads and partition replaces only touch
+-- that experiment's table. The registry seed adds experiment_observations_<id> for every
+-- registered experiment; rows of unregistered experiments land in the default partition.
 CREATE TABLE IF NOT EXISTS experimentation.experiment_observations (
     experiment_id INT REFERENCES experimentation.experiment_registry(experiment_id),
     unit_id VARCHAR(255),
     treatment INT, -- 0 = Control, 1 = Treatment
-    features JSONB, -- Pre-experiment covariates for CUPED/Uplift
     outcome_visit INT, -- Auxiliary metric
     outcome_conversion INT, -- Primary metric (spend > 0)
-    batch_date DATE
+    batch_date DATE,
+    PRIMARY KEY (experiment_id, unit_id)
+) PARTITION BY LIST (experiment_id);
+CREATE TABLE IF NOT EXISTS experimentation.experiment_observations_default
+    PARTITION OF experimentation.experiment_observations DEFAULT;
+CREATE INDEX IF NOT EXISTS experiment_observations_batch_idx
+    ON experimentation.experiment_observations (experiment_id, batch_date);
+
+-- 2b. Experiment Features (typed, columnar companion to the mart)
+-- Pre-experiment covariates for CUPED/Uplift, one typed column per feature.
+CREATE TABLE IF NOT EXISTS experimentation.experiment_features (
+    experiment_id INT,
+    unit_id VARCHAR(255),
+    batch_date DATE, -- Mart partition the unit was loaded in
+    recency DOUBLE PRECISION,
+    history DOUBLE PRECISION,
+    mens DOUBLE PRECISION,
+    womens DOUBLE PRECISION,
+    newbie DOUBLE PRECISION,
+    zip_code_rural DOUBLE PRECISION, -- One-hot of zip_code
+    zip_code_suburban DOUBLE PRECISION,
+    zip_code_urban DOUBLE PRECISION,
+    channel_multichannel DOUBLE PRECISION, -- One-hot of channel
+    channel_phone DOUBLE PRECISION,
+    channel_web DOUBLE PRECISION,
+    zip_code VARCHAR(50), -- Raw categories (segmentation / native categorical models)
+    channel VARCHAR(50),
+    PRIMARY KEY (experiment_id, unit_id)
 );
 
 -- 3. Results Store (Aggregated stats)
@@ -36,9 +66,37 @@ CREATE TABLE IF NOT EXISTS experimentation.experiment_results (
     ci_low FLOAT,
     ci_high FLOAT,
     p_value FLOAT,
+    p_value_adjusted FLOAT, -- FDR (Benjamini-Hochberg) across an experiment's segment cube, raw and CUPED tests as separate families
     sample_size INT,
+    prob_treatment_better FLOAT, -- bayesian rows: P(treatment > control)
+    expected_loss_treatment FLOAT, -- bayesian rows: E[max(control - treatment, 0)]
+    expected_loss_control FLOAT, -- bayesian rows: E[max(treatment - control, 0)]
     computed_at TIMESTAMP DEFAULT NOW()
 );
+CREATE INDEX IF NOT EXISTS experiment_results_experiment_computed_idx
+    ON experimentation.experiment_results (experiment_id, computed_at DESC) INCLUDE (metric_name, method, segment);
+-- Sort order of latest_experiment_results: its refresh reads this index instead of sorting the history
+CREATE INDEX IF NOT EXISTS experiment_results_latest_idx
+    ON experimentation.experiment_results (experiment_id, metric_name, method, segment, computed_at DESC);
+
+-- 3b. Sequential Monitoring State (running per-arm moments, one row per experiment x metric)
+CREATE TABLE IF NOT EXISTS experimentation.sequential_state (
+    experiment_id INT REFERENCES experimentation.experiment_registry(experiment_id),
+    metric_name VARCHAR(100),
+    n_t BIGINT,
+    sum_t DOUBLE PRECISION,
+    sumsq_t DOUBLE PRECISION,
+    n_c BIGINT,
+    sum_c DOUBLE PRECISION,
+    sumsq_c DOUBLE PRECISION,
+    effect_estimate FLOAT,
+    p_value FLOAT, -- always-valid (running minimum)
+    ci_low FLOAT, -- confidence sequence (running intersection)
+    ci_high FLOAT,
+    last_batch_date DATE,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (experiment_id, metric_name)
+);
 
 -- 4. Health Checks (SRM, etc.)
 CREATE TABLE IF NOT EXISTS experimentation.experiment_health_checks (
@@ -48,17 +106,39 @@ CREATE TABLE IF NOT EXISTS experimentation.experiment_health_checks (
     details JSONB, -- P-values, observed counts
     computed_at TIMESTAMP DEFAULT NOW()
 );
+CREATE INDEX IF NOT EXISTS experiment_health_checks_experiment_computed_idx
+    ON experimentation.experiment_health_checks (experiment_id, computed_at DESC) INCLUDE (check_name, status);
+-- Sort order of latest_health_checks
+CREATE INDEX IF NOT EXISTS experiment_health_checks_latest_idx
+    ON experimentation.experiment_health_checks (experiment_id, check_name, computed_at DESC);
 
 -- 5. Uplift/Policy Results
 CREATE TABLE IF NOT EXISTS experimentation.uplift_policy_results (
     experiment_id INT REFERENCES experimentation.experiment_registry(experiment_id),
     model_name VARCHAR(100),
     qini_auc FLOAT,
+    qini_auc_ci_low FLOAT, -- Bootstrap 95% CI on the validation set
+    qini_auc_ci_high FLOAT,
     uplift_auc FLOAT,
     expected_value_lift FLOAT, -- e.g. "Expected lift matches random targeting * 1.5"
     targeting_fraction FLOAT, -- e.g. 0.3 (Top 30%)
+    model_key VARCHAR(64), -- Content address of the fitted model in the local model store
+    curve JSONB, -- Qini/uplift curves by targeting fraction with CI bands, column-oriented ({"cutoff": [...], "uplift": [...], ...})
     computed_at TIMESTAMP DEFAULT NOW()
 );
+CREATE INDEX IF NOT EXISTS uplift_policy_results_experiment_computed_idx
+    ON experimentation.uplift_policy_results (experiment_id, computed_at DESC) INCLUDE (model_name, qini_auc, model_key);
+
+-- 5b. Uplift Scores (per-unit CATE from the experiment's best stored model)
+CREATE TABLE IF NOT EXISTS experimentation.uplift_scores (
+    experiment_id INT REFERENCES experimentation.experiment_registry(experiment_id),
+    unit_id VARCHAR(255),
+    model_key VARCHAR(64),
+    uplift_score FLOAT,
+    decile SMALLINT, -- 1 = highest predicted uplift (validation-set cut points)
+    scored_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (experiment_id, unit_id)
+);
 
 -- 6. Decision Reports
 CREATE TABLE IF NOT EXISTS experimentation.decision_reports (
@@ -70,6 +150,51 @@ CREATE TABLE IF NOT EXISTS experimentation.decision_reports (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- 7. Pipeline Metrics (per-asset / per-experiment phase timings, for trending regressions)
+CREATE TABLE IF NOT EXISTS experimentation.pipeline_metrics (
+    run_id VARCHAR(64),
+    asset_name VARCHAR(255),
+    partition_key VARCHAR(255),
+    experiment_id INT, -- NULL for asset-level phases
+    phase VARCHAR(100), -- total, experiment, sql_fetch, parse, fit, write, ...
+    seconds FLOAT,
+    rows BIGINT,
+    bytes BIGINT, -- In-memory size of the data the phase moved
+    peak_rss_mb FLOAT, -- Peak resident memory of the process during the phase
+    recorded_at TIMESTAMP DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS pipeline_metrics_asset_phase_idx
+    ON experimentation.pipeline_metrics (asset_name, phase, recorded_at);
+
+-- 8. Latest Results (what reports and dashboards look up)
+-- Refreshed by the assets that append to the underlying tables, in the same transaction.
+-- The unique indexes serve the lookups and allow REFRESH ... CONCURRENTLY.
+-- Latest result per experiment x metric x method x segment
+CREATE MATERIALIZED VIEW IF NOT EXISTS experimentation.latest_experiment_results AS
+    SELECT DISTINCT ON (experiment_id, metric_name, method, segment) *
+    FROM experimentation.experiment_results
+    ORDER BY experiment_id, metric_name, method, segment, computed_at DESC;
+CREATE UNIQUE INDEX IF NOT EXISTS latest_experiment_results_key
+    ON experimentation.latest_experiment_results (experiment_id, metric_name, method, segment);
+
+-- Latest run of each check per experiment
+CREATE MATERIALIZED VIEW IF NOT EXISTS experimentation.latest_health_checks AS
+    SELECT DISTINCT ON (experiment_id, check_name) *
+    FROM experimentation.experiment_health_checks
+    ORDER BY experiment_id, check_name, computed_at DESC;
+CREATE UNIQUE INDEX IF NOT EXISTS latest_health_checks_key
+    ON experimentation.latest_health_checks (experiment_id, check_name);
+
+-- Models of each experiment's latest uplift training run
+CREATE MATERIALIZED VIEW IF NOT EXISTS experimentation.latest_uplift_results AS
+    SELECT * FROM (
+        SELECT *, MAX(computed_at) OVER (PARTITION BY experiment_id) AS latest_at
+        FROM experimentation.uplift_policy_results
+    ) runs
+    WHERE computed_at = latest_at;
+CREATE UNIQUE INDEX IF NOT EXISTS latest_uplift_results_key
+    ON experimentation.latest_uplift_results (experiment_id, model_name);
+
 -- RAW DATA (Hillstrom)
 DROP TABLE IF EXISTS raw.criteo_uplift;
 DROP TABLE IF EXISTS raw.hillstrom;
@@ -0,0 +1,67 @@
+-- Typed feature columns and planned allocations
+ALTER TABLE experimentation.experiment_registry ADD COLUMN IF NOT EXISTS allocation JSONB;
+
+CREATE TABLE IF NOT EXISTS experimentation.experiment_features (
+    experiment_id INT,
+    unit_id VARCHAR(255),
+    batch_date DATE,
+    recency DOUBLE PRECISION,
+    history DOUBLE PRECISION,
+    mens DOUBLE PRECISION,
+    womens DOUBLE PRECISION,
+    newbie DOUBLE PRECISION,
+    zip_code_rural DOUBLE PRECISION,
+    zip_code_suburban DOUBLE PRECISION,
+    zip_code_urban DOUBLE PRECISION,
+    channel_multichannel DOUBLE PRECISION,
+    channel_phone DOUBLE PRECISION,
+    channel_web DOUBLE PRECISION,
+    zip_code VARCHAR(50),
+    channel VARCHAR(50),
+    PRIMARY KEY (experiment_id, unit_id)
+);
+
+-- experiment_observations becomes list-partitioned by experiment_id. A plain table (from
+-- the first init.sql, or as rewritten by the old to_sql mart) is renamed, its rows are
+-- copied into one partition per registered experiment (or the default partition), and
+-- it is dropped. The JSONB features column is not carried over: the mart rebuilds the
+-- features into experiment_features from the raw data.
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('experimentation.experiment_observations')) = 'r' THEN
+        ALTER TABLE experimentation.experiment_observations RENAME TO experiment_observations_unpartitioned;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS experimentation.experiment_observations (
+    experiment_id INT REFERENCES experimentation.experiment_registry(experiment_id),
+    unit_id VARCHAR(255),
+    treatment INT,
+    outcome_visit INT,
+    outcome_conversion INT,
+    batch_date DATE,
+    PRIMARY KEY (experiment_id, unit_id)
+) PARTITION BY LIST (experiment_id);
+CREATE TABLE IF NOT EXISTS experimentation.experiment_observations_default
+    PARTITION OF experimentation.experiment_observations DEFAULT;
+CREATE INDEX IF NOT EXISTS experiment_observations_batch_idx
+    ON experimentation.experiment_observations (experiment_id, batch_date);
+
+DO $$
+DECLARE
+    id INT;
+BEGIN
+    IF to_regclass('experimentation.experiment_observations_unpartitioned') IS NOT NULL THEN
+        FOR id IN SELECT experiment_id FROM experimentation.experiment_registry LOOP
+            EXECUTE format('CREATE TABLE IF NOT EXISTS experimentation.experiment_observations_%s '
+                           'PARTITION OF experimentation.experiment_observations FOR VALUES IN (%s)', id, id);
+        END LOOP;
+        -- Explicit casts: to_sql wrote BIGINT/TEXT columns
+        INSERT INTO experimentation.experiment_observations
+            (experiment_id, unit_id, treatment, outcome_visit, outcome_conversion, batch_date)
+        SELECT experiment_id::int, unit_id::varchar, treatment::int, outcome_visit::int,
+               outcome_conversion::int, batch_date::date
+        FROM experimentation.experiment_observations_unpartitioned;
+        DROP TABLE experimentation.experiment_observations_unpartitioned;
+    END IF;
+END $$;
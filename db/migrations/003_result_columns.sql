@@ -0,0 +1,56 @@
+-- Columns and tables added to the results store: FDR-adjusted and Bayesian results,
+-- sequential monitoring state, uplift CIs/curves/model keys and scores, pipeline metrics
+ALTER TABLE experimentation.experiment_results
+    ADD COLUMN IF NOT EXISTS p_value_adjusted FLOAT,
+    ADD COLUMN IF NOT EXISTS prob_treatment_better FLOAT,
+    ADD COLUMN IF NOT EXISTS expected_loss_treatment FLOAT,
+    ADD COLUMN IF NOT EXISTS expected_loss_control FLOAT;
+
+CREATE TABLE IF NOT EXISTS experimentation.sequential_state (
+    experiment_id INT REFERENCES experimentation.experiment_registry(experiment_id),
+    metric_name VARCHAR(100),
+    n_t BIGINT,
+    sum_t DOUBLE PRECISION,
+    sumsq_t DOUBLE PRECISION,
+    n_c BIGINT,
+    sum_c DOUBLE PRECISION,
+    sumsq_c DOUBLE PRECISION,
+    effect_estimate FLOAT,
+    p_value FLOAT,
+    ci_low FLOAT,
+    ci_high FLOAT,
+    last_batch_date DATE,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (experiment_id, metric_name)
+);
+
+ALTER TABLE experimentation.uplift_policy_results
+    ADD COLUMN IF NOT EXISTS qini_auc_ci_low FLOAT,
+    ADD COLUMN IF NOT EXISTS qini_auc_ci_high FLOAT,
+    ADD COLUMN IF NOT EXISTS model_key VARCHAR(64),
+    ADD COLUMN IF NOT EXISTS curve JSONB;
+
+CREATE TABLE IF NOT EXISTS experimentation.uplift_scores (
+    experiment_id INT REFERENCES experimentation.experiment_registry(experiment_id),
+    unit_id VARCHAR(255),
+    model_key VARCHAR(64),
+    uplift_score FLOAT,
+    decile SMALLINT,
+    scored_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (experiment_id, unit_id)
+);
+
+CREATE TABLE IF NOT EXISTS experimentation.pipeline_metrics (
+    run_id VARCHAR(64),
+    asset_name VARCHAR(255),
+    partition_key VARCHAR(255),
+    experiment_id INT,
+    phase VARCHAR(100),
+    seconds FLOAT,
+    rows BIGINT,
+    bytes BIGINT,
+    peak_rss_mb FLOAT,
+    recorded_at TIMESTAMP DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS pipeline_metrics_asset_phase_idx
+    ON experimentation.pipeline_metrics (asset_name, phase, recorded_at);
@@ -0,0 +1,37 @@
+-- Indexes on the append-only results tables and the latest-result views (see db/init.sql)
+CREATE INDEX IF NOT EXISTS experiment_results_experiment_computed_idx
+    ON experimentation.experiment_results (experiment_id, computed_at DESC) INCLUDE (metric_name, method, segment);
+CREATE INDEX IF NOT EXISTS experiment_results_latest_idx
+    ON experimentation.experiment_results (experiment_id, metric_name, method, segment, computed_at DESC);
+CREATE INDEX IF NOT EXISTS experiment_health_checks_experiment_computed_idx
+    ON experimentation.experiment_health_checks (experiment_id, computed_at DESC) INCLUDE (check_name, status);
+CREATE INDEX IF NOT EXISTS experiment_health_checks_latest_idx
+    ON experimentation.experiment_health_checks (experiment_id, check_name, computed_at DESC);
+CREATE INDEX IF NOT EXISTS uplift_policy_results_experiment_computed_idx
+    ON experimentation.uplift_policy_results (experiment_id, computed_at DESC) INCLUDE (model_name, qini_auc, model_key);
+
+-- Latest result per experiment x metric x method x segment
+CREATE MATERIALIZED VIEW IF NOT EXISTS experimentation.latest_experiment_results AS
+    SELECT DISTINCT ON (experiment_id, metric_name, method, segment) *
+    FROM experimentation.experiment_results
+    ORDER BY experiment_id, metric_name, method, segment, computed_at DESC;
+CREATE UNIQUE INDEX IF NOT EXISTS latest_experiment_results_key
+    ON experimentation.latest_experiment_results (experiment_id, metric_name, method, segment);
+
+-- Latest run of each check per experiment
+CREATE MATERIALIZED VIEW IF NOT EXISTS experimentation.latest_health_checks AS
+    SELECT DISTINCT ON (experiment_id, check_name) *
+    FROM experimentation.experiment_health_checks
+    ORDER BY experiment_id, check_name, computed_at DESC;
+CREATE UNIQUE INDEX IF NOT EXISTS latest_health_checks_key
+    ON experimentation.latest_health_checks (experiment_id, check_name);
+
+-- Models of each experiment's latest uplift training run
+CREATE MATERIALIZED VIEW IF NOT EXISTS experimentation.latest_uplift_results AS
+    SELECT * FROM (
+        SELECT *, MAX(computed_at) OVER (PARTITION BY experiment_id) AS latest_at
+        FROM experimentation.uplift_policy_results
+    ) runs
+    WHERE computed_at = latest_at;
+CREATE UNIQUE INDEX IF NOT EXISTS latest_uplift_results_key
+    ON experimentation.latest_uplift_results (experiment_id, model_name);
@@ -0,0 +1,81 @@
+from dagster import asset, Config, AssetExecutionContext
+import pandas as pd
+from functools import partial
+from pydantic import Field
+from analysis.segments import segment_cube
+from .database import DatabaseResource, transaction
+from .feature_store import NUMERIC_FEATURES
+from .partitions import MART_ASSET_KEY, select_experiments
+from .observation_cache import ObservationCache, mart_data_versions
+from .execution import run_per_experiment, resource_settings
+from .instrumentation import asset_metrics, phase, frame_bytes
+
+METRICS = {'outcome_conversion': 'binary', 'outcome_visit': 'continuous'}
+
+class SegmentConfig(Config):
+    segment_cols: list[str] = Field(default_factory=lambda: ['zip_code', 'channel', 'newbie'])
+    max_depth: int | None = None # Columns per combination; None = full cube
+    execution_mode: str = "serial" # serial | process
+    max_workers: int = 4 # Also bounds concurrent DB connections
+    bayesian: bool = True # Also P(T > C) and expected loss rows per cell
+
+def _segments_for_experiment(db_settings, cache_settings, versions, segment_cols, max_depth, bayesian, exp_id):
+    """
+    Segment cube for one experiment (runs in a worker process in 'process' mode):
+    A/B on conversion and visits plus CUPED conversion (and optionally Bayesian rows),
+    for every segment combination.
+    """
+    engine = DatabaseResource(**db_settings).get_engine()
+    observation_cache = ObservationCache(**cache_settings)
+    
+    columns = ['treatment'] + list(METRICS) + list(dict.fromkeys(segment_cols + NUMERIC_FEATURES))
+    with phase('sql_fetch') as stats:
+        df = observation_cache.load_frame(engine, exp_id, versions.get(exp_id), columns=columns)
+        stats.update(rows=len(df), bytes=frame_bytes(df))
+    if df.empty:
+        return pd.DataFrame()
+    
+    with phase('fit', rows=len(df)):
+        cube = segment_cube(df, METRICS, segment_cols, cuped_metrics=['outcome_conversion'],
+                            covariate_cols=NUMERIC_FEATURES, max_depth=max_depth, include_overall=False,
+                            bayesian=bayesian)
+    cube['experiment_id'] = exp_id
+    # Same name as the overall CUPED row in experiment_results
+    cube['metric_name'] = cube['metric_name'].replace({'outcome_conversion_cuped': 'conversion_cuped'})
+    return cube
+
+@asset(deps=[MART_ASSET_KEY])
+def segment_results_asset(context: AssetExecutionContext, config: SegmentConfig, database: DatabaseResource,
+                          observation_cache: ObservationCache):
+    """
+    Heterogeneous effects: every zip_code/channel/newbie slice (and their combinations)
+    from one grouped aggregation per experiment, with Benjamini-Hochberg FDR control
+    across each experiment's cube.
+    """
+    engine = database.get_engine()
+    
+    with asset_metrics(context, engine):
+        # Only experiments with new mart partitions since the last run (all on first run)
+        experiments = select_experiments(context, engine)
+        versions = mart_data_versions(context.instance)
+        
+        cube_fn = partial(_segments_for_experiment, resource_settings(database), resource_settings(observation_cache), versions,
+                          list(config.segment_cols), config.max_depth, config.bayesian)
+        cubes, failures = run_per_experiment(context, cube_fn, experiments['experiment_id'],
+                                             config.execution_mode, config.max_workers)
+        cubes = [c for c in cubes.values() if not c.empty]
+        if not cubes:
+            return f"No segment results ({len(failures)} experiments failed)."
+        
+        results_df = pd.concat(cubes, ignore_index=True)
+        cols = ['experiment_id', 'metric_name', 'effect_estimate', 'ci_low', 'ci_high',
+                'p_value', 'p_value_adjusted', 'method', 'segment', 'sample_size',
+                'prob_treatment_better', 'expected_loss_treatment', 'expected_loss_control']
+        
+        # One bulk write for all cells of all experiments
+        with phase('write', rows=len(results_df)), transaction(engine) as tx:
+            tx.append('experimentation.experiment_results', results_df.reindex(columns=cols))
+            tx.refresh('experimentation.latest_experiment_results')
+    
+    significant = int((results_df['p_value_adjusted'] < 0.05).sum())
+    return f"Wrote {len(results_df)} segment results ({significant} significant after FDR, {len(failures)} experiments failed)."
@@ -0,0 +1,91 @@
+from dagster import asset, Config, AssetExecutionContext
+import pandas as pd
+from analysis.ab_tests import fetch_arm_moments
+from analysis.sequential import STATE_COLUMNS, wide_moments, update_sequential_state
+from .database import DatabaseResource, read_frame, transaction
+from .partitions import MART_ASSET_KEY
+from .instrumentation import asset_metrics, phase
+
+METRICS = ['outcome_conversion', 'outcome_visit']
+
+# sequential_state columns carried from run to run
+STATE_TABLE_COLUMNS = ['experiment_id', 'metric_name'] + STATE_COLUMNS + ['p_value', 'ci_low', 'ci_high', 'last_batch_date']
+
+class SequentialConfig(Config):
+    alpha: float = 0.05
+    mixing_scale: float = 0.1 # Prior effect scale, in pooled standard deviations
+
+@asset(deps=[MART_ASSET_KEY])
+def sequential_monitoring_asset(context: AssetExecutionContext, config: SequentialConfig, database: DatabaseResource):
+    """
+    Always-valid monitoring (mSPRT) of every experiment, one look per batch_date.
+    Keeps running per-arm moments in sequential_state and only scans batches newer than
+    each experiment's last_batch_date, so a daily run costs O(new rows).
+    Batches are treated as append-only: a re-materialized batch that was already
+    monitored does not change the state.
+    """
+    engine = database.get_engine()
+
+    with asset_metrics(context, engine):
+        # 1. Current state and the batches it already covers
+        with phase('sql_fetch'):
+            state = read_frame(engine, f"SELECT {', '.join(STATE_TABLE_COLUMNS)} FROM experimentation.sequential_state")
+            experiments = read_frame(engine, "SELECT experiment_id FROM experimentation.experiment_registry")
+        last_dates = state.groupby('experiment_id')['last_batch_date'].max()
+
+        # Experiments without state need their full history
+        has_state = experiments['experiment_id'].isin(last_dates.index).all()
+        since = last_dates.min() if has_state and not last_dates.empty else None
+
+        # 2. Per-arm moments of the new batches only (one GROUP BY),
+        # then drop batches an experiment has already seen
+        with phase('sql_fetch') as stats:
+            moments = fetch_arm_moments(engine, METRICS, group_cols=['experiment_id', 'batch_date'],
+                                        experiment_ids=experiments['experiment_id'].tolist(), since_batch_date=since)
+            stats['rows'] = len(moments)
+        seen_until = moments['experiment_id'].map(last_dates)
+        moments = moments[seen_until.isna() | (moments['batch_date'] > seen_until)]
+
+        if moments.empty:
+            return "No new batches to monitor."
+
+        # 3. One sequential look per batch_date, in order
+        with phase('fit', rows=len(moments)):
+            results = []
+            for batch_date, batch_moments in moments.groupby('batch_date', sort=True):
+                batch = wide_moments(batch_moments.drop(columns=['batch_date']), METRICS)
+                updated = update_sequential_state(state.drop(columns=['last_batch_date']), batch,
+                                                  alpha=config.alpha, mixing_scale=config.mixing_scale)
+
+                looked = updated.merge(batch[['experiment_id', 'metric_name']], on=['experiment_id', 'metric_name'])
+                looked = looked.assign(method='msprt', segment='all', sample_size=looked['n_t'] + looked['n_c'])
+                results.append(looked)
+
+                # Keep last_batch_date for keys without data in this batch
+                updated = updated.merge(state[['experiment_id', 'metric_name', 'last_batch_date']],
+                                        on=['experiment_id', 'metric_name'], how='left')
+                batch_keys = updated.set_index(['experiment_id', 'metric_name']).index.isin(
+                    batch.set_index(['experiment_id', 'metric_name']).index)
+                updated.loc[batch_keys, 'last_batch_date'] = batch_date
+                state = updated
+
+        # 4. Replace the state in one transaction
+        state_df = state.copy()
+        for col in ['n_t', 'n_c']:
+            state_df[col] = state_df[col].astype('int64')
+        with phase('write') as stats, transaction(engine) as tx:
+            tx.delete('experimentation.sequential_state')
+            tx.append('experimentation.sequential_state', state_df)
+
+            results_df = pd.concat(results, ignore_index=True)
+            cols = ['experiment_id', 'metric_name', 'effect_estimate', 'ci_low', 'ci_high',
+                    'p_value', 'method', 'segment', 'sample_size']
+            tx.append('experimentation.experiment_results', results_df[cols])
+            tx.refresh('experimentation.latest_experiment_results')
+            stats['rows'] = len(state_df) + len(results_df)
+
+    stopped = state_df[state_df['p_value'] < config.alpha]
+    for row in stopped.itertuples():
+        context.log.info(f"Experiment {row.experiment_id} {row.metric_name}: always-valid p={row.p_value:.4g}, safe to stop.")
+
+    return f"Monitored {moments['batch_date'].nunique()} new batches ({len(results_df)} looks)."
@@ -0,0 +1,129 @@
+import csv
+import io
+import logging
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Explicit column types for raw.hillstrom (matches db/init.sql)
+HILLSTROM_COLUMNS = {
+    'recency': 'INT',
+    'history_segment': 'VARCHAR(100)',
+    'history': 'FLOAT',
+    'mens': 'INT',
+    'womens': 'INT',
+    'zip_code': 'VARCHAR(50)',
+    'newbie': 'INT',
+    'channel': 'VARCHAR(50)',
+    'segment': 'VARCHAR(50)',
+    'visit': 'INT',
+    'conversion': 'INT',
+    'spend': 'FLOAT',
+}
+
+def infer_column_types(file_path: str, sample_rows=10000) -> dict:
+    """
+    Infers Postgres column types from a sample of a CSV file.
+    Used when no explicit column map is known for the target table.
+    """
+    sample = pd.read_csv(file_path, nrows=sample_rows)
+    types = {}
+    for col, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            types[col] = 'BOOLEAN'
+        elif pd.api.types.is_integer_dtype(dtype):
+            types[col] = 'BIGINT'
+        elif pd.api.types.is_float_dtype(dtype):
+            types[col] = 'DOUBLE PRECISION'
+        else:
+            types[col] = 'TEXT'
+    return types
+
+def _csv_header(file_path: str) -> list:
+    with open(file_path, newline='') as f:
+        return next(csv.reader(f))
+
+def _iter_parquet_csv(file_path: str, batch_size: int):
+    """
+    Yields (columns, CSV buffer) per Parquet record batch, without a header row.
+    """
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(file_path)
+    for batch in parquet.iter_batches(batch_size=batch_size):
+        buf = io.BytesIO()
+        pa_csv.write_csv(batch, buf, write_options=pa_csv.WriteOptions(include_header=False))
+        buf.seek(0)
+        yield batch.schema.names, buf
+
+def copy_load(engine, file_path: str, table_name: str, schema='raw', column_types=None, batch_size=1_000_000) -> dict:
+    """
+    Bulk-loads a CSV (streamed) or Parquet file into schema.table_name via COPY FROM STDIN.
+
+    Rows go into a typed staging table, which is then swapped in with renames inside the
+    same transaction, so readers never see a half-loaded table.
+    Returns {'rows', 'seconds', 'rows_per_sec'}.
+    """
+    is_parquet = file_path.endswith('.parquet')
+    column_types = column_types or (None if is_parquet else infer_column_types(file_path))
+    if column_types is None:
+        raise ValueError("column_types are required for Parquet input")
+
+    target = f'{schema}.{table_name}'
+    staging = f'{table_name}__staging'
+    old = f'{table_name}__old'
+    columns_ddl = ', '.join(f'"{col}" {sql_type}' for col, sql_type in column_types.items())
+
+    start = time.perf_counter()
+    rows = 0
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(f'DROP TABLE IF EXISTS {schema}.{staging}')
+        cursor.execute(f'CREATE TABLE {schema}.{staging} ({columns_ddl})')
+
+        # 1. Stream rows into staging
+        if is_parquet:
+            for columns, buf in _iter_parquet_csv(file_path, batch_size):
+                column_list = ', '.join(f'"{c}"' for c in columns)
+                cursor.copy_expert(f'COPY {schema}.{staging} ({column_list}) FROM STDIN WITH (FORMAT csv)', buf)
+                rows += cursor.rowcount
+        else:
+            column_list = ', '.join(f'"{c}"' for c in _csv_header(file_path))
+            with open(file_path, 'rb') as f:
+                cursor.copy_expert(f'COPY {schema}.{staging} ({column_list}) FROM STDIN WITH (FORMAT csv, HEADER true)', f, size=1 << 20)
+            rows = cursor.rowcount
+
+        # 2. Atomic swap (same transaction as the load)
+        cursor.execute(f'DROP TABLE IF EXISTS {schema}.{old}')
+        cursor.execute(f'ALTER TABLE IF EXISTS {target} RENAME TO {old}')
+        cursor.execute(f'ALTER TABLE {schema}.{staging} RENAME TO {table_name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {schema}.{old}')
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    seconds = time.perf_counter() - start
+    rows_per_sec = rows / seconds if seconds > 0 else float('inf')
+    logger.info(f"Loaded {rows} rows into {target} in {seconds:.2f}s ({rows_per_sec:,.0f} rows/sec)")
+
+    return {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows_per_sec}
+
+def copy_frame(cursor, df: pd.DataFrame, table: str) -> int:
+    """
+    Appends a DataFrame to an existing table (schema-qualified) via COPY FROM STDIN,
+    on the caller's cursor/transaction. Returns the number of rows written.
+    """
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    column_list = ', '.join(f'"{c}"' for c in df.columns)
+    cursor.copy_expert(f'COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)', buf, size=1 << 20)
+    return cursor.rowcount
@@ -1,9 +1,17 @@
 from dagster import Definitions, load_assets_from_modules
 
-from . import assets_ingest, assets_marts, assets_checks, assets_analysis, assets_uplift, assets_reporting
+from .database import DatabaseResource
+from .observation_cache import ObservationCache
+from .model_registry import UpliftModelStore
+from . import assets_ingest, assets_marts, assets_checks, assets_analysis, assets_uplift, assets_reporting, assets_sequential, assets_segments
 
-all_assets = load_assets_from_modules([assets_ingest, assets_marts, assets_checks, assets_analysis, assets_uplift, assets_reporting])
+all_assets = load_assets_from_modules([assets_ingest, assets_marts, assets_checks, assets_analysis, assets_uplift, assets_reporting, assets_sequential, assets_segments])
 
 defs = Definitions(
     assets=all_assets,
+    resources={
+        'database': DatabaseResource(),
+        'observation_cache': ObservationCache(),
+        'model_store': UpliftModelStore(),
+    },
 )
@@ -0,0 +1,60 @@
+import multiprocessing
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from .instrumentation import MetricsRecorder, recording, extend
+
+EXECUTION_MODES = ('serial', 'process')
+
+def resource_settings(resource) -> dict:
+    """
+    Plain-dict settings of a ConfigurableResource, to rebuild it inside a worker process
+    (resources themselves are not picklable).
+    """
+    return {name: getattr(resource, name) for name in type(resource).model_fields}
+
+def _call(fn, experiment_id):
+    # Phases recorded by fn go to a per-experiment recorder and travel back with the result
+    recorder = MetricsRecorder(experiment_id)
+    with recording(recorder):
+        try:
+            with recorder.phase('experiment'):
+                value = fn(experiment_id)
+            return experiment_id, value, None, recorder.records
+        except Exception:  # noqa: BLE001 - one failing experiment must not fail the others
+            return experiment_id, None, traceback.format_exc(), recorder.records
+
+def run_per_experiment(context, fn, experiment_ids, execution_mode='serial', max_workers=4):
+    """
+    Runs fn(experiment_id) for every experiment, serially or over a process pool.
+
+    fn must be picklable for 'process' mode (a top-level function or a functools.partial
+    of one). Results come back in experiment_ids order regardless of completion order.
+    A failing experiment is logged with its traceback and skipped; the others still run.
+    Each call's phase timings (instrumentation) are added to the calling asset's metrics.
+    Returns ({experiment_id: result}, {experiment_id: error message}).
+    """
+    if execution_mode not in EXECUTION_MODES:
+        raise ValueError(f"Unknown execution_mode {execution_mode!r}, expected one of {EXECUTION_MODES}")
+
+    experiment_ids = [int(e) for e in experiment_ids]
+
+    if execution_mode == 'process' and len(experiment_ids) > 1:
+        workers = max(1, min(max_workers, len(experiment_ids)))
+        # spawn: don't fork the orchestrator's threads and open connections
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            outcomes = list(pool.map(_call, [fn] * len(experiment_ids), experiment_ids))
+    else:
+        outcomes = [_call(fn, e) for e in experiment_ids]
+
+    results = {}
+    failures = {}
+    for experiment_id, value, error, records in outcomes:
+        extend(records)
+        if error is None:
+            results[experiment_id] = value
+        else:
+            context.log.error(f"Experiment {experiment_id} failed:\n{error}")
+            failures[experiment_id] = error.strip().splitlines()[-1]
+
+    return results, failures
@@ -0,0 +1,110 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from .database import iter_arrow_batches, iter_frames, read_frame
+
+# Typed, columnar companion to experiment_observations.
+# One row per (experiment_id, unit_id); one DOUBLE PRECISION column per numeric feature,
+# plus the raw categorical values (for segmentation and native categorical models).
+FEATURE_TABLE = 'experiment_features'
+FEATURE_SCHEMA = 'experimentation'
+
+# Pre-experiment numeric covariates (also used for CUPED)
+NUMERIC_FEATURES = ['recency', 'history', 'mens', 'womens', 'newbie']
+
+# Fixed levels so the one-hot columns (and the table schema) are stable across runs
+CATEGORICAL_LEVELS = {
+    'zip_code': ['Rural', 'Suburban', 'Urban'],
+    'channel': ['Multichannel', 'Phone', 'Web'],
+}
+
+ONE_HOT_FEATURES = [f'{col}_{level.lower()}' for col, levels in CATEGORICAL_LEVELS.items() for level in levels]
+
+# Model-ready feature matrix columns
+FEATURE_COLUMNS = NUMERIC_FEATURES + ONE_HOT_FEATURES
+CATEGORICAL_FEATURES = list(CATEGORICAL_LEVELS)
+
+def build_feature_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds the typed feature frame from raw Hillstrom rows.
+    Numeric features are cast to float64; zip_code/channel are one-hot encoded
+    against fixed levels and also kept as raw categories.
+    """
+    features = pd.DataFrame(index=df.index)
+    for col in NUMERIC_FEATURES:
+        features[col] = df[col].astype('float64')
+
+    for col, levels in CATEGORICAL_LEVELS.items():
+        # The original dataset spells 'Suburban' as 'Surburban'
+        values = df[col].replace({'Surburban': 'Suburban'})
+        for level in levels:
+            features[f'{col}_{level.lower()}'] = (values == level).astype('float64')
+        features[col] = values
+
+    return features
+
+def write_features(tx, features_df: pd.DataFrame) -> int:
+    """
+    Appends (experiment_id, unit_id, batch_date, typed features...) rows to the feature
+    table, on a database.transaction writer.
+    """
+    return tx.append(f'{FEATURE_SCHEMA}.{FEATURE_TABLE}', features_df)
+
+def _feature_query(columns: list, feature_cols: list) -> str:
+    # Ordered by unit so the rows (and the seeded splits and model keys built on them)
+    # do not depend on the physical layout of the tables
+    select = [f'o.{c}' for c in columns] + [f'f.{c}' for c in feature_cols]
+    return f"""
+        SELECT {', '.join(select)}
+        FROM {FEATURE_SCHEMA}.experiment_observations o
+        JOIN {FEATURE_SCHEMA}.{FEATURE_TABLE} f USING (experiment_id, unit_id)
+        WHERE o.experiment_id = :experiment_id
+        ORDER BY o.unit_id
+    """
+
+def load_feature_matrix(engine, experiment_id: int, feature_cols=None,
+                        columns=('unit_id', 'treatment', 'outcome_visit', 'outcome_conversion')):
+    """
+    Loads an experiment's observations joined to its typed features.
+    Returns (observations DataFrame, C-contiguous float64 feature matrix, feature names);
+    rows are ordered by unit_id and the matrix is aligned with the observations frame.
+    """
+    feature_cols = list(feature_cols or FEATURE_COLUMNS)
+    df = read_frame(engine, _feature_query(list(columns), feature_cols), {'experiment_id': int(experiment_id)})
+
+    X = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float64))
+    return df.drop(columns=feature_cols), X, feature_cols
+
+def iter_feature_batches(engine, experiment_id: int, feature_cols=None, chunksize=100000,
+                         columns=('treatment', 'outcome_visit', 'outcome_conversion')):
+    """
+    Streams an experiment's observations + typed features with a server-side cursor,
+    one typed Arrow record batch of up to `chunksize` rows at a time.
+    """
+    feature_cols = list(feature_cols or FEATURE_COLUMNS)
+    yield from iter_arrow_batches(engine, _feature_query(list(columns), feature_cols),
+                                  {'experiment_id': int(experiment_id)}, chunksize)
+
+def iter_feature_chunks(engine, experiment_id: int, feature_cols=None, chunksize=100000,
+                        columns=('treatment', 'outcome_visit', 'outcome_conversion')):
+    """
+    iter_feature_batches as DataFrame chunks.
+    """
+    for batch in iter_feature_batches(engine, experiment_id, feature_cols, chunksize, columns):
+        yield batch.to_pandas()
+
+_TABLE_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$')
+
+def iter_audience_chunks(engine, table: str, experiment_id: int, feature_cols=None, chunksize=100000):
+    """
+    Streams (unit_id, typed features...) from an audience table laid out like
+    experiment_features (experiment_id, unit_id, feature columns), for scoring units
+    outside the experiment.
+    """
+    if not _TABLE_NAME.match(table):
+        raise ValueError(f"Invalid table name: {table!r}")
+    feature_cols = list(feature_cols or FEATURE_COLUMNS)
+    query = f"SELECT unit_id, {', '.join(feature_cols)} FROM {table} WHERE experiment_id = :experiment_id"
+    yield from iter_frames(engine, query, {'experiment_id': int(experiment_id)}, chunksize)
@@ -0,0 +1,230 @@
+import sys
+import time
+from contextlib import contextmanager
+
+import duckdb
+import pandas as pd
+from dagster import MetadataValue
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import transaction
+
+# Append-only history of phase timings, one row per (asset run, experiment, phase)
+METRICS_TABLE = 'pipeline_metrics'
+METRICS_SCHEMA = 'experimentation'
+METRIC_COLUMNS = ['run_id', 'asset_name', 'partition_key', 'experiment_id', 'phase',
+                  'seconds', 'rows', 'bytes', 'peak_rss_mb']
+
+# Recorder of the running asset (orchestrator) or experiment (run_per_experiment call)
+_RECORDER = None
+
+# Peak RSS seen so far by each open phase in this process, innermost last. Process-wide,
+# because every phase resets the kernel's high-water mark when it starts.
+_OPEN_PEAKS = []
+
+def _read_peak_rss() -> int:
+    """
+    Peak RSS in bytes since the last reset (Linux VmHWM); elsewhere the process
+    lifetime peak from getrusage.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _reset_peak_rss():
+    # Linux only: resets VmHWM to the current RSS
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def _fold_peak():
+    if _OPEN_PEAKS:
+        current = _read_peak_rss()
+        _OPEN_PEAKS[:] = [max(peak, current) for peak in _OPEN_PEAKS]
+
+def frame_bytes(df) -> int:
+    """
+    In-memory size of a fetched DataFrame or array (the bytes a phase moved).
+    """
+    if isinstance(df, pd.DataFrame):
+        return int(df.memory_usage(index=False).sum())
+    return int(getattr(df, 'nbytes', 0))
+
+class MetricsRecorder:
+    """
+    Phase records (wall time, rows, bytes, peak RSS) of one asset run or one experiment.
+    Phases may nest: an outer phase's time and peak include its inner phases.
+    """
+    def __init__(self, experiment_id=None):
+        self.experiment_id = experiment_id
+        self.records = []
+
+    @contextmanager
+    def phase(self, name: str, rows=None, bytes=None):
+        # The caller may fill in rows/bytes on the yielded dict
+        stats = {'rows': rows, 'bytes': bytes}
+        _fold_peak()
+        _reset_peak_rss()
+        _OPEN_PEAKS.append(_read_peak_rss())
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            seconds = time.perf_counter() - start
+            _fold_peak()
+            peak = _OPEN_PEAKS.pop()
+            self.add(name, seconds, stats['rows'], stats['bytes'], peak / 2 ** 20)
+
+    def add(self, name: str, seconds: float, rows=None, bytes=None, peak_rss_mb=None):
+        self.records.append({
+            'experiment_id': self.experiment_id, 'phase': name, 'seconds': seconds,
+            'rows': None if rows is None else int(rows), 'bytes': None if bytes is None else int(bytes),
+            'peak_rss_mb': peak_rss_mb,
+        })
+
+@contextmanager
+def recording(recorder: MetricsRecorder):
+    """
+    Makes `recorder` the target of phase()/record() in this process for the block.
+    """
+    global _RECORDER
+    previous, _RECORDER = _RECORDER, recorder
+    try:
+        yield recorder
+    finally:
+        _RECORDER = previous
+
+@contextmanager
+def phase(name: str, rows=None, bytes=None):
+    """
+    Times a phase of the current asset or experiment; a no-op outside an instrumented run.
+    Yields a dict whose 'rows' and 'bytes' the caller may set.
+    """
+    if _RECORDER is None:
+        yield {'rows': rows, 'bytes': bytes}
+        return
+    with _RECORDER.phase(name, rows, bytes) as stats:
+        yield stats
+
+def record(name: str, seconds: float, rows=None, bytes=None):
+    """
+    Adds a phase timed by the caller (e.g. COPY time accumulated over chunks).
+    """
+    if _RECORDER is not None:
+        _RECORDER.add(name, seconds, rows, bytes)
+
+def extend(records: list):
+    """
+    Adds records made elsewhere (e.g. returned by a worker process) to the current run.
+    """
+    if _RECORDER is not None:
+        _RECORDER.records.extend(records)
+
+def timed_chunks(chunks, name='sql_fetch'):
+    """
+    Passes a chunk iterator through, recording the time spent producing chunks (the
+    fetch, not the consumer's work) and their rows and bytes as one phase once the
+    iterator is exhausted or closed.
+    """
+    recorder = _RECORDER
+    seconds, rows, size = 0.0, 0, 0
+    iterator = iter(chunks)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                seconds += time.perf_counter() - start
+                break
+            seconds += time.perf_counter() - start
+            rows += len(chunk)
+            size += frame_bytes(chunk)
+            yield chunk
+    finally:
+        if recorder is not None:
+            recorder.add(name, seconds, rows, size)
+
+def summarize_metrics(records: list) -> dict:
+    """
+    Dagster output metadata: per-phase totals over all experiments (seconds, rows,
+    MB), overall peak RSS, and Markdown tables by phase and of the slowest experiments.
+    Phases named 'total' and 'experiment' enclose the others.
+    """
+    df = pd.DataFrame(records, columns=['experiment_id', 'phase', 'seconds', 'rows', 'bytes', 'peak_rss_mb'])
+    if df.empty:
+        return {}
+    by_phase = df.groupby('phase', sort=False).agg(
+        calls=('seconds', 'size'), seconds=('seconds', 'sum'), rows=('rows', lambda r: r.sum(min_count=1)),
+        mb=('bytes', lambda b: b.sum(min_count=1) / 2 ** 20), peak_rss_mb=('peak_rss_mb', 'max'),
+    )
+
+    metadata = {}
+    for name, row in by_phase.iterrows():
+        metadata[f'{name}_seconds'] = MetadataValue.float(round(float(row['seconds']), 4))
+        if pd.notna(row['rows']):
+            metadata[f'{name}_rows'] = MetadataValue.int(int(row['rows']))
+    if df['peak_rss_mb'].notna().any():
+        metadata['peak_rss_mb'] = MetadataValue.float(round(float(df['peak_rss_mb'].max()), 1))
+    metadata['phases'] = MetadataValue.md(_markdown_table(by_phase.reset_index()))
+
+    experiments = df[df['phase'] == 'experiment'].dropna(subset=['experiment_id'])
+    if not experiments.empty:
+        metadata['experiments'] = MetadataValue.int(experiments['experiment_id'].nunique())
+        slowest = experiments.nlargest(10, 'seconds')[['experiment_id', 'seconds', 'peak_rss_mb']]
+        metadata['slowest_experiments'] = MetadataValue.md(_markdown_table(slowest))
+    return metadata
+
+def _markdown_table(df: pd.DataFrame) -> str:
+    def cell(value):
+        if pd.isna(value):
+            return ''
+        if isinstance(value, float) and not value.is_integer():
+            return f'{value:.3f}'
+        return str(int(value)) if isinstance(value, float) else str(value)
+    lines = ['| ' + ' | '.join(df.columns) + ' |', '|' + '---|' * len(df.columns)]
+    lines += ['| ' + ' | '.join(cell(v) for v in row) + ' |' for row in df.itertuples(index=False)]
+    return '\n'.join(lines)
+
+def write_metrics(engine, frame: pd.DataFrame):
+    """
+    Appends metric rows (METRIC_COLUMNS) to experimentation.pipeline_metrics.
+    """
+    with transaction(engine) as tx:
+        tx.append(f'{METRICS_SCHEMA}.{METRICS_TABLE}', frame[METRIC_COLUMNS])
+
+@contextmanager
+def asset_metrics(context, engine):
+    """
+    Instruments an asset body: a 'total' phase around it, plus any phase()/record() calls
+    and per-experiment records from run_per_experiment inside it. On success, per-phase
+    totals are attached as output metadata and every record is appended to
+    pipeline_metrics (a database or warehouse error on that write is logged, not raised).
+    """
+    recorder = MetricsRecorder()
+    with recording(recorder), recorder.phase('total'):
+        yield recorder
+
+    context.add_output_metadata(summarize_metrics(recorder.records))
+
+    frame = pd.DataFrame(recorder.records)
+    frame['run_id'] = context.run_id
+    frame['asset_name'] = context.asset_key.to_user_string()
+    frame['partition_key'] = context.partition_key if context.has_partition_key else None
+    frame['experiment_id'] = frame['experiment_id'].astype('Int64')
+    try:
+        write_metrics(engine, frame)
+    except (SQLAlchemyError, OSError, duckdb.Error) as exc:
+        context.log.warning(f"Could not write pipeline metrics: {exc}")
+
+    total = frame.loc[frame['phase'] == 'total', 'seconds'].iloc[0]
+    context.log.info(f"{frame['asset_name'].iloc[0]}: {total:.2f}s, {len(frame)} phase records")
@@ -0,0 +1,63 @@
+import glob
+import os
+
+from .warehouse import ParquetWarehouse
+
+# Versioned schema changes, <version>_<name>.sql. db/init.sql only runs on a fresh
+# volume; these bring any older database (or an empty one) to the same schema. Each is
+# idempotent, so on a database created from the current init.sql they only get recorded.
+# A schema change goes into init.sql and a new migration file.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'db', 'migrations')
+MIGRATIONS_TABLE = 'experimentation.schema_migrations'
+
+# pg_advisory_xact_lock key: runs starting together migrate one at a time
+_LOCK_KEY = 7301
+
+def list_migrations(directory=MIGRATIONS_DIR) -> list:
+    """
+    [(version, name, path)] of the migration files, in version order.
+    """
+    migrations = []
+    for path in glob.glob(os.path.join(directory, '*.sql')):
+        version, name = os.path.splitext(os.path.basename(path))[0].split('_', 1)
+        migrations.append((int(version), name, path))
+    return sorted(migrations)
+
+def migrate(engine, directory=MIGRATIONS_DIR) -> list:
+    """
+    Applies the migrations not yet recorded in experimentation.schema_migrations, in
+    order and in one transaction. Returns the versions applied. A no-op on the local
+    warehouse, whose tables always follow init.sql.
+    """
+    if isinstance(engine, ParquetWarehouse):
+        return []
+
+    applied = []
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_LOCK_KEY,))
+        cursor.execute("CREATE SCHEMA IF NOT EXISTS experimentation")
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                version INT PRIMARY KEY,
+                name VARCHAR(255),
+                applied_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        cursor.execute(f"SELECT version FROM {MIGRATIONS_TABLE}")
+        done = {row[0] for row in cursor.fetchall()}
+        for version, name, path in list_migrations(directory):
+            if version in done:
+                continue
+            with open(path) as f:
+                cursor.execute(f.read())
+            cursor.execute(f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (%s, %s)", (version, name))
+            applied.append(version)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    return applied
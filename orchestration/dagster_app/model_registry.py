@@ -0,0 +1,16 @@
+from dagster import ConfigurableResource
+
+from analysis.model_store import ModelStore
+
+class UpliftModelStore(ConfigurableResource):
+    """
+    Local content-addressed store of fitted uplift models (analysis.model_store.ModelStore).
+    Unchanged training data + spec means a cache hit: the uplift asset skips fitting and
+    scoring jobs load the stored model by its key.
+    """
+    store_dir: str = ".cache/models"
+    max_entries: int = 50
+    max_bytes: int = 1024 ** 3
+
+    def get_store(self) -> ModelStore:
+        return ModelStore(self.store_dir, max_entries=self.max_entries, max_bytes=self.max_bytes)
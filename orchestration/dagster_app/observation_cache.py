@@ -0,0 +1,179 @@
+import contextlib
+import fcntl
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from dagster import ConfigurableResource, DagsterEventType
+
+from .feature_store import CATEGORICAL_FEATURES, FEATURE_COLUMNS, iter_feature_batches
+from .partitions import MART_ASSET_KEY, observation_partitions
+
+def mart_data_versions(instance) -> dict:
+    """
+    Data version of each experiment in the mart: the latest storage id among the
+    materializations of its partitions. Any re-materialized partition bumps the version.
+    """
+    versions = {}
+    latest = instance.get_latest_storage_id_by_partition(MART_ASSET_KEY, DagsterEventType.ASSET_MATERIALIZATION)
+    for partition_key, storage_id in latest.items():
+        key = observation_partitions.get_partition_key_from_str(partition_key)
+        exp_id = int(key.keys_by_dimension['experiment_id'])
+        versions[exp_id] = max(storage_id, versions.get(exp_id, 0))
+    return versions
+
+class ObservationCache(ConfigurableResource):
+    """
+    Local Parquet cache of each experiment's observations + typed features.
+
+    Entries are keyed by (experiment_id, mart data version), so the checks, analysis and
+    uplift assets share one database read per data version. Reads are memory-mapped;
+    the least recently used entries are evicted once the cache exceeds max_bytes.
+    """
+    cache_dir: str = ".cache/observations"
+    max_bytes: int = 2 * 1024 ** 3
+    chunksize: int = 100000
+
+    def _path(self, experiment_id, version) -> str:
+        return os.path.join(self.cache_dir, f"experiment_{int(experiment_id)}_v{version}.parquet")
+
+    @contextlib.contextmanager
+    def _lock(self, experiment_id, blocking=True):
+        # Assets run in separate processes; only one of them fills an entry. Yields
+        # whether the lock was taken (always, unless blocking=False and it is held).
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, f"experiment_{int(experiment_id)}.lock"), "w") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _db_batches(self, engine, experiment_id):
+        return iter_feature_batches(engine, experiment_id, FEATURE_COLUMNS + CATEGORICAL_FEATURES, chunksize=self.chunksize,
+                                    columns=('unit_id', 'treatment', 'outcome_visit', 'outcome_conversion'))
+
+    def _fill(self, engine, experiment_id, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        writer = None
+        try:
+            try:
+                # Arrow batches go straight from the cursor to Parquet, without pandas
+                for batch in self._db_batches(engine, experiment_id):
+                    if batch.num_rows == 0:
+                        continue
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp_path, batch.schema)
+                    writer.write_batch(batch)
+            finally:
+                if writer is not None:
+                    writer.close()
+        except BaseException:
+            # Eviction only sees .parquet files: a failed fill must not leave its temp file
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+
+        if writer is None:
+            return False
+        os.replace(tmp_path, path)
+        return True
+
+    def _evict(self, experiment_id, keep_path):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not name.endswith(".parquet") or path == keep_path:
+                continue
+            # Older versions of the same experiment are stale: always drop them
+            if name.startswith(f"experiment_{int(experiment_id)}_v"):
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, int(name.split("_")[1]), path))
+
+        total = sum(size for _, size, _, _ in entries) + os.path.getsize(keep_path)
+        for _, size, victim, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Skip entries another process is reading or filling right now
+            with self._lock(victim, blocking=False) as locked:
+                if not locked:
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+            total -= size
+
+    def get_path(self, engine, experiment_id, version):
+        """
+        Returns the Parquet path holding the experiment's observations at this data
+        version, fetching it from Postgres on a miss. None if the experiment has no rows.
+        """
+        path = self._path(experiment_id, version)
+        with self._lock(experiment_id):
+            if os.path.exists(path):
+                os.utime(path)  # LRU touch
+                return path
+            if not self._fill(engine, experiment_id, path):
+                return None
+            self._evict(experiment_id, path)
+        return path
+
+    def _open(self, engine, experiment_id, version, read, attempts=3):
+        # Another process's eviction can still delete the entry between get_path and the
+        # read; an opened file stays readable, so fetching it again is enough
+        for attempt in range(attempts):
+            path = self.get_path(engine, experiment_id, version)
+            if path is None:
+                return None
+            try:
+                return read(path)
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+
+    def load_frame(self, engine, experiment_id, version, columns=None) -> pd.DataFrame:
+        """
+        Observations (+ features) as a DataFrame, read through a memory map.
+        A None version (mart not tracked by Dagster) bypasses the cache.
+        """
+        if version is None:
+            chunks = list(self.iter_chunks(engine, experiment_id, version, columns))
+            return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+        table = self._open(engine, experiment_id, version, lambda path: pq.read_table(path, columns=columns, memory_map=True))
+        if table is None:
+            return pd.DataFrame()
+        return table.to_pandas(split_blocks=True)
+
+    def iter_chunks(self, engine, experiment_id, version, columns=None):
+        """
+        Streams the cached observations in record batches of `chunksize` rows.
+        """
+        if version is None:
+            for batch in self._db_batches(engine, experiment_id):
+                yield (batch.select(columns) if columns is not None else batch).to_pandas()
+            return
+
+        parquet = self._open(engine, experiment_id, version, lambda path: pq.ParquetFile(path, memory_map=True))
+        if parquet is None:
+            return
+        for batch in parquet.iter_batches(batch_size=self.chunksize, columns=columns):
+            yield batch.to_pandas()
+
+    def load_feature_matrix(self, engine, experiment_id, version, feature_cols=None):
+        """
+        Same contract as feature_store.load_feature_matrix, served from the cache.
+        """
+        feature_cols = list(feature_cols or FEATURE_COLUMNS)
+        df = self.load_frame(engine, experiment_id, version)
+        if df.empty:
+            return df, np.empty((0, len(feature_cols))), feature_cols
+
+        X = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float64))
+        return df.drop(columns=feature_cols + CATEGORICAL_FEATURES), X, feature_cols
@@ -0,0 +1,78 @@
+from dagster import (
+    AssetKey,
+    AssetRecordsFilter,
+    DailyPartitionsDefinition,
+    DynamicPartitionsDefinition,
+    MultiPartitionsDefinition,
+)
+import pandas as pd
+
+from .database import read_frame
+
+# The observations mart is partitioned by batch_date x experiment_id.
+# Experiment partitions are dynamic: the registry seed adds one per registered experiment.
+batch_date_partitions = DailyPartitionsDefinition(start_date='2023-01-01')
+experiment_partitions = DynamicPartitionsDefinition(name='experiment_id')
+
+observation_partitions = MultiPartitionsDefinition({
+    'batch_date': batch_date_partitions,
+    'experiment_id': experiment_partitions,
+})
+
+MART_ASSET_KEY = AssetKey('experiment_observations_mart')
+
+def register_experiment_partitions(context, experiment_ids):
+    """
+    Adds a dynamic partition for every experiment that does not have one yet.
+    """
+    existing = set(context.instance.get_dynamic_partitions(experiment_partitions.name))
+    new_keys = [str(e) for e in experiment_ids if str(e) not in existing]
+    if new_keys:
+        context.instance.add_dynamic_partitions(experiment_partitions.name, new_keys)
+    return new_keys
+
+def _latest_storage_id(instance, asset_key):
+    records = instance.fetch_materializations(asset_key, limit=1).records
+    return records[0].storage_id if records else None
+
+def affected_experiment_ids(context, upstream_key=MART_ASSET_KEY):
+    """
+    Experiments whose mart partitions were materialized since this asset last ran.
+    Returns None when there is no previous materialization (i.e. recompute everything).
+    """
+    instance = context.instance
+    last_run = _latest_storage_id(instance, context.asset_key)
+    if last_run is None:
+        return None
+
+    affected = set()
+    cursor = None
+    while True:
+        result = instance.fetch_materializations(
+            AssetRecordsFilter(asset_key=upstream_key, after_storage_id=last_run),
+            limit=1000, cursor=cursor, ascending=True,
+        )
+        for record in result.records:
+            if record.partition_key:
+                key = observation_partitions.get_partition_key_from_str(record.partition_key)
+                affected.add(int(key.keys_by_dimension['experiment_id']))
+        if not result.has_more:
+            break
+        cursor = result.cursor
+
+    return sorted(affected)
+
+def select_experiments(context, engine) -> pd.DataFrame:
+    """
+    Registry rows to (re)compute in this run: only experiments with new mart partitions,
+    or every registered experiment on the first run.
+    """
+    experiment_ids = affected_experiment_ids(context)
+    if experiment_ids is None:
+        return read_frame(engine, "SELECT experiment_id FROM experimentation.experiment_registry")
+
+    context.log.info(f"Recomputing affected experiments: {experiment_ids}")
+    return read_frame(
+        engine, "SELECT experiment_id FROM experimentation.experiment_registry WHERE experiment_id = ANY(:ids)",
+        {'ids': experiment_ids},
+    )
@@ -0,0 +1,327 @@
+import glob
+import json
+import os
+import re
+import shutil
+import uuid
+from contextlib import contextmanager
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+# The warehouse tables are the tables of db/init.sql
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'db', 'init.sql')
+
+# Hive partition columns per table (directories like experiment_id=1/batch_date=2023-01-01).
+# Deleting a whole partition drops its files instead of rewriting them, and reads that
+# filter on these columns skip the other partitions' files.
+PARTITION_COLUMNS = {
+    'experimentation.experiment_observations': ('experiment_id', 'batch_date'),
+    'experimentation.experiment_features': ('experiment_id', 'batch_date'),
+    'experimentation.uplift_scores': ('experiment_id',),
+}
+
+# Field metadata marking JSON text columns in Arrow batches (decoded by read_frame)
+JSON_FIELD_METADATA = {b'sql_type': b'json'}
+
+# SQLAlchemy-style :name binds (not :: casts) -> DuckDB $name
+_BIND = re.compile(r'(?<![:\w]):([A-Za-z_]\w*)')
+_CREATE_TABLE = re.compile(r'^CREATE TABLE (?:IF NOT EXISTS )?([\w.]+)', re.IGNORECASE)
+_CREATE_MATVIEW = re.compile(r'^CREATE MATERIALIZED VIEW (?:IF NOT EXISTS )?([\w.]+) AS ', re.IGNORECASE)
+
+def duckdb_ddl(sql: str):
+    """
+    Translates the CREATE SCHEMA/TABLE statements of db/init.sql to DuckDB: SERIAL
+    becomes INTEGER (ids are assigned on append), JSONB becomes JSON, and keys,
+    references, indexes and Postgres partitions are dropped (the warehouse does not
+    enforce them and partitions by directory). Materialized views become plain views.
+    Returns ([statements], {table: serial column}, [view statements]).
+    """
+    statements, serial, views = [], {}, []
+    for statement in re.sub(r'--[^\n]*', '', sql).split(';'):
+        statement = ' '.join(statement.split())
+        if statement.upper().startswith('CREATE SCHEMA'):
+            statements.append(statement)
+            continue
+        view = _CREATE_MATVIEW.match(statement)
+        if view:
+            views.append(f"CREATE OR REPLACE VIEW {view.group(1)} AS {statement[view.end():]}")
+            continue
+        match = _CREATE_TABLE.match(statement)
+        if not match or ' PARTITION OF ' in statement.upper():
+            continue
+        serial_column = re.search(r'(\w+) SERIAL\b', statement, re.IGNORECASE)
+        if serial_column:
+            serial[match.group(1)] = serial_column.group(1)
+        statement = re.sub(r'\bSERIAL\b', 'INTEGER', statement, flags=re.IGNORECASE)
+        statement = re.sub(r'\bJSONB\b', 'JSON', statement, flags=re.IGNORECASE)
+        statement = re.sub(r'REFERENCES [\w.]+ ?\(\w+\)', '', statement, flags=re.IGNORECASE)
+        statement = re.sub(r', ?PRIMARY KEY ?\([^)]*\)', '', statement, flags=re.IGNORECASE)
+        statement = re.sub(r'\bPRIMARY KEY\b', '', statement, flags=re.IGNORECASE)
+        statement = re.sub(r' PARTITION BY \w+ ?\([^)]*\)$', '', statement, flags=re.IGNORECASE)
+        statements.append(statement)
+    return statements, serial, views
+
+def arrow_to_frame(data) -> pd.DataFrame:
+    """
+    An Arrow batch or table as a DataFrame, with JSON text columns (JSON_FIELD_METADATA)
+    decoded into Python objects, as psycopg2 returns json/jsonb.
+    """
+    df = data.to_pandas()
+    for field in data.schema:
+        if field.metadata == JSON_FIELD_METADATA:
+            df[field.name] = [json.loads(v) if isinstance(v, str) else None for v in df[field.name]]
+    return df
+
+def _where_sql(where: dict) -> str:
+    return ' AND '.join(f'"{col}" = ${col}' for col in where)
+
+def _partition_values(path: str) -> dict:
+    return dict(part.split('=', 1) for part in path.split(os.sep) if '=' in part)
+
+class ParquetWarehouse:
+    """
+    The experimentation tables as Parquet files under `root` (one directory per table,
+    hive-partitioned per PARTITION_COLUMNS), queried in-process with DuckDB. A drop-in
+    for the Postgres engine in the database module: the same SQL reads (DuckDB accepts
+    the Postgres dialect used here), and writes through transaction().
+
+    Each table is a view over its files, so DuckDB prunes columns and pushes filters
+    down into the Parquet scan (row groups, and whole partitions on partition columns).
+    """
+    def __init__(self, root: str, schema_path=SCHEMA_PATH):
+        self.root = root
+        self.con = duckdb.connect()
+        with open(schema_path) as f:
+            statements, self.serial, views = duckdb_ddl(f.read())
+
+        # Empty, typed copies of the tables: column types and defaults for appends, and
+        # the view of a table that has no files yet
+        self.con.execute("ATTACH ':memory:' AS staging")
+        self.con.execute("USE staging")
+        for statement in statements:
+            self.con.execute(statement)
+        self.con.execute("USE memory")
+
+        self.columns = {}
+        for schema, table, column, data_type in self.con.execute("""
+            SELECT table_schema, table_name, column_name, data_type FROM information_schema.columns
+            WHERE table_catalog = 'staging' ORDER BY table_schema, table_name, ordinal_position
+        """).fetchall():
+            self.columns.setdefault(f'{schema}.{table}', []).append((column, data_type))
+        for schema in {table.split('.')[0] for table in self.columns}:
+            self.con.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+
+        self._has_files = {}
+        self._refresh()
+        for view in views:
+            self.con.execute(view)
+
+    def table_dir(self, table: str) -> str:
+        return os.path.join(self.root, *table.split('.'))
+
+    def files(self, table: str) -> list:
+        return sorted(glob.glob(os.path.join(self.table_dir(table), '**', '*.parquet'), recursive=True))
+
+    def _refresh(self):
+        # Point each view at its files (whose columns may differ from init.sql, e.g. a raw
+        # file loaded with extra columns), or at the empty typed table while it has none
+        for table, columns in self.columns.items():
+            has_files = bool(self.files(table))
+            if self._has_files.get(table) == has_files:
+                continue
+            if has_files:
+                partitions = PARTITION_COLUMNS.get(table, ())
+                types = dict(columns)
+                hive_types = ', '.join(f"'{col}': {types[col]}" for col in partitions)
+                source = (f"read_parquet('{self.table_dir(table)}/**/*.parquet', union_by_name = true"
+                          + (f", hive_partitioning = true, hive_types = {{{hive_types}}})" if partitions else ")"))
+            else:
+                source = f"staging.{table}"
+            self.con.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM {source}")
+            self._has_files[table] = has_files
+
+    def _execute(self, query, params=None):
+        self._refresh()
+        cursor = self.con.cursor()
+        return cursor, cursor.execute(_BIND.sub(r'$\1', str(query)), params or {})
+
+    def iter_arrow_batches(self, query, params=None, batch_size=100000):
+        """
+        Streams a query's result as Arrow record batches of up to batch_size rows.
+        Sums over integers (DECIMAL in DuckDB) come back as float64 and JSON columns as
+        text, as from Postgres.
+        """
+        cursor, result = self._execute(query, params)
+        json_columns = {name for name, type_code, *_ in result.description if str(type_code) == 'JSON'}
+        reader = result.to_arrow_reader(batch_size)
+        fields = []
+        for field in reader.schema:
+            if pa.types.is_decimal(field.type):
+                field = field.with_type(pa.float64())
+            if field.name in json_columns:
+                field = field.with_metadata(JSON_FIELD_METADATA)
+            fields.append(field)
+        schema = pa.schema(fields)
+
+        empty = True
+        try:
+            for batch in reader:
+                empty = False
+                yield batch.cast(schema)
+            if empty:
+                yield pa.RecordBatch.from_pylist([], schema=schema)
+        finally:
+            cursor.close()
+
+    def read_frame(self, query, params=None, batch_size=100000) -> pd.DataFrame:
+        return arrow_to_frame(pa.Table.from_batches(list(self.iter_arrow_batches(query, params, batch_size))))
+
+    @contextmanager
+    def transaction(self):
+        """
+        Yields a ParquetTransaction. Its files are written to a staging directory and
+        moved into place on exit; an exception discards them.
+        """
+        tx = ParquetTransaction(self)
+        try:
+            yield tx
+        except Exception:
+            tx.abort()
+            raise
+        tx.commit()
+
+class ParquetTransaction:
+    """
+    Deletes and appends on a ParquetWarehouse, applied together at commit. Deletes apply
+    to the files as they were before the transaction, so delete + append replaces rows.
+    Commit replaces files one by one: other processes may briefly see a partial change.
+    """
+    def __init__(self, warehouse: ParquetWarehouse):
+        self.warehouse = warehouse
+        self.staging_dir = os.path.join(warehouse.root, '.staging', uuid.uuid4().hex)
+        self.cursor = warehouse.con.cursor()
+        self.removed = []
+        self.replaced = []
+        self.added = []
+        self._next_id = {}
+
+    def _staged_path(self, *parts) -> str:
+        path = os.path.join(self.staging_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def delete(self, table: str, where=None):
+        """
+        Deletes the rows whose columns equal `where` ({column: value}), or all rows.
+        Files in other partitions are left alone and fully matching partitions are
+        dropped; other files are rewritten without the matching rows.
+        """
+        where = dict(where or {})
+        partitions = PARTITION_COLUMNS.get(table, ())
+        for path in self.warehouse.files(table):
+            values = _partition_values(os.path.relpath(path, self.warehouse.table_dir(table)))
+            if any(str(where[col]) != values[col] for col in partitions if col in where):
+                continue
+            filters = {col: value for col, value in where.items() if col not in partitions}
+            if not filters:
+                self.removed.append(path)
+                continue
+            tmp_path = self._staged_path('rewrite', f'{uuid.uuid4().hex}.parquet')
+            kept = self.cursor.execute(
+                f"COPY (SELECT * FROM read_parquet('{path}') WHERE NOT ({_where_sql(filters)})) "
+                f"TO '{tmp_path}' (FORMAT PARQUET)", filters,
+            ).fetchone()[0]
+            if kept:
+                self.replaced.append((tmp_path, path))
+            else:
+                self.removed.append(path)
+
+    def append(self, table: str, frames) -> int:
+        """
+        Appends a DataFrame (or an iterable of DataFrames / Arrow batches) with a subset of
+        the table's columns: the others get their defaults, SERIAL ids are assigned, and
+        values are cast to the column types. Returns the number of rows written.
+        """
+        if isinstance(frames, (pd.DataFrame, pa.RecordBatch, pa.Table)):
+            frames = [frames]
+        rows = 0
+        for frame in frames:
+            if len(frame) == 0:
+                continue
+            frame = self._with_ids(table, frame)
+            self.cursor.register('frame', frame)
+            try:
+                self.cursor.execute(f"INSERT INTO staging.{table} BY NAME SELECT * FROM frame")
+            finally:
+                self.cursor.unregister('frame')
+            rows += self._flush(table)
+        return rows
+
+    def load(self, table: str, file_path: str, column_types=None) -> int:
+        """
+        Appends a CSV (with header) or Parquet file, read by DuckDB. column_types
+        ({column: SQL type}) redefines the table's columns first, as copy_load does.
+        """
+        if column_types:
+            columns_ddl = ', '.join(f'"{col}" {sql_type}' for col, sql_type in column_types.items())
+            self.cursor.execute(f"CREATE OR REPLACE TABLE staging.{table} ({columns_ddl})")
+        reader = 'read_parquet' if file_path.endswith('.parquet') else 'read_csv'
+        self.cursor.execute(f"INSERT INTO staging.{table} BY NAME SELECT * FROM {reader}('{file_path}')")
+        return self._flush(table)
+
+    def analyze(self, table: str):
+        # Planner statistics are a Postgres concern; Parquet files carry their own
+        pass
+
+    def refresh(self, view: str):
+        # Materialized views are plain DuckDB views here, computed on read
+        pass
+
+    def add_partition(self, table: str, column: str, value: int):
+        # Hive partition directories appear with the first rows written to them
+        pass
+
+    def _with_ids(self, table, frame):
+        column = self.warehouse.serial.get(table)
+        names = frame.columns if isinstance(frame, pd.DataFrame) else frame.schema.names
+        if column is None or column in names:
+            return frame
+        if table not in self._next_id:
+            _, result = self.warehouse._execute(f'SELECT COALESCE(MAX("{column}"), 0) FROM {table}')
+            self._next_id[table] = result.fetchone()[0] + 1
+        frame = frame.copy() if isinstance(frame, pd.DataFrame) else frame.to_pandas()
+        frame.insert(0, column, range(self._next_id[table], self._next_id[table] + len(frame)))
+        self._next_id[table] += len(frame)
+        return frame
+
+    def _flush(self, table) -> int:
+        # Staged rows -> one Parquet file (per partition) in the staging directory
+        partitions = PARTITION_COLUMNS.get(table, ())
+        target = os.path.join(self.staging_dir, 'add', *table.split('.'))
+        if partitions:
+            os.makedirs(target, exist_ok=True)
+            options = f"PARTITION_BY ({', '.join(partitions)}), FILENAME_PATTERN 'part_{{uuid}}', OVERWRITE_OR_IGNORE"
+        else:
+            target = self._staged_path('add', *table.split('.'), f'part_{uuid.uuid4().hex}.parquet')
+            options = ''
+        rows = self.cursor.execute(f"COPY staging.{table} TO '{target}' (FORMAT PARQUET{', ' + options if options else ''})").fetchone()[0]
+        self.cursor.execute(f"DELETE FROM staging.{table}")
+        return rows
+
+    def commit(self):
+        for path in self.removed:
+            os.remove(path)
+        for tmp_path, path in self.replaced:
+            os.replace(tmp_path, path)
+        added_root = os.path.join(self.staging_dir, 'add')
+        for path in glob.glob(os.path.join(added_root, '**', '*.parquet'), recursive=True):
+            final = os.path.join(self.warehouse.root, os.path.relpath(path, added_root))
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.replace(path, final)
+        self.abort()
+
+    def abort(self):
+        self.cursor.close()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
@@ -3,57 +3,65 @@ import logging
 import os
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import requests
 import io
 
+from scripts.generate_experiments import write_chunks
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 OFFICIAL_URL = "http://www.minethatdata.com/Kevin_Hillstrom_MineThatData_E-MailAnalytics_DataMiningChallenge_2008.03.20.csv"
 
-def generate_synthetic_hillstrom(output_path, N=100000):
-    """Generates synthetic data matching Hillstrom schema."""
-    logger.warning("Generating SYNTHETIC Hillstrom data (Dev Mode).")
-    
-    np.random.seed(42)
-    
-    df = pd.DataFrame()
-    df['recency'] = np.random.randint(1, 13, N)
-    df['history_segment'] = np.random.choice(['1) $0 - $100', '2) $100 - $200', '3) $200 - $350', '4) $350 - $500', '5) $500 - $750', '6) $750 - $1,000', '7) $1,000 +'], N)
-    df['history'] = np.random.gamma(50, 5, N)
-    df['mens'] = np.random.choice([0, 1], N)
-    df['womens'] = np.random.choice([0, 1], N)
-    df['zip_code'] = np.random.choice(['Urban', 'Suburban', 'Rural'], N)
-    df['newbie'] = np.random.choice([0, 1], N)
-    df['channel'] = np.random.choice(['Web', 'Phone', 'Multichannel'], N)
-    
-    # Treatment
-    df['segment'] = np.random.choice(['Mens E-Mail', 'Womens E-Mail', 'No E-Mail'], N)
+HISTORY_SEGMENTS = ['1) $0 - $100', '2) $100 - $200', '3) $200 - $350', '4) $350 - $500', '5) $500 - $750', '6) $750 - $1,000', '7) $1,000 +']
+SEGMENTS = ['Mens E-Mail', 'Womens E-Mail', 'No E-Mail']
+
+def _synthetic_hillstrom_chunk(rng, n) -> pa.Table:
+    segment = rng.integers(0, 3, n)
+    mens = rng.integers(0, 2, n)
+    womens = rng.integers(0, 2, n)
     
     # Outcome Logic (Signal)
-    # Mens E-Mail increases visit/conversion for men (mens=1)
+    # Mens E-Mail increases visit/conversion for men (mens=1), Womens E-Mail for women
     base_visit_prob = 0.1
     visit_lift = 0.05
+    visit_probs = base_visit_prob + visit_lift * (((segment == 0) & (mens == 1)) | ((segment == 1) & (womens == 1)))
+    visit = (rng.random(n) < visit_probs).astype(np.int8)
+    conversion = visit * (rng.random(n) < 0.3) # 30% conversion given visit
     
-    def get_visit_prob(row):
-        prob = base_visit_prob
-        if row['segment'] == 'Mens E-Mail' and row['mens'] == 1:
-            prob += visit_lift
-        if row['segment'] == 'Womens E-Mail' and row['womens'] == 1:
-            prob += visit_lift
-        return prob
+    return pa.table({
+        'recency': rng.integers(1, 13, n),
+        'history_segment': pa.DictionaryArray.from_arrays(rng.integers(0, len(HISTORY_SEGMENTS), n).astype(np.int8), HISTORY_SEGMENTS),
+        'history': rng.gamma(50, 5, n),
+        'mens': mens,
+        'womens': womens,
+        'zip_code': pa.DictionaryArray.from_arrays(rng.integers(0, 3, n).astype(np.int8), ['Urban', 'Suburban', 'Rural']),
+        'newbie': rng.integers(0, 2, n),
+        'channel': pa.DictionaryArray.from_arrays(rng.integers(0, 3, n).astype(np.int8), ['Web', 'Phone', 'Multichannel']),
+        'segment': pa.DictionaryArray.from_arrays(segment.astype(np.int8), SEGMENTS),
+        'visit': visit,
+        'conversion': conversion.astype(np.int8),
+        'spend': conversion * rng.exponential(100, n),
+    })
 
-    visit_probs = df.apply(get_visit_prob, axis=1)
-    df['visit'] = np.random.binomial(1, visit_probs)
-    
-    df['conversion'] = df['visit'] * np.random.binomial(1, 0.3, N) # 30% conversion given visit
-    df['spend'] = df['conversion'] * np.random.exponential(100, N)
+def generate_synthetic_hillstrom(output_path, N=100000, chunksize=1_000_000, seed=42):
+    """Generates synthetic data matching Hillstrom schema, vectorized and written chunk by chunk (CSV or Parquet)."""
+    logger.warning("Generating SYNTHETIC Hillstrom data (Dev Mode).")
     
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False)
-    logger.info(f"Saved synthetic data to {output_path}")
+    seeds = np.random.SeedSequence(seed).spawn(max(1, -(-N // chunksize)))
+    chunks = (
+        _synthetic_hillstrom_chunk(np.random.default_rng(child), min(chunksize, N - start))
+        for child, start in zip(seeds, range(0, N, chunksize))
+    )
+    rows = write_chunks(chunks, output_path)
+    logger.info(f"Saved {rows} synthetic rows to {output_path}")
 
-def download_data(output_path: str):
+def download_data(output_path: str, sample_size=100000, synthetic=False):
+    if synthetic:
+        generate_synthetic_hillstrom(output_path, sample_size)
+        return
+    
     logger.info("Attempting to download Hillstrom dataset...")
     
     try:
@@ -69,12 +77,13 @@ def download_data(output_path: str):
         
     except Exception as e:
         logger.error(f"Download failed: {e}. Falling back to synthetic.")
-        generate_synthetic_hillstrom(output_path)
+        generate_synthetic_hillstrom(output_path, sample_size)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--output-path", required=True)
-    parser.add_argument("--sample-size", type=int, default=100000)
+    parser.add_argument("--sample-size", type=int, default=100000, help="Rows of synthetic data (fallback or --synthetic)")
+    parser.add_argument("--synthetic", action="store_true", help="Skip the download and generate synthetic data")
     args = parser.parse_args()
     
-    download_data(args.output_path)
+    download_data(args.output_path, args.sample_size, args.synthetic)
@@ -0,0 +1,238 @@
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ZIP_CODES = ['Rural', 'Suburban', 'Urban']
+CHANNELS = ['Multichannel', 'Phone', 'Web']
+
+# Binary unit traits that can drive a planted heterogeneous effect
+EFFECT_DRIVERS = ('mens', 'womens', 'newbie', 'urban', 'web')
+
+# Column types for loading the output with bulk_load.copy_load (required for Parquet)
+OBSERVATION_COLUMNS = {
+    'experiment_id': 'INT',
+    'unit_id': 'BIGINT',
+    'treatment': 'SMALLINT',
+    'batch_date': 'DATE',
+    'recency': 'SMALLINT',
+    'history': 'REAL',
+    'mens': 'SMALLINT',
+    'womens': 'SMALLINT',
+    'newbie': 'SMALLINT',
+    'zip_code': 'VARCHAR(50)',
+    'channel': 'VARCHAR(50)',
+    'outcome_visit': 'SMALLINT',
+    'outcome_conversion': 'SMALLINT',
+    'true_cate_visit': 'REAL',
+    'true_cate_conversion': 'REAL',
+}
+
+def experiment_specs(n_experiments=1, n_arms=2, allocation=None, lift=0.03, heterogeneity=1.0,
+                     srm_experiments=0, srm_shift=0.02, base_visit=0.15, conversion_rate=0.3, seed=42) -> list:
+    """
+    Ground-truth specs for synthetic experiments.
+
+    Arm 0 is control; arm a > 0 lifts the visit probability by lift * a / (n_arms - 1),
+    scaled by (1 + heterogeneity) for units with the experiment's driver trait and by
+    (1 - heterogeneity) for the others (heterogeneity=1: only driver units respond).
+    The first `srm_experiments` experiments assign srm_shift less traffic to control than
+    planned, i.e. a sample ratio mismatch to be detected.
+    """
+    rng = np.random.default_rng(seed)
+    planned = np.full(n_arms, 1.0 / n_arms) if allocation is None else np.asarray(allocation, dtype=float)
+    if len(planned) != n_arms or (planned <= 0).any():
+        raise ValueError(f"allocation needs {n_arms} positive weights, got {list(planned)}")
+    planned = planned / planned.sum()
+
+    specs = []
+    for i in range(n_experiments):
+        realized = planned.copy()
+        srm = i < srm_experiments
+        if srm and n_arms > 1:
+            # Control loses srm_shift of the traffic, spread over the other arms pro rata
+            control = max(planned[0] - srm_shift, 1e-6)
+            realized[1:] = planned[1:] * (1 - control) / planned[1:].sum()
+            realized[0] = control
+        specs.append({
+            'experiment_id': i + 1,
+            'allocation': {str(a): float(w) for a, w in enumerate(planned)},
+            'realized_allocation': {str(a): float(w) for a, w in enumerate(realized)},
+            'srm': srm,
+            'base_visit': base_visit,
+            'conversion_rate': conversion_rate,
+            'driver': str(rng.choice(EFFECT_DRIVERS)),
+            'heterogeneity': heterogeneity,
+            'arm_lifts': {str(a): lift * a / max(n_arms - 1, 1) for a in range(n_arms)},
+        })
+    return specs
+
+def _chunk(spec, n, unit_offset, rng, start_date, days, truth=None) -> pa.Table:
+    """
+    One chunk of an experiment's units: features, assignment, outcomes and the true
+    per-unit effect (CATE, on the visit and conversion scale) of the highest arm over
+    control. The CATE is counterfactual, so it is set for every unit whatever its arm.
+    If given, `truth` accumulates per arm the units assigned and the summed effect of
+    that arm over all units (for the ground-truth ATE).
+    """
+    # 1. Pre-experiment features
+    recency = rng.integers(1, 13, n, dtype=np.int8)
+    history = rng.gamma(2.0, 120.0, n).astype(np.float32)
+    mens = rng.random(n) < 0.55
+    womens = rng.random(n) < 0.55
+    newbie = rng.random(n) < 0.5
+    zip_code = np.searchsorted([0.15, 0.60], rng.random(n)).astype(np.int8)
+    channel = np.searchsorted([0.12, 0.56], rng.random(n)).astype(np.int8)
+
+    # 2. Assignment (realized allocation, so SRM experiments drift from the plan)
+    cdf = np.cumsum(list(spec['realized_allocation'].values()))[:-1]
+    treatment = np.searchsorted(cdf, rng.random(n), side='right').astype(np.int8)
+
+    # 3. Outcomes: baseline visit propensity falls with recency; planted effect by driver trait
+    drivers = {'mens': mens, 'womens': womens, 'newbie': newbie, 'urban': zip_code == 2, 'web': channel == 2}
+    p0 = spec['base_visit'] * (1.5 - recency / 12.0)
+    lifts = np.array(list(spec['arm_lifts'].values()))
+    scale = 1 + spec['heterogeneity'] * np.where(drivers[spec['driver']], 1.0, -1.0)
+    # Every unit's visit-probability effect under every arm (arms x units)
+    effects = np.clip(p0 + lifts[:, None] * scale, 0.0, 1.0) - p0
+    visit = rng.random(n) < p0 + effects[treatment, np.arange(n)]
+    conversion = visit & (rng.random(n) < spec['conversion_rate'])
+    true_cate = effects[-1]
+    if truth is not None:
+        _accumulate(truth, np.bincount(treatment, minlength=len(lifts)), effects.sum(axis=1))
+
+    batch_date = np.datetime64(start_date, 'D') + rng.integers(0, days, n)
+    return pa.table({
+        'experiment_id': pa.array(np.full(n, spec['experiment_id'], dtype=np.int32)),
+        'unit_id': pa.array(np.arange(unit_offset, unit_offset + n, dtype=np.int64)),
+        'treatment': pa.array(treatment),
+        'batch_date': pa.array(batch_date.astype('datetime64[D]')),
+        'recency': pa.array(recency),
+        'history': pa.array(history),
+        'mens': pa.array(mens.astype(np.int8)),
+        'womens': pa.array(womens.astype(np.int8)),
+        'newbie': pa.array(newbie.astype(np.int8)),
+        'zip_code': pa.DictionaryArray.from_arrays(zip_code, ZIP_CODES),
+        'channel': pa.DictionaryArray.from_arrays(channel, CHANNELS),
+        'outcome_visit': pa.array(visit.astype(np.int8)),
+        'outcome_conversion': pa.array(conversion.astype(np.int8)),
+        'true_cate_visit': pa.array(true_cate.astype(np.float32)),
+        'true_cate_conversion': pa.array((true_cate * spec['conversion_rate']).astype(np.float32)),
+    })
+
+def write_chunks(chunks, output_path: str) -> int:
+    """
+    Streams Arrow tables to one Parquet (by extension) or CSV file; returns rows written.
+    Only one chunk is held in memory at a time.
+    """
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    rows = 0
+    writer = None
+    try:
+        for table in chunks:
+            if writer is None:
+                if output_path.endswith('.parquet'):
+                    writer = pq.ParquetWriter(output_path, table.schema, compression='snappy')
+                else:
+                    # CSV has no dictionary type: write plain strings
+                    table = _plain(table)
+                    writer = pa_csv.CSVWriter(output_path, table.schema)
+            elif not output_path.endswith('.parquet'):
+                table = _plain(table)
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def _plain(table: pa.Table) -> pa.Table:
+    return pa.table({
+        name: col.cast(col.type.value_type) if pa.types.is_dictionary(col.type) else col
+        for name, col in zip(table.column_names, table.columns)
+    })
+
+def generate_experiments(output_path: str, n_rows: int, specs: list, chunksize=2_000_000, seed=42,
+                         start_date='2023-01-01', days=14) -> dict:
+    """
+    Writes n_rows synthetic observations (split evenly over the experiments in `specs`)
+    chunk by chunk, with memory bounded by `chunksize`. Each chunk draws from its own
+    generator seeded by (seed, experiment_id, chunk index), so output depends only on the
+    inputs. The ground truth (specs plus realized per-arm counts and each arm's ATE over
+    all units) is written next to the data as <name>.truth.json and returned.
+    """
+    sizes = np.full(len(specs), n_rows // len(specs))
+    sizes[:n_rows % len(specs)] += 1
+    truth = {spec['experiment_id']: {} for spec in specs}
+
+    def chunks():
+        unit_offset = 0
+        for spec, size in zip(specs, sizes):
+            for index, start in enumerate(range(0, int(size), chunksize)):
+                n = min(chunksize, int(size) - start)
+                rng = np.random.default_rng([seed, spec['experiment_id'], index])
+                yield _chunk(spec, n, unit_offset, rng, start_date, days, truth[spec['experiment_id']])
+                unit_offset += n
+
+    started = time.perf_counter()
+    rows = write_chunks(chunks(), output_path)
+    seconds = time.perf_counter() - started
+
+    ground_truth = {
+        'rows': rows,
+        'seed': seed,
+        'experiments': [dict(spec, arms=_arm_truth(truth[spec['experiment_id']], spec['conversion_rate']))
+                        for spec in specs],
+    }
+    with open(os.path.splitext(output_path)[0] + '.truth.json', 'w') as f:
+        json.dump(ground_truth, f, indent=2)
+
+    logger.info(f"Wrote {rows:,} rows to {output_path} in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/sec)")
+    return ground_truth
+
+def _accumulate(acc: dict, counts, effects):
+    # Per-arm running assigned counts, plus units seen and effect sums over all units
+    total = int(counts.sum())
+    for arm in range(len(counts)):
+        n, units, v = acc.get(arm, (0, 0, 0.0))
+        acc[arm] = (n + int(counts[arm]), units + total, v + float(effects[arm]))
+
+def _arm_truth(acc: dict, conversion_rate: float) -> dict:
+    return {
+        str(arm): {'n': n, 'ate_visit': v / units if units else None,
+                   'ate_conversion': v * conversion_rate / units if units else None}
+        for arm, (n, units, v) in sorted(acc.items())
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic multi-experiment observations with known ground truth.")
+    parser.add_argument("--output-path", required=True, help=".parquet or .csv")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--experiments", type=int, default=1)
+    parser.add_argument("--arms", type=int, default=2)
+    parser.add_argument("--allocation", type=float, nargs="+", default=None, help="Planned weight per arm; default equal")
+    parser.add_argument("--lift", type=float, default=0.03, help="Visit-probability lift of the highest arm")
+    parser.add_argument("--heterogeneity", type=float, default=1.0)
+    parser.add_argument("--srm-experiments", type=int, default=0, help="Number of experiments with injected SRM")
+    parser.add_argument("--srm-shift", type=float, default=0.02)
+    parser.add_argument("--chunksize", type=int, default=2_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start-date", default="2023-01-01")
+    parser.add_argument("--days", type=int, default=14)
+    args = parser.parse_args()
+
+    specs = experiment_specs(args.experiments, args.arms, args.allocation, args.lift, args.heterogeneity,
+                             args.srm_experiments, args.srm_shift, seed=args.seed)
+    generate_experiments(args.output_path, args.rows, specs, args.chunksize, args.seed, args.start_date, args.days)
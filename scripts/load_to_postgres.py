@@ -1,28 +1,25 @@
 import argparse
 import logging
-import pandas as pd
 from sqlalchemy import create_engine
 
+from orchestration.dagster_app.bulk_load import copy_load, HILLSTROM_COLUMNS
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def load_to_postgres(file_path, table_name, db_url):
     """
-    Loads CSV data into Postgres using pandas chunking.
+    Loads CSV or Parquet data into Postgres with COPY (staging table + atomic swap).
     """
     engine = create_engine(db_url)
     
     logger.info(f"Loading {file_path} into {table_name}...")
     
-    chunksize = 10000
-    with pd.read_csv(file_path, chunksize=chunksize) as reader:
-        for i, chunk in enumerate(reader):
-            if_exists = 'replace' if i == 0 else 'append'
-            chunk.to_sql(table_name, engine, schema='raw', if_exists=if_exists, index=False)
-            if i % 10 == 0:
-                logger.info(f"Processed chunk {i}...")
+    # Explicit types for the known raw table, inferred from a sample otherwise
+    column_types = HILLSTROM_COLUMNS if table_name == 'hillstrom' else None
+    stats = copy_load(engine, file_path, table_name, schema='raw', column_types=column_types)
                 
-    logger.info("Load complete.")
+    logger.info(f"Load complete: {stats['rows']} rows, {stats['rows_per_sec']:,.0f} rows/sec.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
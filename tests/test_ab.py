@@ -1,7 +1,7 @@
 import pandas as pd
 import numpy as np
 
-from analysis.ab_tests import calculate_ab_stats
+from analysis.ab_tests import calculate_ab_stats, calculate_ab_stats_from_moments, calculate_ab_stats_batch
 
 def test_binary_stats():
     # Construct obvious win
@@ -30,3 +30,104 @@ def test_continuous_stats():
     
     assert res['effect_estimate'] > 1.0 # approx 2
     assert res['p_value'] < 0.001
+
+def test_moments_match_unit_level():
+    # Sufficient statistics must reproduce the unit-level result exactly
+    np.random.seed(0)
+    t = np.random.exponential(12, 500)
+    c = np.random.exponential(10, 400)
+    df = pd.DataFrame({
+        'treatment': [1]*500 + [0]*400,
+        'spend': np.concatenate([t, c])
+    })
+    
+    res_df = calculate_ab_stats(df, 'spend', metric_type='continuous')
+    res_mom = calculate_ab_stats_from_moments(
+        len(t), t.sum(), (t**2).sum(), len(c), c.sum(), (c**2).sum(), 'spend', metric_type='continuous'
+    )
+    
+    for key in ['effect_estimate', 'p_value', 'ci_low', 'ci_high']:
+        assert np.isclose(res_df[key], res_mom[key])
+    assert res_mom['method'] == 'welch_t_test'
+
+def test_moments_match_statsmodels():
+    from statsmodels.stats.proportion import proportions_ztest
+    from statsmodels.stats.weightstats import CompareMeans, DescrStatsW
+    
+    np.random.seed(1)
+    t = np.random.normal(5, 2, 300)
+    c = np.random.normal(4.5, 3, 200)
+    res = calculate_ab_stats_from_moments(len(t), t.sum(), (t**2).sum(), len(c), c.sum(), (c**2).sum(), 'x')
+    cm = CompareMeans(DescrStatsW(t), DescrStatsW(c))
+    _, pval, _ = cm.ttest_ind(usevar='unequal')
+    ci_low, ci_high = cm.tconfint_diff(usevar='unequal')
+    assert np.isclose(res['p_value'], pval)
+    assert np.isclose(res['ci_low'], ci_low) and np.isclose(res['ci_high'], ci_high)
+    
+    res_bin = calculate_ab_stats_from_moments(1000, 200, 200, 1000, 100, 100, 'conv', metric_type='binary')
+    _, pval_bin = proportions_ztest(np.array([200, 100]), np.array([1000, 1000]))
+    assert np.isclose(res_bin['p_value'], pval_bin)
+    assert res_bin['method'] == 'z_test'
+
+def test_batch_matches_single_metric_calls():
+    np.random.seed(2)
+    n = 2000
+    df = pd.DataFrame({
+        'treatment': np.random.randint(0, 2, n),
+        'conv': np.random.binomial(1, 0.1, n),
+        'spend': np.random.exponential(10, n),
+        'channel': np.random.choice(['Web', 'Phone'], n),
+    })
+    
+    batch = calculate_ab_stats_batch(df, [('conv', 'binary'), ('spend', 'continuous')], segment_cols=['channel'])
+    
+    # Overall rows come first, then one row per segment and metric
+    assert set(batch['segment']) == {'all', 'channel=Web', 'channel=Phone'}
+    assert len(batch) == 6
+    
+    overall = batch[(batch['segment'] == 'all') & (batch['metric_name'] == 'spend')].iloc[0]
+    single = calculate_ab_stats(df, 'spend', metric_type='continuous')
+    assert np.isclose(overall['p_value'], single['p_value'])
+    assert overall['sample_size'] == n
+    
+    web = df[df['channel'] == 'Web']
+    seg = batch[(batch['segment'] == 'channel=Web') & (batch['metric_name'] == 'conv')].iloc[0]
+    single_web = calculate_ab_stats(web, 'conv', metric_type='binary')
+    assert np.isclose(seg['effect_estimate'], single_web['effect_estimate'])
+    assert np.isclose(seg['ci_low'], single_web['ci_low'])
+    assert seg['method'] == 'z_test'
+
+def _half_width(res):
+    return (res['ci_high'] - res['ci_low']) / 2
+
+def test_variance_survives_a_large_mean(tmp_path):
+    # Mean 1e8, sd 1: sumsq - n * mean^2 cancels to noise; the centered sum of squares does not
+    from analysis.ab_tests import fetch_arm_moments, ab_results_from_moments
+    from orchestration.dagster_app.warehouse import ParquetWarehouse
+
+    rng = np.random.default_rng(3)
+    t = 1e8 + rng.normal(0.5, 1, 20000)
+    c = 1e8 + rng.normal(0, 1, 20000)
+    half_width = 1.96 * np.sqrt(t.var(ddof=1) / len(t) + c.var(ddof=1) / len(c))
+
+    raw = calculate_ab_stats_from_moments(len(t), t.sum(), (t**2).sum(), len(c), c.sum(), (c**2).sum(), 'x')
+    assert not np.isclose(_half_width(raw), half_width, rtol=0.01)
+
+    df = pd.DataFrame({
+        'experiment_id': 1, 'unit_id': [str(i) for i in range(len(t) + len(c))],
+        'treatment': [1] * len(t) + [0] * len(c), 'outcome_visit': np.concatenate([t, c]),
+        'batch_date': pd.Timestamp('2023-01-01').date(),
+    })
+    assert np.isclose(_half_width(calculate_ab_stats(df, 'outcome_visit')), half_width, rtol=1e-3)
+
+    # Same through the SQL GROUP BY (VAR_SAMP), here on the DuckDB warehouse
+    warehouse = ParquetWarehouse(str(tmp_path / 'warehouse'))
+    df.to_parquet(tmp_path / 'observations.parquet')
+    with warehouse.transaction() as tx:
+        # outcome_visit is an INT column in init.sql
+        tx.load('experimentation.experiment_observations', str(tmp_path / 'observations.parquet'), column_types={
+            'experiment_id': 'INT', 'unit_id': 'VARCHAR', 'treatment': 'INT', 'outcome_visit': 'DOUBLE', 'batch_date': 'DATE'})
+    moments = fetch_arm_moments(warehouse, ['outcome_visit'])
+    res = ab_results_from_moments(moments, {'outcome_visit': 'continuous'}, group_cols=['experiment_id']).iloc[0]
+    assert np.isclose(_half_width(res), half_width, rtol=1e-3)
+    assert np.isclose(res['effect_estimate'], t.mean() - c.mean())
@@ -0,0 +1,83 @@
+import pandas as pd
+import numpy as np
+from scipy import stats, integrate
+
+from analysis.ab_tests import calculate_ab_stats_from_moments, summarize_arm_moments
+from analysis.bayesian import compare_posteriors_from_moments, bayesian_results_from_moments
+from analysis.segments import segment_cube
+
+def _beta_prob(a_t, b_t, a_c, b_c):
+    # P(T > C) by numerical integration over the treatment posterior
+    return integrate.quad(lambda x: stats.beta.pdf(x, a_t, b_t) * stats.beta.cdf(x, a_c, b_c), 0, 1)[0]
+
+def test_binary_small_cells_are_exact():
+    # Small cells (exact Beta sums), including ones where the failures are the small count
+    cells = [(50, 12, 60, 8), (60, 8, 50, 12), (20, 0, 20, 1), (3000, 2990, 2000, 1985)]
+    n_t, s_t, n_c, s_c = (np.array(col, dtype=float) for col in zip(*cells))
+    res = compare_posteriors_from_moments(n_t, s_t, s_t, n_c, s_c, s_c, metric_type='binary')
+
+    # Uniform prior: Beta(1 + successes, 1 + failures)
+    for i, (nt, st, nc, sc) in enumerate(cells):
+        expected = _beta_prob(1 + st, 1 + nt - st, 1 + sc, 1 + nc - sc)
+        assert np.isclose(res['prob_treatment_better'][i], expected, atol=1e-6)
+
+    # E[max(T - C, 0)] - E[max(C - T, 0)] = E[T - C]
+    assert np.allclose(res['expected_loss_control'] - res['expected_loss_treatment'], res['effect_estimate'])
+
+def test_binary_loss_matches_sampling():
+    rng = np.random.default_rng(0)
+    res = compare_posteriors_from_moments(50, 12, 12, 60, 8, 8, metric_type='binary')
+    t, c = rng.beta(13, 39, 1_000_000), rng.beta(9, 53, 1_000_000)
+    assert np.isclose(res['expected_loss_treatment'][0], np.maximum(c - t, 0).mean(), rtol=0.05)
+    assert np.isclose(res['expected_loss_control'][0], np.maximum(t - c, 0).mean(), rtol=0.01)
+
+def test_binary_large_cells_approximation():
+    # Above the exact-sum threshold the normal approximation is used
+    res = compare_posteriors_from_moments(10000, 1100, 1100, 10000, 1000, 1000, metric_type='binary')
+    assert np.isclose(res['prob_treatment_better'][0], _beta_prob(1101, 8901, 1001, 9001), atol=1e-3)
+    assert res['ci_low'][0] > 0
+
+def test_continuous_matches_welch_for_large_samples():
+    rng = np.random.default_rng(1)
+    t, c = rng.normal(10.3, 2, 5000), rng.normal(10, 3, 4000)
+    moments = (len(t), t.sum(), (t ** 2).sum(), len(c), c.sum(), (c ** 2).sum())
+    res = compare_posteriors_from_moments(*moments, metric_type='continuous')
+    ref = calculate_ab_stats_from_moments(*moments, 'spend', metric_type='continuous')
+
+    # Reference prior: credible interval ~ Welch confidence interval, P(T > C) ~ 1 - p / 2
+    assert np.isclose(res['effect_estimate'][0], ref['effect_estimate'])
+    assert np.isclose(res['ci_low'][0], ref['ci_low'], rtol=1e-3)
+    assert np.isclose(res['ci_high'][0], ref['ci_high'], rtol=1e-3)
+    assert np.isclose(res['prob_treatment_better'][0], 1 - ref['p_value'] / 2, atol=1e-4)
+
+def test_degenerate_cells_are_nan():
+    res = compare_posteriors_from_moments([0, 100], [0, 5], [0, 5], [100, 0], [5, 0], [5, 0], metric_type='binary')
+    assert np.isnan(res['prob_treatment_better']).all()
+    assert np.isnan(res['expected_loss_treatment']).all()
+
+def test_results_layout_and_segments():
+    rng = np.random.default_rng(2)
+    n = 4000
+    df = pd.DataFrame({
+        'experiment_id': rng.integers(1, 3, n),
+        'treatment': rng.integers(0, 2, n),
+        'channel': rng.choice(['Web', 'Phone'], n),
+        'conv': rng.integers(0, 2, n),
+        'spend': rng.normal(0, 1, n),
+    })
+    metrics = {'conv': 'binary', 'spend': 'continuous'}
+    moments = summarize_arm_moments(df, list(metrics), group_cols=['experiment_id', 'channel'])
+    res = bayesian_results_from_moments(moments, metrics, group_cols=['experiment_id'], segment_cols=['channel'])
+
+    assert len(res) == 2 * 2 * 2
+    assert (res['method'] == 'bayesian').all()
+    assert res['p_value'].isna().all()
+    assert set(res['segment']) == {'channel=Web', 'channel=Phone'}
+    assert res['prob_treatment_better'].between(0, 1).all()
+
+    # Same cells as the frequentist rows in the segment cube; NaN p-values stay out of the FDR family
+    cube = segment_cube(df, metrics, ['channel'], group_cols=['experiment_id'], bayesian=True)
+    bayes = cube[cube['method'] == 'bayesian']
+    assert len(bayes) == len(cube) / 2
+    assert bayes['p_value_adjusted'].isna().all()
+    assert cube.loc[cube['method'] != 'bayesian', 'p_value_adjusted'].notna().all()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.suite import compare_to_baseline, load_baselines, save_baselines
+
+def _results(rows):
+    return pd.DataFrame(rows, columns=['benchmark', 'seconds', 'peak_mb'])
+
+def test_compare_to_baseline_statuses():
+    baselines = {'machine': None, 'benchmarks': {
+        'slow': {'seconds': 1.0, 'peak_mb': 100.0},
+        'fat': {'seconds': 1.0, 'peak_mb': 100.0},
+        'noisy': {'seconds': 0.001, 'peak_mb': 0.5},
+        'fast': {'seconds': 1.0, 'peak_mb': 100.0},
+        'faster_within_memory_threshold': {'seconds': 1.0, 'peak_mb': 100.0},
+        'same': {'seconds': 1.0, 'peak_mb': 100.0},
+    }}
+    results = _results([
+        ('slow', 1.5, 100.0),
+        ('fat', 1.0, 150.0),
+        # 3x slower and 2x larger, but below the noise floor (10 ms / 1 MB)
+        ('noisy', 0.003, 1.0),
+        ('fast', 0.5, 90.0),
+        ('faster_within_memory_threshold', 0.5, 115.0),
+        ('same', 1.1, 105.0),
+        ('brand_new', 1.0, 10.0),
+    ])
+    compared = compare_to_baseline(results, baselines).set_index('benchmark')
+
+    assert compared['status'].to_dict() == {
+        'slow': 'regression', 'fat': 'regression', 'noisy': 'ok', 'fast': 'improved',
+        'faster_within_memory_threshold': 'improved', 'same': 'ok', 'brand_new': 'new',
+    }
+    assert np.isclose(compared.loc['slow', 'time_ratio'], 1.5)
+    assert np.isnan(compared.loc['brand_new', 'baseline_seconds'])
+
+def test_thresholds_are_configurable():
+    baselines = {'benchmarks': {'case': {'seconds': 1.0, 'peak_mb': 100.0}}}
+    results = _results([('case', 1.2, 100.0)])
+    assert compare_to_baseline(results, baselines)['status'].iloc[0] == 'ok'
+    assert compare_to_baseline(results, baselines, time_threshold=0.1)['status'].iloc[0] == 'regression'
+
+def test_save_baselines_merges(tmp_path):
+    path = str(tmp_path / 'baselines.json')
+    assert load_baselines(path) == {'machine': None, 'benchmarks': {}}
+
+    save_baselines(_results([('a', 1.0, 10.0), ('b', 2.0, 20.0)]), path)
+    saved = save_baselines(_results([('b', 3.0, 30.0)]), path)
+    assert saved['benchmarks'] == {'a': {'seconds': 1.0, 'peak_mb': 10.0}, 'b': {'seconds': 3.0, 'peak_mb': 30.0}}
+    assert load_baselines(path) == saved
@@ -1,7 +1,7 @@
 import pandas as pd
 import numpy as np
 
-from analysis.cuped import calculate_cuped_stats
+from analysis.cuped import calculate_cuped_stats, calculate_cuped_stats_streaming
 
 def test_cuped_variance_reduction():
     np.random.seed(42)
@@ -40,3 +40,22 @@ def test_cuped_no_correlation():
     })
     res = calculate_cuped_stats(df, 'metric', ['noise'])
     assert res['variance_reduction'] < 0.1
+
+def test_cuped_streaming_matches_in_memory():
+    np.random.seed(7)
+    n = 3000
+    x1 = np.random.normal(100, 10, n)
+    x2 = np.random.exponential(5, n)
+    treatment = np.random.choice([0, 1], n)
+    y = 0.8 * x1 + 0.5 * x2 + 3 * treatment + np.random.normal(0, 4, n)
+    df = pd.DataFrame({'treatment': treatment, 'x1': x1, 'x2': x2, 'y': y})
+    
+    res = calculate_cuped_stats(df, 'y', ['x1', 'x2'])
+    
+    # Feed the same rows as a generator of chunks
+    chunks = (df.iloc[i:i + 500] for i in range(0, n, 500))
+    res_stream = calculate_cuped_stats_streaming(chunks, 'y', ['x1', 'x2'])
+    
+    for key in ['effect_estimate', 'p_value', 'ci_low', 'ci_high', 'variance_reduction', 'mean_control']:
+        assert np.isclose(res[key], res_stream[key])
+    assert res_stream['method'] == 'cuped'
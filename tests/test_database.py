@@ -0,0 +1,127 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from orchestration.dagster_app import database
+from orchestration.dagster_app.database import PostgresTransaction, _batch, iter_arrow_batches, read_frame
+
+# cursor.description as (name, type OID): int4, numeric, jsonb, date, timestamp, text, unknown (uuid)
+DESCRIPTION = [('id', 23), ('total', 1700), ('details', 3802), ('day', 1082), ('at', 1114), ('name', 25),
+               ('token', 2950)]
+ROWS = [
+    (1, Decimal('2.5'), {'a': [1, 2]}, datetime.date(2023, 1, 1), datetime.datetime(2023, 1, 1, 12), 'x', 'u1'),
+    (2, None, None, None, None, None, 'u2'),
+]
+
+def test_batch_types_columns_from_oids():
+    batch = _batch(zip(*ROWS), DESCRIPTION)
+
+    assert batch.schema.names == [name for name, _ in DESCRIPTION]
+    assert batch.schema.types == [pa.int32(), pa.float64(), pa.string(), pa.date32(), pa.timestamp('us'),
+                                  pa.string(), pa.string()]
+    # numeric arrives as Decimal, json(b) as Python objects re-encoded to JSON text
+    assert batch.column('total').to_pylist() == [2.5, None]
+    assert batch.column('details').to_pylist() == ['{"a": [1, 2]}', None]
+    assert batch.schema.field('details').metadata == database.JSON_FIELD_METADATA
+    assert batch.schema.field('name').metadata is None
+
+    # Decoded back like psycopg2 would return them
+    df = database.arrow_to_frame(batch)
+    assert df['details'].tolist() == [{'a': [1, 2]}, None]
+    assert df['id'].dtype == np.int32
+
+def test_empty_batch_keeps_the_schema():
+    batch = _batch([[] for _ in DESCRIPTION], DESCRIPTION)
+    assert batch.num_rows == 0
+    # Known OIDs keep their type; unknown ones have nothing to infer from
+    assert batch.schema.field('id').type == pa.int32()
+    assert batch.schema.field('day').type == pa.date32()
+    assert batch.schema.field('token').type == pa.null()
+
+class _Column:
+    def __init__(self, name, type_code):
+        self.name, self.type_code = name, type_code
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursor = type('Cursor', (), {'description': [_Column(*col) for col in DESCRIPTION]})()
+
+    def partitions(self, size):
+        for start in range(0, len(self.rows), size):
+            yield self.rows[start:start + size]
+
+class _Connection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.options = None
+
+    def execution_options(self, **options):
+        self.options = options
+        return self
+
+    def execute(self, query, params):
+        return _Result(self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class _Engine:
+    def __init__(self, rows):
+        self.connection = _Connection(rows)
+
+    def connect(self):
+        return self.connection
+
+def test_iter_arrow_batches_streams_in_batches():
+    engine = _Engine(ROWS * 3)
+    batches = list(iter_arrow_batches(engine, "SELECT 1", batch_size=4))
+
+    assert [b.num_rows for b in batches] == [4, 2]
+    assert engine.connection.options == {'stream_results': True, 'max_row_buffer': 4}
+    assert read_frame(engine, "SELECT 1", batch_size=4)['id'].tolist() == [1, 2] * 3
+
+def test_iter_arrow_batches_empty_result_yields_schema():
+    (batch,) = iter_arrow_batches(_Engine([]), "SELECT 1")
+    assert batch.num_rows == 0
+    df = read_frame(_Engine([]), "SELECT 1")
+    assert df.empty and list(df.columns) == [name for name, _ in DESCRIPTION]
+
+class _FakeCursor:
+    def __init__(self, integer_columns):
+        self.integer_columns = integer_columns
+        self.queries = []
+
+    def execute(self, query, params=None):
+        self.queries.append((query, params))
+
+    def fetchall(self):
+        return [(col,) for col in self.integer_columns]
+
+def test_cast_integers_fixes_float_integer_columns():
+    cursor = _FakeCursor(['experiment_id', 'sample_size'])
+    tx = PostgresTransaction(cursor)
+    frame = pd.DataFrame({
+        'experiment_id': [1.0, 2.0],
+        'sample_size': [100.0, np.nan], # NaN made the column float
+        'p_value': [0.5, np.nan],
+        'metric_name': ['a', 'b'],
+    })
+
+    cast = tx._cast_integers('experimentation.experiment_results', frame)
+    assert cast['experiment_id'].dtype == 'Int64'
+    assert cast['sample_size'].dtype == 'Int64'
+    assert cast['sample_size'].isna().tolist() == [False, True]
+    assert cast['p_value'].dtype == np.float64
+    assert cursor.queries[0][1] == ('experimentation', 'experiment_results')
+
+    # Integer columns are looked up once per table; frames without float integers pass through
+    ints = pd.DataFrame({'experiment_id': [1, 2]})
+    assert tx._cast_integers('experimentation.experiment_results', ints) is ints
+    assert len(cursor.queries) == 1
@@ -0,0 +1,113 @@
+import pandas as pd
+import numpy as np
+
+from analysis.decision_report import render_decision_reports
+
+def _inputs():
+    # Three experiments: significant win, not significant, failed SRM; the first has uplift rows
+    registry = pd.DataFrame({
+        'experiment_id': [1, 2, 3],
+        'name': ['Win', 'Flat', 'Broken'],
+        'status': ['analyzed'] * 3,
+        'start_date': ['2023-01-01'] * 3,
+        'primary_metric': ['outcome_conversion', None, 'outcome_conversion'],
+    })
+    health = pd.DataFrame({
+        'experiment_id': [1, 3],
+        'check_name': ['SRM', 'SRM'],
+        'status': ['PASS', 'FAIL'],
+        'details': ['{}', '{}'],
+    })
+    results = pd.DataFrame({
+        'experiment_id': [1, 1, 2, 3],
+        'metric_name': ['outcome_conversion', 'outcome_conversion', 'conversion_cuped', 'outcome_conversion'],
+        'method': ['z_test', 'z_test', 'cuped', 'z_test'],
+        'segment': ['all', 'mens', None, 'all'],
+        'effect_estimate': [0.01, -0.05, 0.002, 0.02],
+        'p_value': [0.001, 0.0001, 0.4, 0.001],
+        'ci_low': [0.005, -0.07, -0.003, 0.01],
+        'ci_high': [0.015, -0.03, 0.007, 0.03],
+    })
+    cutoffs = np.round(np.arange(1, 101) / 100, 2)
+    curve = {
+        'cutoff': cutoffs.tolist(),
+        'n_targeted': (cutoffs * 1000).astype(int).tolist(),
+        'uplift': [None] + [0.01] * 99,
+        'uplift_ci_low': [None] + [0.0] * 99,
+        'uplift_ci_high': [None] + [0.02] * 99,
+        'qini': (cutoffs * 10).tolist(),
+        'qini_ci_low': (cutoffs * 5).tolist(),
+        'qini_ci_high': (cutoffs * 15).tolist(),
+    }
+    uplift = pd.DataFrame({
+        'experiment_id': [1, 1],
+        'model_name': ['solo_model', 'class_transform'],
+        'qini_auc': [0.05, 0.03],
+        'qini_auc_ci_low': [0.01, np.nan],
+        'qini_auc_ci_high': [0.09, np.nan],
+        'expected_value_lift': [1.5, 1.2],
+        'curve': [curve, None],
+    })
+    return {'registry': registry, 'health': health, 'results': results, 'uplift': uplift}
+
+def test_decisions_per_experiment():
+    reports = render_decision_reports(_inputs()).set_index('experiment_id')
+
+    # The significant negative 'mens' segment row does not override the overall win
+    assert reports.loc[1, 'decision'] == 'SHIP'
+    # No primary metric set: falls back to any conversion metric; rows without segment are overall
+    assert reports.loc[2, 'decision'] == 'ITERATE'
+    assert reports.loc[3, 'decision'] == 'HOLD (Health Failure)'
+
+    assert '| SRM | PENDING | No check run |' in reports.loc[2, 'rationale_markdown']
+    assert 'Results are invalid.' in reports.loc[3, 'rationale_markdown']
+
+def test_uplift_section_and_curve():
+    reports = render_decision_reports(_inputs()).set_index('experiment_id')
+    md = reports.loc[1, 'rationale_markdown']
+
+    assert '**solo_model**: Qini AUC = 0.050 [0.010, 0.090]' in md
+    assert '**class_transform**: Qini AUC = 0.030. ' in md
+    assert '### Targeting Curve (solo_model)' in md
+    # Only the report's ten cut-offs are shown
+    assert md.count('| 0.0100 | [0.0000, 0.0200] |') == 10
+    assert '| 30% | 300 | 0.0100 | [0.0000, 0.0200] | 3.0 |' in md
+
+    # Experiments without uplift runs have no uplift section
+    assert 'Uplift Modeling' not in reports.loc[2, 'rationale_markdown']
+
+def test_empty_inputs():
+    inputs = {name: df.iloc[0:0] for name, df in _inputs().items()}
+    reports = render_decision_reports(inputs)
+    assert reports.empty
+    assert list(reports.columns) == ['experiment_id', 'decision', 'rationale_markdown']
+
+def test_bayesian_rows_show_probability():
+    inputs = _inputs()
+    bayesian = pd.DataFrame({
+        'experiment_id': [2], 'metric_name': ['outcome_conversion'], 'method': ['bayesian'], 'segment': ['all'],
+        'effect_estimate': [0.002], 'p_value': [np.nan], 'ci_low': [-0.003], 'ci_high': [0.007],
+        'prob_treatment_better': [0.8123],
+    })
+    inputs['results'] = pd.concat([inputs['results'], bayesian], ignore_index=True)
+    reports = render_decision_reports(inputs).set_index('experiment_id')
+
+    assert '| outcome_conversion | bayesian | 0.0020 | P(T>C) 0.812 |' in reports.loc[2, 'rationale_markdown']
+    # The frequentist row still drives the decision
+    assert reports.loc[2, 'decision'] == 'ITERATE'
+
+def test_metrics_table_shows_overall_rows_only():
+    inputs = _inputs()
+    # A segment cube for experiment 1: many cells with the same metric and method
+    cube = pd.DataFrame({
+        'experiment_id': 1, 'metric_name': 'conversion_cuped', 'method': 'cuped',
+        'segment': [f'channel=Web|zip_code={i}' for i in range(40)],
+        'effect_estimate': 0.01, 'p_value': 0.2, 'ci_low': -0.01, 'ci_high': 0.03,
+    })
+    inputs['results'] = pd.concat([inputs['results'], cube], ignore_index=True)
+    md = render_decision_reports(inputs).set_index('experiment_id').loc[1, 'rationale_markdown']
+
+    table = md.split('## Key Metrics Results')[1].split('\n\n')[0]
+    rows = [line for line in table.splitlines() if line.startswith('| ') and not line.startswith('| Metric')]
+    assert rows == ['| outcome_conversion | z_test | 0.0100 | 0.0010 | [0.0050, 0.0150] |']
+    assert '_41 segment-level results not shown' in md
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from orchestration.dagster_app.feature_store import build_feature_frame, load_feature_matrix, write_features
+from orchestration.dagster_app.warehouse import ParquetWarehouse
+
+def _units(unit_ids):
+    return pd.DataFrame({
+        'experiment_id': 1, 'unit_id': unit_ids, 'treatment': [i % 2 for i in range(len(unit_ids))],
+        'outcome_visit': 0, 'outcome_conversion': 0, 'batch_date': pd.Timestamp('2023-01-01').date(),
+        'recency': range(len(unit_ids)), 'history': 1.0, 'mens': 1, 'womens': 0, 'newbie': 0,
+        'zip_code': 'Urban', 'channel': 'Web',
+    })
+
+def test_feature_rows_are_ordered_by_unit(tmp_path):
+    warehouse = ParquetWarehouse(str(tmp_path))
+    # Written out of order and across files, as reloads and partitions leave them
+    parts = [_units(['u3', 'u1']), _units(['u4', 'u0', 'u2'])]
+    with warehouse.transaction() as tx:
+        for part in parts:
+            tx.append('experimentation.experiment_observations', part.iloc[:, :6])
+        for part in reversed(parts):
+            write_features(tx, pd.concat([part[['experiment_id', 'unit_id', 'batch_date']],
+                                          build_feature_frame(part)], axis=1))
+
+    df, X, feature_cols = load_feature_matrix(warehouse, 1)
+    assert df['unit_id'].tolist() == ['u0', 'u1', 'u2', 'u3', 'u4']
+    # The matrix rows follow the frame
+    assert X[:, feature_cols.index('recency')].tolist() == [1, 1, 2, 0, 0]
@@ -0,0 +1,66 @@
+import json
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from scripts.generate_experiments import experiment_specs, generate_experiments
+
+def test_specs_shift_control_traffic_for_srm():
+    specs = experiment_specs(n_experiments=3, n_arms=3, allocation=[2, 1, 1], srm_experiments=1, srm_shift=0.05)
+
+    assert [spec['srm'] for spec in specs] == [True, False, False]
+    planned, realized = specs[0]['allocation'], specs[0]['realized_allocation']
+    assert np.isclose(realized['0'], planned['0'] - 0.05)
+    assert np.isclose(sum(realized.values()), 1.0)
+    # The shift goes to the other arms pro rata
+    assert np.isclose(realized['1'] / realized['2'], planned['1'] / planned['2'])
+    assert specs[1]['realized_allocation'] == specs[1]['allocation']
+
+    with pytest.raises(ValueError):
+        experiment_specs(n_arms=3, allocation=[1, 1])
+
+def test_data_follows_realized_allocation_and_truth(tmp_path):
+    specs = experiment_specs(n_experiments=2, srm_experiments=1, srm_shift=0.1, lift=0.05)
+    output = str(tmp_path / 'obs.parquet')
+    truth = generate_experiments(output, 40000, specs, chunksize=7000)
+    df = pq.read_table(output).to_pandas()
+
+    # Realized SRM shows up in the data: ~40% control instead of 50%
+    control_share = (df['treatment'] == 0).groupby(df['experiment_id']).mean()
+    assert abs(control_share[1] - 0.4) < 0.02
+    assert abs(control_share[2] - 0.5) < 0.02
+
+    # The JSON sidecar holds the same truth; the top arm's ATE is the mean CATE over all units
+    with open(tmp_path / 'obs.truth.json') as f:
+        assert json.load(f) == json.loads(json.dumps(truth))
+    for experiment in truth['experiments']:
+        units = df[df['experiment_id'] == experiment['experiment_id']]
+        for arm, arm_truth in experiment['arms'].items():
+            assert arm_truth['n'] == (units['treatment'] == int(arm)).sum()
+        assert experiment['arms']['0']['ate_visit'] == 0
+        assert np.isclose(experiment['arms']['1']['ate_visit'], units['true_cate_visit'].mean(), rtol=1e-5)
+        # Counterfactual: control units carry the effect too, the same on average as treated ones
+        cate = units.groupby('treatment')['true_cate_visit'].mean()
+        assert cate[0] > 0 and np.isclose(cate[0], cate[1], rtol=0.05)
+
+def test_chunk_size_does_not_change_layout_or_truth(tmp_path):
+    specs = experiment_specs(n_experiments=2, lift=0.05)
+    small = generate_experiments(str(tmp_path / 'small.parquet'), 30001, specs, chunksize=4000)
+    large = generate_experiments(str(tmp_path / 'large.parquet'), 30001, specs, chunksize=50000)
+    df_small = pq.read_table(tmp_path / 'small.parquet').to_pandas()
+    df_large = pq.read_table(tmp_path / 'large.parquet').to_pandas()
+
+    # Same rows, unit ids, experiment sizes and schema; only the random streams differ
+    assert small['rows'] == large['rows'] == 30001
+    assert df_small['unit_id'].tolist() == df_large['unit_id'].tolist() == list(range(30001))
+    assert (df_small['experiment_id'].value_counts().sort_index() == df_large['experiment_id'].value_counts().sort_index()).all()
+    assert pq.read_schema(tmp_path / 'small.parquet') == pq.read_schema(tmp_path / 'large.parquet')
+    for exp_small, exp_large in zip(small['experiments'], large['experiments']):
+        for arm in exp_small['arms']:
+            assert abs(exp_small['arms'][arm]['ate_visit'] - exp_large['arms'][arm]['ate_visit']) < 0.01
+
+    # Deterministic for a given chunk size
+    again = generate_experiments(str(tmp_path / 'again.parquet'), 30001, specs, chunksize=4000)
+    assert again == small
+    assert pq.read_table(tmp_path / 'again.parquet').equals(pq.read_table(tmp_path / 'small.parquet'))
@@ -0,0 +1,100 @@
+import time
+
+import pandas as pd
+import pytest
+
+from orchestration.dagster_app import instrumentation
+from orchestration.dagster_app.instrumentation import MetricsRecorder, recording, phase, timed_chunks, summarize_metrics
+
+MB = 2 ** 20
+
+class FakeRss:
+    # Kernel RSS high-water mark: rises with allocations, reset to the current RSS
+    def __init__(self, current):
+        self.current = self.peak = current
+
+    def allocate(self, size):
+        self.current = size
+        self.peak = max(self.peak, size)
+
+    def reset(self):
+        self.peak = self.current
+
+@pytest.fixture
+def rss(monkeypatch):
+    fake = FakeRss(100 * MB)
+    monkeypatch.setattr(instrumentation, '_read_peak_rss', lambda: fake.peak)
+    monkeypatch.setattr(instrumentation, '_reset_peak_rss', fake.reset)
+    return fake
+
+def test_nested_phases_fold_peaks_outward(rss):
+    recorder = MetricsRecorder(experiment_id=7)
+    with recorder.phase('outer') as outer:
+        with recorder.phase('inner', rows=10):
+            rss.allocate(500 * MB)
+            rss.allocate(200 * MB)
+        # A sibling starts from the current RSS, not the earlier peak
+        with recorder.phase('sibling') as sibling:
+            sibling['bytes'] = 1024
+        outer['rows'] = 3
+
+    records = {r['phase']: r for r in recorder.records}
+    assert [r['phase'] for r in recorder.records] == ['inner', 'sibling', 'outer']
+    assert records['inner']['peak_rss_mb'] == 500
+    assert records['sibling']['peak_rss_mb'] == 200
+    assert records['outer']['peak_rss_mb'] == 500
+    assert records['outer']['seconds'] >= records['inner']['seconds'] + records['sibling']['seconds']
+    assert (records['inner']['rows'], records['sibling']['bytes'], records['outer']['rows']) == (10, 1024, 3)
+    assert {r['experiment_id'] for r in recorder.records} == {7}
+
+def test_phase_is_a_noop_outside_a_run(rss):
+    with phase('fit', rows=5) as stats:
+        stats['bytes'] = 1
+    recorder = MetricsRecorder()
+    with recording(recorder), phase('fit', rows=5):
+        pass
+    assert [r['phase'] for r in recorder.records] == ['fit']
+
+def _chunks(n_chunks, delay):
+    for i in range(n_chunks):
+        time.sleep(delay)
+        yield pd.DataFrame({'x': range(100 * i, 100 * (i + 1))}, dtype='int64')
+
+def test_timed_chunks_counts_only_the_producer():
+    recorder = MetricsRecorder()
+    with recording(recorder):
+        for _ in timed_chunks(_chunks(3, delay=0.01), name='sql_fetch'):
+            time.sleep(0.05)  # consumer work is not fetch time
+
+    (record,) = recorder.records
+    assert record['phase'] == 'sql_fetch'
+    assert (record['rows'], record['bytes']) == (300, 300 * 8)
+    assert 0.03 <= record['seconds'] < 0.1
+
+def test_timed_chunks_records_when_closed_early():
+    recorder = MetricsRecorder()
+    with recording(recorder):
+        chunks = timed_chunks(_chunks(3, delay=0))
+        next(chunks)
+        chunks.close()
+    assert [(r['phase'], r['rows']) for r in recorder.records] == [('sql_fetch', 100)]
+
+def test_summarize_metrics():
+    records = [
+        {'experiment_id': None, 'phase': 'total', 'seconds': 3.0, 'rows': None, 'bytes': None, 'peak_rss_mb': 300.0},
+        {'experiment_id': 1, 'phase': 'experiment', 'seconds': 1.0, 'rows': None, 'bytes': None, 'peak_rss_mb': 200.0},
+        {'experiment_id': 1, 'phase': 'sql_fetch', 'seconds': 0.5, 'rows': 1000, 'bytes': 2 * MB, 'peak_rss_mb': 150.0},
+        {'experiment_id': 2, 'phase': 'experiment', 'seconds': 2.0, 'rows': None, 'bytes': None, 'peak_rss_mb': 250.0},
+        {'experiment_id': 2, 'phase': 'sql_fetch', 'seconds': 1.5, 'rows': 3000, 'bytes': 6 * MB, 'peak_rss_mb': 240.0},
+    ]
+    metadata = {key: value.value for key, value in summarize_metrics(records).items()}
+
+    assert metadata['sql_fetch_seconds'] == 2.0
+    assert metadata['sql_fetch_rows'] == 4000
+    assert 'total_rows' not in metadata
+    assert metadata['peak_rss_mb'] == 300.0
+    assert metadata['experiments'] == 2
+    assert '| sql_fetch | 2 | 2 | 4000 | 8 | 240 |' in metadata['phases']
+    # Slowest experiment first
+    assert metadata['slowest_experiments'].splitlines()[2].startswith('| 2 | 2 |')
+    assert summarize_metrics([]) == {}
@@ -0,0 +1,29 @@
+import re
+
+from orchestration.dagster_app.migrations import list_migrations, migrate
+from orchestration.dagster_app.warehouse import SCHEMA_PATH, ParquetWarehouse
+
+# Tables, indexes and views declared with IF NOT EXISTS (the raw tables are recreated by every load)
+_OBJECT = re.compile(r'CREATE (?:UNIQUE )?(?:TABLE|INDEX|MATERIALIZED VIEW) IF NOT EXISTS ([\w.]+)')
+
+def _objects(sql):
+    return set(_OBJECT.findall(sql))
+
+def test_migrations_are_ordered_and_unique():
+    migrations = list_migrations()
+    versions = [version for version, _, _ in migrations]
+    assert versions == list(range(1, len(migrations) + 1))
+    assert migrations[0][1] == 'initial_schema'
+
+def test_migrations_create_everything_in_init_sql():
+    # A schema change goes into init.sql and a migration: older databases must end up the same
+    with open(SCHEMA_PATH) as f:
+        expected = _objects(f.read())
+    created = set()
+    for _, _, path in list_migrations():
+        with open(path) as f:
+            created |= _objects(f.read())
+    assert expected - created == set()
+
+def test_migrate_is_a_noop_on_the_warehouse(tmp_path):
+    assert migrate(ParquetWarehouse(str(tmp_path))) == []
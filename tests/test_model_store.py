@@ -0,0 +1,27 @@
+import os
+import time
+
+from analysis.model_store import ModelStore, model_key
+
+def test_model_store_roundtrip_and_lru_eviction(tmp_path):
+    store = ModelStore(str(tmp_path), max_entries=2)
+    keys = [model_key([[i]], method='m') for i in range(3)]
+    
+    store.put(keys[0], {'weights': [0]}, {'metrics': {'qini_auc': 0.1}})
+    store.put(keys[1], {'weights': [1]}, {'metrics': {'qini_auc': 0.2}})
+    
+    model, meta = store.get(keys[0])
+    assert model == {'weights': [0]} and meta['metrics']['qini_auc'] == 0.1
+    # keys[0] was just used, so keys[1] is the least recently used entry
+    past = time.time() - 60
+    os.utime(os.path.join(str(tmp_path), f"{keys[1]}.json"), (past, past))
+    
+    store.put(keys[2], {'weights': [2]}, {'metrics': {}})
+    assert store.get(keys[1]) is None
+    assert set(store.entries()['key']) == {keys[0], keys[2]}
+
+def test_model_key_depends_on_data_and_spec():
+    base = model_key([[1.0, 2.0]], method='solo_model', params={'max_depth': 5})
+    assert base == model_key([[1.0, 2.0]], method='solo_model', params={'max_depth': 5})
+    assert base != model_key([[1.0, 2.5]], method='solo_model', params={'max_depth': 5})
+    assert base != model_key([[1.0, 2.0]], method='solo_model', params={'max_depth': 4})
@@ -0,0 +1,65 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from orchestration.dagster_app.observation_cache import ObservationCache
+
+def _batches(fail_after=None):
+    def batches(self, engine, experiment_id):
+        for i in range(3):
+            if i == fail_after:
+                raise RuntimeError("connection lost")
+            yield pa.record_batch({'unit_id': [2 * i, 2 * i + 1], 'treatment': [0, 1]})
+    return batches
+
+def test_fill_writes_all_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(ObservationCache, '_db_batches', _batches())
+    cache = ObservationCache(cache_dir=str(tmp_path))
+
+    path = cache.get_path(None, 1, 7)
+    assert path.endswith('experiment_1_v7.parquet')
+    assert pq.read_table(path).num_rows == 6
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+def test_failed_fill_removes_temp_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(ObservationCache, '_db_batches', _batches(fail_after=2))
+    cache = ObservationCache(cache_dir=str(tmp_path))
+
+    with pytest.raises(RuntimeError):
+        cache.get_path(None, 1, 7)
+    # Only the lock file is left: no partial entry and no orphaned temp file
+    assert os.listdir(tmp_path) == ['experiment_1.lock']
+
+def test_eviction_skips_entries_in_use(tmp_path, monkeypatch):
+    monkeypatch.setattr(ObservationCache, '_db_batches', _batches())
+    cache = ObservationCache(cache_dir=str(tmp_path), max_bytes=1)
+
+    first = cache.get_path(None, 1, 7)
+    # Another process holds experiment 1's lock (reading or refilling it): not evicted
+    with cache._lock(1):
+        cache.get_path(None, 2, 7)
+    assert os.path.exists(first)
+    # Once released, the next fill evicts it (the cache is over max_bytes)
+    cache.get_path(None, 3, 7)
+    assert not os.path.exists(first)
+
+def test_read_refetches_an_entry_evicted_before_it_was_opened(tmp_path, monkeypatch):
+    monkeypatch.setattr(ObservationCache, '_db_batches', _batches())
+    cache = ObservationCache(cache_dir=str(tmp_path), max_bytes=1)
+    get_path = ObservationCache.get_path
+    evictions = []
+
+    def racing_get_path(self, engine, experiment_id, version):
+        path = get_path(self, engine, experiment_id, version)
+        if experiment_id == 1 and not evictions:
+            # Between get_path and the read, a fill of experiment 2 evicts experiment 1
+            evictions.append(get_path(self, engine, 2, version))
+            assert not os.path.exists(path)
+        return path
+    monkeypatch.setattr(ObservationCache, 'get_path', racing_get_path)
+
+    assert len(cache.load_frame(None, 1, 7)) == 6
+    evictions.clear()
+    assert sum(len(chunk) for chunk in cache.iter_chunks(None, 1, 7)) == 6
@@ -0,0 +1,54 @@
+import pandas as pd
+import numpy as np
+from statsmodels.stats.multitest import multipletests
+
+from analysis.ab_tests import calculate_ab_stats
+from analysis.segments import segment_cube, segment_combinations, benjamini_hochberg
+
+def _segment_df(n=6000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'treatment': rng.integers(0, 2, n),
+        'channel': rng.choice(['Web', 'Phone'], n),
+        'zip_code': rng.choice(['Rural', 'Urban', 'Suburban'], n),
+        'newbie': rng.integers(0, 2, n).astype(float),
+        'history': rng.exponential(100, n),
+    })
+    df['conv'] = (rng.random(n) < 0.1 + 0.05 * df['treatment'] * df['newbie']).astype(int)
+    df['spend'] = 0.05 * df['history'] + rng.normal(0, 2, n) + df['treatment']
+    return df
+
+def test_cube_cells_match_filtered_slices():
+    df = _segment_df()
+    cube = segment_cube(df, {'conv': 'binary', 'spend': 'continuous'}, ['channel', 'zip_code', 'newbie'])
+    
+    # Overall + 7 combinations; 2 + 3 + 2 + 6 + 4 + 6 + 12 = 35 cells + 'all', two metrics
+    assert len(segment_combinations(['channel', 'zip_code', 'newbie'])) == 7
+    assert len(cube) == 36 * 2
+    
+    cell = cube[(cube['segment'] == 'channel=Web|newbie=1') & (cube['metric_name'] == 'conv')].iloc[0]
+    ref = calculate_ab_stats(df[(df['channel'] == 'Web') & (df['newbie'] == 1)], 'conv', metric_type='binary')
+    assert np.isclose(cell['p_value'], ref['p_value'])
+    assert np.isclose(cell['effect_estimate'], ref['effect_estimate'])
+    assert cell['sample_size'] == ref['sample_size']
+
+def test_cube_cuped_and_fdr():
+    df = _segment_df(seed=1)
+    cube = segment_cube(df, {'spend': 'continuous'}, ['channel'], cuped_metrics=['spend'], covariate_cols=['history'])
+    
+    raw = cube[cube['metric_name'] == 'spend'].set_index('segment')
+    cuped = cube[cube['metric_name'] == 'spend_cuped'].set_index('segment')
+    assert (cuped['method'] == 'cuped').all()
+    # Variance reduction shows up in every cell
+    assert ((cuped['ci_high'] - cuped['ci_low']) < (raw['ci_high'] - raw['ci_low'])).all()
+    
+    # Raw and CUPED tests are separate FDR families
+    for method in ['cuped', 'welch_t_test']:
+        family = cube[cube['method'] == method]
+        assert np.allclose(family['p_value_adjusted'], multipletests(family['p_value'], method='fdr_bh')[1])
+
+def test_benjamini_hochberg_skips_nan():
+    p = np.array([0.01, np.nan, 0.04, 0.03])
+    adjusted = benjamini_hochberg(p)
+    assert np.isnan(adjusted[1])
+    assert np.allclose(adjusted[[0, 2, 3]], multipletests([0.01, 0.04, 0.03], method='fdr_bh')[1])
@@ -0,0 +1,42 @@
+from itertools import pairwise
+
+import pandas as pd
+import numpy as np
+
+from analysis.ab_tests import summarize_arm_moments
+from analysis.sequential import wide_moments, update_sequential_state
+
+def _batches(effect, n_batches=10, n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    for day in range(n_batches):
+        treatment = rng.integers(0, 2, n)
+        spend = rng.normal(10, 2, n) + effect * treatment
+        df = pd.DataFrame({'experiment_id': 1, 'treatment': treatment, 'spend': spend})
+        yield df, wide_moments(summarize_arm_moments(df, ['spend'], group_cols=['experiment_id']), ['spend'])
+
+def test_incremental_state_matches_full_history():
+    state = None
+    history = []
+    for df, batch in _batches(effect=0.2):
+        state = update_sequential_state(state, batch)
+        history.append(df)
+    
+    full = wide_moments(summarize_arm_moments(pd.concat(history), ['spend'], group_cols=['experiment_id']), ['spend'])
+    for col in ['n_t', 'sum_t', 'sumsq_t', 'n_c', 'sum_c', 'sumsq_c']:
+        assert np.isclose(state.iloc[0][col], full.iloc[0][col])
+    
+    # Strong effect: always-valid p-value drops and the confidence sequence excludes 0
+    assert state.iloc[0]['p_value'] < 0.01
+    assert state.iloc[0]['ci_low'] > 0
+
+def test_null_effect_stays_valid():
+    state = None
+    p_values = []
+    for _, batch in _batches(effect=0.0, seed=3):
+        state = update_sequential_state(state, batch)
+        p_values.append(state.iloc[0]['p_value'])
+    
+    # Running minimum: never increases, and no false positive here
+    assert all(b <= a for a, b in pairwise(p_values))
+    assert p_values[-1] > 0.05
+    assert state.iloc[0]['ci_low'] < 0 < state.iloc[0]['ci_high']
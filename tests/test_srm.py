@@ -1,6 +1,7 @@
 import pandas as pd
+import numpy as np
 
-from analysis.srm_checks import check_srm
+from analysis.srm_checks import check_srm, check_srm_batch
 
 def test_srm_perfect_split():
     df = pd.DataFrame({'treatment': [0]*500 + [1]*500})
@@ -23,3 +24,36 @@ def test_srm_warn():
     # chi2 on 550/450: (50^2/500 + 50^2/500) = 2500/500*2 = 10. p(chi2>10, df=1) ~ 0.0015 -> WARN
     result = check_srm(df)
     assert result['status'] in ['WARN', 'FAIL'] 
+
+def test_srm_multi_arm_allocation():
+    # 50/25/25 split observed exactly as planned
+    df = pd.DataFrame({'treatment': [0]*500 + [1]*250 + [2]*250})
+    result = check_srm(df, allocation={'0': 0.5, '1': 0.25, '2': 0.25})
+    assert result['status'] == 'PASS'
+    assert result['details']['expected'] == {0: 500.0, 1: 250.0, 2: 250.0}
+    
+    # Same data against an equal three-way split is a clear mismatch
+    assert check_srm(df)['status'] == 'FAIL'
+
+def test_srm_unplanned_arm_fails():
+    df = pd.DataFrame({'treatment': [0]*500 + [1]*500 + [2]*5})
+    result = check_srm(df, allocation={0: 1, 1: 1})
+    assert result['status'] == 'FAIL'
+
+def test_srm_batch_matches_single():
+    counts = pd.DataFrame({
+        'experiment_id': [1, 1, 2, 2, 3, 3, 3],
+        'treatment': [0, 1, 0, 1, 0, 1, 2],
+        'n': [500, 500, 800, 200, 600, 200, 200],
+    })
+    allocations = {3: {'0': 0.6, '1': 0.2, '2': 0.2}}
+    batch = check_srm_batch(counts, allocations, experiment_ids=[1, 2, 3, 4]).set_index('experiment_id')
+    
+    for exp_id, group in counts.groupby('experiment_id'):
+        df = pd.DataFrame({'treatment': group['treatment'].repeat(group['n'])})
+        single = check_srm(df, allocation=allocations.get(exp_id))
+        assert batch.loc[exp_id, 'status'] == single['status']
+        assert np.isclose(batch.loc[exp_id, 'p_value'], single['p_value'])
+    
+    # Registered experiment without observations
+    assert batch.loc[4, 'status'] == 'FAIL'
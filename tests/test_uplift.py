@@ -1,7 +1,11 @@
 import pandas as pd
 import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression, LogisticRegression
 
-from analysis.uplift_models import train_uplift_model
+from analysis.uplift_models import (train_uplift_model, load_uplift_model, tune_uplift_model, score_uplift, uplift_deciles,
+                                    TLearner, XLearner)
+from analysis.model_store import ModelStore
 
 def test_uplift_persuadables():
     # Synthetic data:
@@ -32,3 +36,138 @@ def test_uplift_persuadables():
     # Model should easily find this signal
     assert res['qini_auc'] > 0.05
     assert res['uplift_at_30'] > 0
+
+def test_uplift_model_store_skips_refit(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 600
+    df = pd.DataFrame({'feature_x': rng.normal(0, 1, n), 'treatment': rng.integers(0, 2, n)})
+    df['outcome'] = (rng.random(n) < 0.1 + 0.3 * (df['feature_x'] > 0) * df['treatment']).astype(int)
+    store = ModelStore(str(tmp_path))
+    
+    first = train_uplift_model(df, ['feature_x'], outcome_col='outcome', model_store=store)
+    second = train_uplift_model(df, ['feature_x'], outcome_col='outcome', model_store=store)
+    assert not first['cache_hit'] and second['cache_hit']
+    assert second['qini_auc'] == first['qini_auc']
+    
+    # Cached model is usable for scoring
+    model = load_uplift_model(store, first['model_key'])
+    assert len(model.predict(df[['feature_x']])) == n
+    
+    # Different hyperparameters or data: new key
+    other = train_uplift_model(df, ['feature_x'], outcome_col='outcome', params={'max_depth': 3}, model_store=store)
+    assert other['model_key'] != first['model_key']
+    changed = train_uplift_model(df.assign(outcome=1 - df['outcome']), ['feature_x'], outcome_col='outcome', model_store=store)
+    assert changed['model_key'] != first['model_key']
+
+def test_tune_uplift_model_halves_candidates(tmp_path):
+    rng = np.random.default_rng(1)
+    n = 3000
+    df = pd.DataFrame({'a': rng.normal(0, 1, n), 'b': rng.normal(0, 1, n), 'treatment': rng.integers(0, 2, n)})
+    df['outcome'] = (rng.random(n) < 0.05 + 0.3 * (df['a'] > 0) * df['treatment']).astype(int)
+    space = {'method': ['class_transform', 'solo_model'], 'n_estimators': [20], 'max_depth': [2, 4, 6]}
+    store = ModelStore(str(tmp_path))
+    
+    res, trace = tune_uplift_model(df, ['a', 'b'], outcome_col='outcome', search_space=space, n_folds=2,
+                                   min_rows=300, n_jobs=1, model_store=store)
+    
+    # 6 candidates, eta=3: 6 -> 2 -> 1
+    assert trace.groupby('rung')['candidate'].nunique().tolist() == [6, 2]
+    assert trace['train_rows'].is_monotonic_increasing
+    best = trace[(trace['rung'] == 1) & trace['promoted']].iloc[0]
+    assert res['model_name'] == best['method'] and res['params']['max_depth'] == best['max_depth']
+    assert res['qini_auc'] > 0.05
+    
+    # Unchanged data and settings: the search itself is served from the store
+    again, trace_again = tune_uplift_model(df, ['a', 'b'], outcome_col='outcome', search_space=space, n_folds=2,
+                                           min_rows=300, n_jobs=1, model_store=store)
+    assert again['cache_hit'] and again['model_key'] == res['model_key']
+    assert len(trace_again) == len(trace)
+
+def test_score_uplift_streams_chunks_with_stored_deciles(tmp_path):
+    rng = np.random.default_rng(2)
+    n = 2000
+    df = pd.DataFrame({'feature_x': rng.normal(0, 1, n), 'treatment': rng.integers(0, 2, n)})
+    df['outcome'] = (rng.random(n) < 0.1 + 0.3 * (df['feature_x'] > 0) * df['treatment']).astype(int)
+    df['unit_id'] = [f'u{i}' for i in range(n)]
+    store = ModelStore(str(tmp_path))
+    
+    res = train_uplift_model(df, ['feature_x'], outcome_col='outcome', model_store=store)
+    model, meta = store.get(res['model_key'])
+    assert len(meta['decile_cut_points']) == 9
+    
+    chunks = (df.iloc[i:i + 300] for i in range(0, n, 300))
+    scored = pd.concat(score_uplift(model, chunks, ['feature_x'], meta['decile_cut_points']), ignore_index=True)
+    
+    assert scored['unit_id'].tolist() == df['unit_id'].tolist()
+    assert np.allclose(scored['uplift_score'], model.predict(df[['feature_x']]))
+    assert scored['decile'].between(1, 10).all()
+    # Decile 1 holds the highest predicted uplift
+    means = scored.groupby('decile')['uplift_score'].mean()
+    assert means.loc[1] >= means.loc[10]
+    assert (uplift_deciles(np.array([-1.0, 1.0]), meta['decile_cut_points']) == [10, 1]).all()
+
+def _categorical_uplift_frame(n, seed):
+    # Effect only for 'Urban' units; zip_code stays a raw string column
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'recency': rng.normal(0, 1, n),
+        'zip_code': rng.choice(['Rural', 'Suburban', 'Urban'], n),
+        'treatment': rng.integers(0, 2, n),
+    })
+    df['outcome'] = (rng.random(n) < 0.1 + 0.4 * (df['zip_code'] == 'Urban') * df['treatment']).astype(int)
+    return df
+
+def test_hist_gradient_boosting_native_categoricals(tmp_path):
+    df = _categorical_uplift_frame(4000, 3)
+    store = ModelStore(str(tmp_path))
+    
+    res = train_uplift_model(df, ['recency', 'zip_code'], outcome_col='outcome', estimator='hist_gradient_boosting',
+                             model_store=store)
+    assert res['model_name'] == 'class_transform_hist_gradient_boosting'
+    assert res['qini_auc'] > 0.05
+    
+    # The stored model carries the training levels; unseen levels score like missing values
+    model, meta = store.get(res['model_key'])
+    assert meta['estimator'] == 'hist_gradient_boosting'
+    new = pd.DataFrame({'recency': [0.0, 0.0, 0.0], 'zip_code': ['Urban', 'Rural', 'Mars']})
+    scores = model.predict(new)
+    assert scores[0] > scores[1] and np.isfinite(scores).all()
+    
+    # Same data and method on another backend: another model
+    numeric = df.assign(urban=(df['zip_code'] == 'Urban').astype(float))
+    rf = train_uplift_model(numeric, ['recency', 'urban'], outcome_col='outcome', model_store=store)
+    hgb = train_uplift_model(numeric, ['recency', 'urban'], outcome_col='outcome', model_store=store,
+                             estimator='hist_gradient_boosting')
+    assert rf['model_key'] != hgb['model_key']
+
+def test_random_forest_rejects_raw_categoricals():
+    df = _categorical_uplift_frame(200, 4)
+    with pytest.raises(ValueError, match='numeric features'):
+        train_uplift_model(df, ['recency', 'zip_code'], outcome_col='outcome')
+    with pytest.raises(ValueError, match='Unknown estimator'):
+        train_uplift_model(df, ['recency'], outcome_col='outcome', estimator='xgboost')
+
+@pytest.mark.parametrize('method', ['t_learner', 'x_learner'])
+def test_meta_learners_find_persuadables(method):
+    df = _categorical_uplift_frame(4000, 5)
+    for estimator in ['random_forest', 'hist_gradient_boosting']:
+        data = df if estimator == 'hist_gradient_boosting' else df.assign(zip_code=(df['zip_code'] == 'Urban').astype(float))
+        res = train_uplift_model(data, ['recency', 'zip_code'], outcome_col='outcome', method=method, estimator=estimator)
+        assert res['qini_auc'] > 0.05
+
+def test_x_learner_blends_effects_by_treated_share():
+    rng = np.random.default_rng(6)
+    n = 3000
+    X = rng.normal(0, 1, (n, 1))
+    treatment = (rng.random(n) < 0.8).astype(int)
+    y = (rng.random(n) < 0.2 + 0.3 * (X[:, 0] > 0) * treatment).astype(int)
+    
+    model = XLearner(LogisticRegression(), LinearRegression()).fit(X, y, treatment)
+    assert model.propensity_ == pytest.approx(treatment.mean())
+    expected = model.propensity_ * model.effect_c_.predict(X) + (1 - model.propensity_) * model.effect_t_.predict(X)
+    assert np.allclose(model.predict(X), expected)
+    
+    # T-learner on the same outcome models: difference of arm probabilities
+    t = TLearner(LogisticRegression()).fit(X, y, treatment)
+    assert np.allclose(t.predict(X), t.model_t_.predict_proba(X)[:, 1] - t.model_c_.predict_proba(X)[:, 1])
+    assert t.predict(np.array([[2.0]]))[0] > t.predict(np.array([[-2.0]]))[0]
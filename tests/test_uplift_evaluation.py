@@ -0,0 +1,71 @@
+import pandas as pd
+import numpy as np
+import pytest
+from sklift.metrics import qini_auc_score, uplift_at_k
+
+from analysis.uplift_evaluation import evaluate_uplift, qini_auc, curve_at, expected_value_lift, compact_curve
+
+def _scored(n, seed, ties=False):
+    # Positive effect for x > 0; scores are a noisy (optionally rounded, i.e. tied) view of x
+    rng = np.random.default_rng(seed)
+    x = rng.normal(0, 1, n)
+    treatment = rng.integers(0, 2, n)
+    y = (rng.random(n) < 0.1 + 0.2 * (x > 0) * treatment).astype(int)
+    scores = np.round(x, 1) if ties else x + rng.normal(0, 0.5, n)
+    return y, scores, treatment
+
+@pytest.mark.parametrize('ties', [False, True])
+def test_curves_match_sklift(ties):
+    y, scores, treatment = _scored(3000, 0, ties)
+    res = evaluate_uplift(y, scores, treatment, n_bootstrap=0)
+
+    assert res['qini_auc'] == pytest.approx(qini_auc_score(y, scores, treatment), abs=1e-12)
+    assert qini_auc(y, scores, treatment) == pytest.approx(res['qini_auc'], abs=1e-12)
+    for k in [0.05, 0.3, 0.5, 0.9]:
+        expected = uplift_at_k(y, scores, treatment, strategy='overall', k=k)
+        assert curve_at(res['curve'], k)['uplift'] == pytest.approx(expected, abs=1e-12)
+
+def test_curve_values_and_cutoffs():
+    y, scores, treatment = _scored(2000, 1)
+    curve = evaluate_uplift(y, scores, treatment, n_bootstrap=0)['curve']
+
+    assert len(curve) == 100 and curve['n_targeted'].iloc[-1] == 2000
+    # Qini at 100%: incremental conversions of treating everyone
+    t, c = treatment == 1, treatment == 0
+    assert curve_at(curve, 1.0)['qini'] == pytest.approx(y[t].sum() - y[c].sum() * t.sum() / c.sum())
+    # A useful ranking beats random targeting
+    assert expected_value_lift(curve, 0.3) > 1
+
+    # One cut-off or a hundred: same values where they overlap
+    single = evaluate_uplift(y, scores, treatment, cutoffs=[0.3], n_bootstrap=0)['curve']
+    assert single.iloc[0]['qini'] == curve_at(curve, 0.3)['qini']
+    with pytest.raises(ValueError):
+        evaluate_uplift(y, scores, treatment, cutoffs=[0.0])
+
+def test_bootstrap_bands_cover_point_estimates():
+    y, scores, treatment = _scored(4000, 2)
+    res = evaluate_uplift(y, scores, treatment, n_bootstrap=300, seed=7)
+    curve = res['curve']
+
+    assert res['qini_auc_ci_low'] < res['qini_auc'] < res['qini_auc_ci_high']
+    wide = curve['cutoff'] >= 0.1
+    assert (curve.loc[wide, 'uplift_ci_low'] <= curve.loc[wide, 'uplift']).all()
+    assert (curve.loc[wide, 'uplift'] <= curve.loc[wide, 'uplift_ci_high']).all()
+    # Bands narrow as more units are targeted
+    width = curve['uplift_ci_high'] - curve['uplift_ci_low']
+    assert curve_at(curve.assign(width=width), 0.1)['width'] > curve_at(curve.assign(width=width), 0.9)['width']
+
+    # Reproducible by seed
+    again = evaluate_uplift(y, scores, treatment, n_bootstrap=300, seed=7)
+    pd.testing.assert_frame_equal(again['curve'], curve)
+
+def test_compact_curve_is_json_ready():
+    y, scores, treatment = _scored(100, 3)
+    curve = evaluate_uplift(y, scores, treatment, n_bootstrap=20)['curve']
+    compact = compact_curve(curve)
+
+    assert set(compact) == set(curve.columns)
+    assert all(len(values) == len(curve) for values in compact.values())
+    # 1% of 100 units may hold a single arm: undefined uplift is stored as null
+    assert all(v is None or isinstance(v, (int, float)) for values in compact.values() for v in values)
+    assert isinstance(compact['n_targeted'][0], int)
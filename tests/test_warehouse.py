@@ -0,0 +1,102 @@
+import datetime
+import os
+import re
+
+import pandas as pd
+import pytest
+
+from orchestration.dagster_app.warehouse import SCHEMA_PATH, ParquetWarehouse, duckdb_ddl
+
+OBSERVATIONS = 'experimentation.experiment_observations'
+
+@pytest.fixture
+def warehouse(tmp_path):
+    return ParquetWarehouse(str(tmp_path))
+
+def _observations(experiment_id, n, batch_date='2023-01-01', outcome=0):
+    return pd.DataFrame({
+        'experiment_id': experiment_id, 'unit_id': [f'{experiment_id}-{i}' for i in range(n)],
+        'treatment': [i % 2 for i in range(n)], 'outcome_visit': outcome, 'outcome_conversion': 0,
+        'batch_date': pd.Timestamp(batch_date).date(),
+    })
+
+def test_duckdb_ddl_translates_init_sql():
+    with open(SCHEMA_PATH) as f:
+        statements, serial, views = duckdb_ddl(f.read())
+
+    tables = [s for s in statements if s.upper().startswith('CREATE TABLE')]
+    assert any(OBSERVATIONS in s for s in tables)
+    # Postgres-only DDL is dropped or rewritten
+    for statement in statements:
+        upper = statement.upper()
+        assert 'SERIAL' not in upper and 'JSONB' not in upper and 'REFERENCES' not in upper
+        assert not re.search(r'\bPARTITION (BY|OF)\b|PRIMARY KEY|\bINDEX\b', upper)
+    assert not any('_default' in s for s in statements)
+    assert serial == {'experimentation.experiment_registry': 'experiment_id'}
+    assert len(views) == 3 and all(v.startswith('CREATE OR REPLACE VIEW experimentation.latest_') for v in views)
+
+def test_delete_and_append_replace_a_partition(warehouse, tmp_path):
+    with warehouse.transaction() as tx:
+        tx.append(OBSERVATIONS, [_observations(1, 10), _observations(2, 4)])
+    files_2 = warehouse.files(OBSERVATIONS)[1:]
+
+    with warehouse.transaction() as tx:
+        tx.delete(OBSERVATIONS, {'experiment_id': 1})
+        tx.append(OBSERVATIONS, _observations(1, 6, outcome=1))
+
+    counts = warehouse.read_frame(f"""
+        SELECT experiment_id, COUNT(*) AS n, SUM(outcome_visit) AS visits
+        FROM {OBSERVATIONS} GROUP BY experiment_id ORDER BY experiment_id
+    """)
+    assert counts.values.tolist() == [[1, 6, 6], [2, 4, 0]]
+    # The other experiment's files were left alone and nothing remains staged
+    assert warehouse.files(OBSERVATIONS)[1:] == files_2
+    assert os.listdir(tmp_path / '.staging') == []
+
+    # A delete on a non-partition column rewrites the partition's file without those rows
+    with warehouse.transaction() as tx:
+        tx.delete(OBSERVATIONS, {'experiment_id': 1, 'treatment': 1})
+    assert warehouse.read_frame(f"SELECT COUNT(*) AS n FROM {OBSERVATIONS} WHERE experiment_id = :e",
+                                {'e': 1})['n'].item() == 3
+
+def test_abort_discards_staged_files(warehouse, tmp_path):
+    with pytest.raises(RuntimeError), warehouse.transaction() as tx:
+        tx.append(OBSERVATIONS, _observations(1, 10))
+        tx.delete(OBSERVATIONS)
+        assert os.listdir(tx.staging_dir)
+        raise RuntimeError('asset failed')
+
+    assert not os.path.exists(tx.staging_dir)
+    assert warehouse.files(OBSERVATIONS) == []
+    assert warehouse.read_frame(f"SELECT COUNT(*) AS n FROM {OBSERVATIONS}")['n'].item() == 0
+
+def test_serial_ids_continue_across_appends(warehouse):
+    registry = 'experimentation.experiment_registry'
+    with warehouse.transaction() as tx:
+        tx.append(registry, pd.DataFrame({'name': ['a', 'b']}))
+        tx.append(registry, pd.DataFrame({'name': ['c']}))
+    with warehouse.transaction() as tx:
+        tx.append(registry, pd.DataFrame({'name': ['d']}))
+        # Explicit ids are kept
+        tx.append(registry, pd.DataFrame({'experiment_id': [10], 'name': ['e']}))
+
+    df = warehouse.read_frame(f"SELECT experiment_id, name, status FROM {registry} ORDER BY experiment_id")
+    assert df['experiment_id'].tolist() == [1, 2, 3, 4, 10]
+    assert df['name'].tolist() == ['a', 'b', 'c', 'd', 'e']
+    # Column defaults apply to the columns a frame leaves out
+    assert set(df['status']) == {'planning'}
+
+def test_json_columns_round_trip(warehouse):
+    details = {'p_value': 0.2, 'observed': {'0': 100, '1': 98}, 'arms': [0, 1]}
+    with warehouse.transaction() as tx:
+        tx.append('experimentation.experiment_health_checks', pd.DataFrame({
+            'experiment_id': [1, 1], 'check_name': ['srm', 'srm'], 'status': ['PASS', 'WARN'],
+            'details': [details, None],
+            'computed_at': [datetime.datetime(2023, 1, 1), datetime.datetime(2023, 1, 2)],
+        }))
+
+    df = warehouse.read_frame("SELECT details FROM experimentation.experiment_health_checks ORDER BY computed_at")
+    assert df['details'].tolist() == [details, None]
+    # The latest-result views read through the same tables
+    latest = warehouse.read_frame("SELECT status, details FROM experimentation.latest_health_checks")
+    assert latest.values.tolist() == [['WARN', None]]